@@ -1,4 +1,5 @@
 from .alpha_zero_mcts import AlphaZeroMCTS
+from .bit_board import BitBoard
 from .chess_board import ChessBoard
 from .policy_value_net import PolicyValueNet
 from .rollout_mcts import RolloutMCTS
@@ -1,18 +1,20 @@
 # coding: utf-8
-from typing import Tuple, Union
+from typing import Tuple, Union, List
 
 import numpy as np
+import torch
 
 from .chess_board import ChessBoard
-from .node import Node
+from .array_tree import ArrayTree
 from .policy_value_net import PolicyValueNet
+from .transposition_table import TranspositionTable
 
 
 class AlphaZeroMCTS:
     """ 基于策略-价值网络的蒙特卡洛搜索树 """
 
     def __init__(self, policy_value_net: PolicyValueNet, c_puct: float = 4, n_iters=1200, policy_dim=100,
-                 is_self_play=False) -> None:
+                 is_self_play=False, batch_size=1, virtual_loss=3, transposition_table_size=0) -> None:
         """
         Parameters
         ----------
@@ -27,13 +29,30 @@ class AlphaZeroMCTS:
 
         is_self_play: bool
             是否处于自我博弈状态
+
+        batch_size: int
+            每轮收集的叶节点个数，这些叶节点用一次前馈批量估值
+
+        virtual_loss: float
+            批量搜索时对尚未估值的路径施加的虚拟损失（虚拟失败的次数）
+
+        transposition_table_size: int
+            置换表最多保存的局面数，不同走法到达的相同局面共享网络估值，为 0 时不使用置换表
         """
         self.c_puct = c_puct
+        self.batch_size = batch_size
+        self.virtual_loss = virtual_loss
         self.n_iters = n_iters
         self.policy_dim = policy_dim
         self.is_self_play = is_self_play
         self.policy_value_net = policy_value_net
-        self.root = Node(prior_prob=1, parent=None)
+        self.tree = ArrayTree(c_puct)
+        self.transposition_table = TranspositionTable(
+            transposition_table_size) if transposition_table_size > 0 else None
+        # 上一次搜索中送入网络估值的局面数和因置换而省下的估值次数，以及累计送入网络估值的局面数
+        self.n_evaluations = 0
+        self.n_saved_evaluations = 0
+        self.n_total_evaluations = 0
 
     def get_action(self, chess_board: ChessBoard) -> Union[Tuple[int, np.ndarray], int]:
         """ 根据当前局面返回下一步动作
@@ -51,53 +70,106 @@ class AlphaZeroMCTS:
         pi: `np.ndarray` of shape `(100, )`
             执行动作空间中每个动作的概率，只在 `is_self_play=True` 模式下返回
         """
-        for i in range(self.n_iters):
-            # 拷贝棋盘
-            board = chess_board.copy()
-
-            # 如果没有遇到叶节点，就一直向下搜索并更新棋盘
-            node = self.root
-            while not node.is_leaf_node():
-                action, node = node.select()
-                board.do_action(action)
-
-            # 判断游戏是否结束，如果没结束就拓展叶节点
-            is_over, winner = board.is_game_over()
-            p, value = self.policy_value_net.predict(board)
-            if not is_over:
-                # 添加狄利克雷噪声
-                if self.is_self_play:
-                    p = 0.75 * p + 0.25 * np.random.dirichlet(0.03 * np.ones(len(p)))
-                node.expand(zip(board.available_actions, p))
-            elif winner is not None:
-                value = 1 if winner == board.state[12, 0, 0] else -1
-            else:
-                value = 0
-
-            # 反向传播
-            node.backup(-value)
+        tree = self.tree
+        table = self.transposition_table
+        self.n_evaluations = 0
+        self.n_saved_evaluations = 0
+        n_simulations = 0
+        while n_simulations < self.n_iters:
+            # 收集一批叶节点，未估值的路径上施加虚拟损失，同一批中相同的局面只估值一次
+            leaves, feature_planes, available_actions, keys = [], [], [], {}
+            while len(leaves) < self.batch_size and n_simulations < self.n_iters:
+                # 直接在棋盘上模拟，结束后撤销
+                board = chess_board
+
+                # 如果没有遇到叶节点，就一直向下搜索并更新棋盘，记录经过的节点供反向传播使用
+                node = tree.root
+                path = [node]
+                while not tree.is_leaf_node(node):
+                    action, node = tree.select(node)
+                    board.push(action)
+                    path.append(node)
+
+                # 判断游戏是否结束，如果结束就直接反向传播，否则等待批量估值
+                is_over, winner = board.is_game_over()
+                if not is_over and tree.n_virtual[node] > 0:
+                    # 虚拟损失不足以让模拟选择其他路径，提前结束本轮收集
+                    for _ in range(len(path) - 1):
+                        board.pop()
+                    break
+
+                n_simulations += 1
+                if is_over:
+                    if winner is not None:
+                        value = 1 if winner == board.current_player else -1
+                    else:
+                        value = 0
+                    tree.backup(path, -value)
+                else:
+                    key = board.zobrist_hash
+                    entry = table.get(key) if table is not None else None
+                    if entry is not None:
+                        # 置换表中已有估值，不需要再送入网络
+                        self.n_saved_evaluations += 1
+                        self.__expand_and_backup(path, board.available_actions, *entry)
+                    else:
+                        tree.add_virtual_loss(path, self.virtual_loss)
+                        if key in keys:
+                            self.n_saved_evaluations += 1
+                        else:
+                            keys[key] = len(feature_planes)
+                            feature_planes.append(board.get_feature_planes())
+                            available_actions.append(board.available_actions)
+                        leaves.append((path, keys[key]))
+
+                for _ in range(len(path) - 1):
+                    board.pop()
+
+            if not leaves:
+                continue
+
+            # 批量估值，拓展叶节点并反向传播
+            probs, values = self.policy_value_net.predict_batch(torch.stack(feature_planes), available_actions,
+                                                                list(keys))
+            self.n_evaluations += len(feature_planes)
+            self.n_total_evaluations += len(feature_planes)
+            if table is not None:
+                for key, i in keys.items():
+                    table.put(key, probs[i], float(values[i]))
+
+            for path, i in leaves:
+                tree.revert_virtual_loss(path, self.virtual_loss)
+                self.__expand_and_backup(path, available_actions[i], probs[i], float(values[i]))
 
         # 计算 π，在自我博弈状态下：游戏的前三十步，温度系数为 1，后面的温度系数趋于无穷小
-        T = 1 if self.is_self_play and len(chess_board.step_count) <= 10 else 1e-3
-        visits = np.array([i.N for i in self.root.children.values()])
+        T = 1 if self.is_self_play and chess_board.step_count <= 10 else 1e-3
+        actions, visits = tree.children(tree.root)
         pi_ = self.__getPi(visits, T)
 
         # 根据 π 选出动作及其对应节点
-        actions = list(self.root.children.keys())
         action = int(np.random.choice(actions, p=pi_))
 
         if self.is_self_play:
             # 创建维度为 100 的 π
             pi = np.zeros(self.policy_dim)
             pi[actions] = pi_
-            # 更新根节点
-            self.root = self.root.children[action]
-            self.root.parent = None
+            # 更新根节点，保留所选动作的子树
+            tree.reroot(tree.child(tree.root, action))
             return action, pi
         else:
-            self.reset_root()
+            tree.reset()
             return action
 
+    def __expand_and_backup(self, path: List[int], actions: List[int], p: np.ndarray, value: float):
+        """ 用网络的估值拓展叶节点并反向传播 """
+        # 添加狄利克雷噪声
+        if self.is_self_play:
+            p = 0.75 * p + 0.25 * np.random.dirichlet(0.03 * np.ones(len(p)))
+        self.tree.expand(path[-1], zip(actions, p))
+
+        # 反向传播
+        self.tree.backup(path, -value)
+
     def __getPi(self, visits, T) -> np.ndarray:
         """ 根据节点的访问次数计算 π """
         # pi = visits**(1/T) / np.sum(visits**(1/T)) 会出现标量溢出问题，所以使用对数压缩
@@ -107,8 +179,10 @@ class AlphaZeroMCTS:
         return pi
 
     def reset_root(self):
-        """ 重置根节点 """
-        self.root = Node(prior_prob=1, c_puct=self.c_puct, parent=None)
+        """ 重置根节点，同时清空置换表，因为两局之间网络的权重可能已经改变 """
+        self.tree.reset()
+        if self.transposition_table is not None:
+            self.transposition_table.clear()
 
     def set_self_play(self, is_self_play: bool):
         """ 设置蒙特卡洛树的自我博弈状态 """
@@ -0,0 +1,215 @@
+# coding: utf-8
+from math import sqrt
+from typing import Tuple, Iterable, List
+
+import numpy as np
+
+
+class ArrayTree:
+    """ 以数组存储的蒙特卡洛树
+
+    节点编号即为数组下标，`N`、`W`、`P` 等统计量各存放在一个数组中，
+    每个已拓展节点的子节点在数组中连续存放，选择时对子节点区间做一次向量化的 argmax
+    """
+
+    def __init__(self, c_puct: float = 5, capacity: int = 4096):
+        """
+        Parameters
+        ----------
+        c_puct: float
+            探索常数
+
+        capacity: int
+            初始节点容量，不够时自动翻倍
+        """
+        self.c_puct = c_puct
+        self.capacity = capacity
+        self.__sign_cache = np.ones(0)
+        self.reset()
+
+    def reset(self):
+        """ 清空树，只保留先验概率为 1 的根节点 """
+        capacity = self.capacity
+        self.N = np.zeros(capacity)  # 访问次数 N(s, a)
+        self.W = np.zeros(capacity)  # 累计奖赏 W(s, a)
+        self.P = np.zeros(capacity)  # 先验概率 P(s, a)
+        self.n_virtual = np.zeros(capacity)  # 尚未返回结果的虚拟访问次数，每次视为一次失败
+        self.action = np.zeros(capacity, dtype=np.int32)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.zeros(capacity, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int32)
+
+        self.root = 0
+        self.size = 1
+        self.P[self.root] = 1
+
+    def is_leaf_node(self, node: int) -> bool:
+        """ 是否为叶节点 """
+        return self.n_children[node] == 0
+
+    def select(self, node: int) -> Tuple[int, int]:
+        """ 返回 `score` 最大的子节点对应的 action 和该子节点
+
+        Returns
+        -------
+        action: int
+            动作
+
+        child: int
+            子节点编号
+        """
+        start = self.first_child[node]
+        end = start + self.n_children[node]
+        N = self.N[start:end]
+        W = self.W[start:end]
+
+        if self.n_virtual[node]:
+            n_virtual = self.n_virtual[start:end]
+            N = N + n_virtual
+            W = W - n_virtual
+            parent_N = self.N[node] + self.n_virtual[node]
+        else:
+            parent_N = self.N[node]
+
+        Q = np.divide(W, N, out=np.zeros_like(W), where=N > 0)
+        U = self.c_puct * sqrt(parent_N) * self.P[start:end] / (1 + N)
+        child = start + int(np.argmax(Q + U))
+        return int(self.action[child]), child
+
+    def expand(self, node: int, action_probs: Iterable[Tuple[int, float]]):
+        """ 拓展节点
+
+        Parameters
+        ----------
+        node: int
+            叶节点编号
+
+        action_probs: Iterable
+            每个元素都为 `(action, prior_prob)` 元组，根据这个元组创建子节点，
+            `action_probs` 的长度为当前棋盘的可用落点的总数
+        """
+        action_probs = list(action_probs)
+        n = len(action_probs)
+        if self.size + n > self.capacity:
+            self.__grow(self.size + n)
+
+        start = self.size
+        end = start + n
+        actions, probs = zip(*action_probs)
+        self.action[start:end] = actions
+        self.P[start:end] = probs
+        self.parent[start:end] = node
+        # 重新设置根节点后数组尾部可能残留旧数据，需要清零
+        self.N[start:end] = 0
+        self.W[start:end] = 0
+        self.n_virtual[start:end] = 0
+        self.n_children[start:end] = 0
+        self.first_child[node] = start
+        self.n_children[node] = n
+        self.size = end
+
+    def backup(self, path: List[int], value: float):
+        """ 沿搜索时记录的路径反向传播，更新访问次数 `N(s, a)` 和累计奖赏 `W(s, a)`
+
+        Parameters
+        ----------
+        path: List[int]
+            从根节点到叶节点的节点编号
+
+        value: float
+            叶节点的价值，每向上一层价值取反
+        """
+        path = np.array(path, dtype=np.intp)
+        self.N[path] += 1
+        self.W[path] += value * self.__signs(len(path))
+
+    def add_virtual_loss(self, path: List[int], virtual_loss: float):
+        """ 在路径上施加虚拟损失，使批量搜索时其他模拟倾向于选择别的路径
+
+        Parameters
+        ----------
+        path: List[int]
+            从根节点到叶节点的节点编号
+
+        virtual_loss: float
+            虚拟访问次数
+        """
+        self.n_virtual[np.array(path, dtype=np.intp)] += virtual_loss
+
+    def revert_virtual_loss(self, path: List[int], virtual_loss: float):
+        """ 撤销 `add_virtual_loss` 施加的虚拟损失 """
+        self.n_virtual[np.array(path, dtype=np.intp)] -= virtual_loss
+
+    def children(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        """ 子节点对应的动作和访问次数
+
+        Returns
+        -------
+        actions: np.ndarray
+            子节点对应的动作
+
+        visits: np.ndarray
+            子节点的访问次数
+        """
+        start = self.first_child[node]
+        end = start + self.n_children[node]
+        return self.action[start:end].copy(), self.N[start:end].copy()
+
+    def child(self, node: int, action: int) -> int:
+        """ 动作对应的子节点编号 """
+        start = self.first_child[node]
+        end = start + self.n_children[node]
+        return start + int(np.flatnonzero(self.action[start:end] == action)[0])
+
+    def reroot(self, node: int):
+        """ 以子节点为新的根节点，只保留它的子树并重新紧凑排列 """
+        # 广度优先遍历子树，新编号即为遍历顺序，同一父节点的子节点仍然连续
+        order = [node]
+        first_child = [0]
+        i = 0
+        while i < len(order):
+            current = order[i]
+            n = self.n_children[current]
+            first_child[i] = len(order) if n else 0
+            start = self.first_child[current]
+            order.extend(range(start, start + n))
+            first_child.extend([0] * n)
+            i += 1
+
+        order = np.array(order)
+        new_id = np.full(self.size, -1, dtype=np.int32)
+        new_id[order] = np.arange(len(order), dtype=np.int32)
+
+        size = len(order)
+        for array in (self.N, self.W, self.P, self.n_virtual, self.action, self.n_children):
+            array[:size] = array[order]
+
+        parent = self.parent[order]
+        parent[0] = -1
+        parent[1:] = new_id[parent[1:]]
+        self.parent[:size] = parent
+        self.first_child[:size] = first_child
+
+        self.root = 0
+        self.size = size
+
+    def __signs(self, n: int) -> np.ndarray:
+        """ 长度为 n 的路径上各节点价值的符号，叶节点为 1，向上交替取反 """
+        if n > len(self.__sign_cache):
+            length = max(n, 2 * len(self.__sign_cache))
+            self.__sign_cache = np.where(np.arange(length) % 2, -1.0, 1.0)
+        return self.__sign_cache[n - 1::-1]
+
+    def __grow(self, size: int):
+        """ 扩大数组容量 """
+        capacity = self.capacity
+        while capacity < size:
+            capacity *= 2
+
+        for name in ('N', 'W', 'P', 'n_virtual', 'action', 'parent', 'first_child', 'n_children'):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype) if name != 'parent' else np.full(capacity, -1, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+        self.capacity = capacity
@@ -0,0 +1,212 @@
+# coding: utf-8
+from typing import Tuple, List
+
+import numpy as np
+import torch
+
+from .board_tables import get_board_tables, separate, generate_actions, mask_to_array, get_zobrist_keys
+from .chess_board import ChessBoard
+
+
+class BitBoard(ChessBoard):
+    """
+    以位掩码存储的棋盘，公有接口与 `ChessBoard` 相同
+    玩家位置为格子编号，横向墙和纵向墙为整数掩码，只有在需要时才生成 13 个特征平面
+    """
+
+    # 该谁走了直接存为实例属性，覆盖 `ChessBoard` 中从特征平面读取的同名属性
+    current_player = 0
+
+    def __init__(self, board_len=7, n_feature_planes=13):
+        """
+        :param board_len: 棋盘边长
+        :param n_feature_planes: 特征平面数
+        """
+        self.board_len = board_len
+        self.n_feature_planes = n_feature_planes
+        self.tables = get_board_tables(board_len)
+        self.zobrist_keys = get_zobrist_keys(board_len)
+        self.clear_board()
+
+    def copy(self) -> 'BitBoard':
+        """ 复制棋盘 """
+        board = BitBoard.__new__(BitBoard)
+        board.__dict__.update(self.__dict__)
+        board.pos = self.pos[:]
+        board.pos_history = [self.pos_history[0][:], self.pos_history[1][:]]
+        board.player_pos = self.player_pos[:]
+        board.available_actions = self.available_actions[:]
+        board.undo_stack = self.undo_stack[:]
+        return board
+
+    def clear_board(self):
+        """ 清空棋盘 """
+        n_cells = self.tables.n_cells
+
+        # 玩家位置（格子编号）及历史，-1 代表没有历史位置
+        self.pos = [0, n_cells - 1]
+        self.pos_history = [[-1, -1], [-1, -1]]
+        # 墙的掩码，依次为 当前、上一个、上上个
+        self.horizontal_walls = (0, 0, 0)
+        self.vertical_walls = (0, 0, 0)
+        self.current_player = self.Player_Blue
+
+        self.step_count = 0
+        self._state = None
+        self._game_over = None
+
+        # 撤销栈，每个元素为 push 前会被修改的状态
+        self.undo_stack = []
+
+        # 初始局面只有双方的当前位置
+        position_keys = self.zobrist_keys.position
+        self.zobrist_hash = position_keys[0][0][self.pos[0]] ^ position_keys[1][0][self.pos[1]]
+        self.player_pos = self.get_player_pos()
+        self.available_actions = self.get_available_actions()
+
+    @property
+    def state(self) -> np.ndarray:
+        """ 特征平面数组，只有在访问时才生成 """
+        if self._state is None:
+            self._state = self.__build_state()
+        return self._state
+
+    def get_player_pos(self) -> List[tuple[int, int]]:
+        """ 获取玩家位置 """
+        return [self.tables.cell_to_pos[self.pos[0]], self.tables.cell_to_pos[self.pos[1]]]
+
+    def get_wall_masks(self) -> Tuple[int, int]:
+        """ 当前的横向墙掩码和纵向墙掩码 """
+        return self.horizontal_walls[0], self.vertical_walls[0]
+
+    def push(self, action: int):
+        """
+        执行动作并记录撤销信息，之后可以用 `pop` 撤销
+        :param action: 动作，范围为 0 ~ 99
+        """
+        player = self.current_player
+        history = self.pos_history[player]
+        record = (self.pos[player], history[0], history[1], self.horizontal_walls, self.vertical_walls,
+                  self.available_actions, self._state, self._game_over, self.zobrist_hash)
+        self.do_action(action)
+        self.undo_stack.append(record)
+
+    def pop(self):
+        """ 撤销最近一次 `push` 的动作 """
+        (pos, last_pos, last_last_pos, self.horizontal_walls, self.vertical_walls,
+         self.available_actions, self._state, self._game_over, self.zobrist_hash) = self.undo_stack.pop()
+
+        player = 1 - self.current_player
+        self.pos[player] = pos
+        self.pos_history[player][0] = last_pos
+        self.pos_history[player][1] = last_last_pos
+        self.player_pos[player] = self.tables.cell_to_pos[pos]
+        self.current_player = player
+        self.step_count -= 1
+
+    def do_action(self, action: int, update_available_actions=True, check_legality=True):
+        """
+        执行动作
+        :param update_available_actions:
+        :param action: 动作，范围为 0 ~ 99
+        :param check_legality: 是否检查动作合法，重放可信的棋谱时可以关闭，与 `update_available_actions=False` 一起使用
+        :return:
+        """
+        # 判断合法性
+        if check_legality and action not in self.available_actions:
+            raise ValueError(f'Illegal action {action}')
+
+        player = self.current_player
+        tables = self.tables
+
+        # 更新位置历史
+        history = self.pos_history[player]
+        old_cell, last_cell, last_last_cell = self.pos[player], history[0], history[1]
+        history[1] = history[0]
+        history[0] = self.pos[player]
+
+        # 移动
+        cell = self.pos[player] + tables.move_delta[action // 4]
+        self.pos[player] = cell
+        self.player_pos[player] = tables.cell_to_pos[cell]
+
+        # 放墙
+        is_horizontal, bit = tables.wall_effects[cell * 4 + action % 4]
+        h = self.horizontal_walls
+        v = self.vertical_walls
+        self.horizontal_walls = (h[0] | bit if is_horizontal else h[0], h[0], h[1])
+        self.vertical_walls = (v[0] if is_horizontal else v[0] | bit, v[0], v[1])
+
+        # 增量更新哈希，与 `zobrist_update` 相同，展开以减少函数调用开销
+        keys = self.zobrist_keys
+        position_keys = keys.position[player]
+        key = self.zobrist_hash ^ keys.side ^ position_keys[0][old_cell] ^ position_keys[0][cell] ^ \
+            position_keys[1][old_cell]
+        if last_cell >= 0:
+            key ^= position_keys[1][last_cell] ^ position_keys[2][last_cell]
+        if last_last_cell >= 0:
+            key ^= position_keys[2][last_last_cell]
+
+        # 最近放置的墙为相邻两个历史合并墙掩码之差
+        n_cells = tables.n_cells
+        wall_keys = keys.wall
+        key ^= wall_keys[0][bit.bit_length() - 1 + (0 if is_horizontal else n_cells)]
+        last_wall = ((h[0] ^ h[1]) | (v[0] ^ v[1]) << n_cells).bit_length() - 1
+        if last_wall >= 0:
+            key ^= wall_keys[1][last_wall]
+        last_last_wall = ((h[1] ^ h[2]) | (v[1] ^ v[2]) << n_cells).bit_length() - 1
+        if last_last_wall >= 0:
+            key ^= wall_keys[2][last_last_wall]
+        self.zobrist_hash = key
+
+        # 更新谁该走、合法位置
+        self.current_player = 1 - player
+        self._state = None
+        self._game_over = None
+        if update_available_actions:
+            self.available_actions = self.get_available_actions()
+
+        self.step_count += 1
+
+    def get_feature_planes(self) -> torch.Tensor:
+        """
+        获取特征平面
+        :return: torch.Tensor of shape (n_feature_planes, board_len, board_len)
+        """
+        return torch.from_numpy(self.state.astype(np.float32))
+
+    def get_available_actions(self) -> List[int]:
+        """
+        获取当前可用动作
+        :return: 动作列表
+        """
+        player = self.current_player
+        return generate_actions(self.pos[player], self.pos[1 - player],
+                                self.horizontal_walls[0], self.vertical_walls[0], self.tables)
+
+    def _separation(self) -> Tuple[bool, int, int]:
+        """
+        用位掩码洪水填充判断双方是否被隔开，结果在同一局面内缓存
+        :return: （是否隔开， X玩家区域掩码， O玩家区域掩码）
+        """
+        if self._game_over is None:
+            self._game_over = separate(self.pos[0], self.pos[1], self.horizontal_walls[0], self.vertical_walls[0],
+                                       self.tables)
+        return self._game_over
+
+    def __build_state(self) -> np.ndarray:
+        """ 由位置和墙掩码生成特征平面 """
+        n = self.board_len
+        state = np.zeros((self.n_feature_planes, n, n), dtype=int)
+
+        for player, offset in ((0, 0), (1, 3)):
+            for i, cell in enumerate([self.pos[player]] + self.pos_history[player]):
+                if cell >= 0:
+                    state[offset + i, cell // n, cell % n] = 1
+
+        for i in range(3):
+            state[6 + i] = mask_to_array(self.horizontal_walls[i], n)
+            state[9 + i] = mask_to_array(self.vertical_walls[i], n)
+
+        state[12] = self.current_player
+        return state
@@ -0,0 +1,295 @@
+# coding: utf-8
+from collections import namedtuple
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+BoardTables = namedtuple('BoardTables', [
+    'board_len', 'n_cells', 'full_mask', 'not_first_col', 'not_last_col', 'cell_to_pos', 'cell_weights',
+    'neighbours', 'slot_mask', 'free_places', 'place_actions', 'wall_effects', 'move_index', 'move_delta'])
+
+ZobristKeys = namedtuple('ZobristKeys', ['position', 'wall', 'side'])
+
+
+@lru_cache(maxsize=None)
+def get_board_tables(board_len: int) -> BoardTables:
+    """
+    预计算给定边长棋盘的走子表，格子编号为 `row * board_len + col`。
+    墙使用合并掩码 `horizontal_wall | vertical_wall << n_cells` 查询
+    :param board_len: 棋盘边长
+    :return: BoardTables
+        * `cell_weights`: 每个格子对应比特的 int64 数组，用于数组与掩码互相转换，格子数超过 63 时为 None
+        * `neighbours[cell]`: `(相邻格子, 相邻格子比特, 墙的合并比特)` 元组，按 上、左、下、右 顺序，与原 BFS 顺序一致
+        * `slot_mask[cell]`: 格子四周可放墙位置的合并掩码（不含棋盘边缘）
+        * `free_places[cell][occupied]`: 四周已有墙为 `occupied` 时，可放置方式的 4 位编码
+        * `place_actions[move][code]`: 移动编号和放置方式编码对应的动作元组
+        * `wall_effects[cell * 4 + place]`: `(是否横向墙, 墙的比特)`
+        * `move_index[from * n_cells + to]`: 相对位移对应的移动编号，不可达为 -1
+        * `move_delta[move]`: 移动编号对应的格子编号增量
+    """
+    from .chess_board import ChessBoard  # 避免循环导入
+
+    n = board_len
+    n_cells = n * n
+    full_mask = (1 << n_cells) - 1
+
+    first_col = sum(1 << (r * n) for r in range(n))
+    last_col = first_col << (n - 1)
+
+    cell_to_pos = tuple((cell // n, cell % n) for cell in range(n_cells))
+
+    neighbours = []
+    slot_mask = []
+    free_places = []
+    wall_effects = []
+    for cell, (r, c) in enumerate(cell_to_pos):
+        # 上、左、下、右 对应的墙分别位于 横墙(r-1,c)、纵墙(r,c-1)、横墙(r,c)、纵墙(r,c)
+        sides = (
+            (r > 0, cell - n, True, cell - n),
+            (c > 0, cell - 1, False, cell - 1),
+            (r < n - 1, cell + n, True, cell),
+            (c < n - 1, cell + 1, False, cell),
+        )
+        nbs = []
+        slots = []
+        for place, (inside, nb, is_horizontal, wall_cell) in enumerate(sides):
+            wall_effects.append((is_horizontal, 1 << wall_cell if inside else 0))
+            if inside:
+                bit = 1 << (wall_cell if is_horizontal else wall_cell + n_cells)
+                nbs.append((nb, 1 << nb, bit))
+                slots.append((place, bit))
+        neighbours.append(tuple(nbs))
+        slot_mask.append(sum(bit for _, bit in slots))
+
+        # 枚举四周墙的所有组合
+        free = {}
+        for subset in range(1 << len(slots)):
+            occupied = sum(bit for i, (_, bit) in enumerate(slots) if subset >> i & 1)
+            free[occupied] = sum(1 << place for i, (place, _) in enumerate(slots) if not subset >> i & 1)
+        free_places.append(free)
+
+    n_moves = len(ChessBoard.action_to_pos)
+    place_actions = tuple(tuple(tuple(move * 4 + place for place in range(4) if code >> place & 1)
+                                for code in range(16)) for move in range(n_moves))
+
+    move_index = [-1] * (n_cells * n_cells)
+    for src, (r, c) in enumerate(cell_to_pos):
+        for (dr, dc), move in ChessBoard.pos_to_action.items():
+            if 0 <= r + dr < n and 0 <= c + dc < n:
+                move_index[src * n_cells + (r + dr) * n + c + dc] = move
+
+    move_delta = tuple(dr * n + dc for dr, dc in (ChessBoard.action_to_pos[move] for move in range(n_moves)))
+
+    cell_weights = np.left_shift(1, np.arange(n_cells, dtype=np.int64)) if n_cells <= 63 else None
+
+    return BoardTables(n, n_cells, full_mask, full_mask & ~first_col, full_mask & ~last_col, cell_to_pos, cell_weights,
+                       tuple(neighbours), tuple(slot_mask), tuple(free_places), place_actions,
+                       tuple(wall_effects), tuple(move_index), move_delta)
+
+
+@lru_cache(maxsize=None)
+def get_zobrist_keys(board_len: int, seed=20230101) -> ZobristKeys:
+    """
+    生成 Zobrist 哈希的随机键，特征平面中每个为 1 的格子对应一个键，哈希为这些键的异或
+    墙编号为 横向墙 `cell`、纵向墙 `n_cells + cell`，历史序号 0、1、2 分别代表 当前、上一个、上上个
+    :param board_len: 棋盘边长
+    :param seed: 随机种子，固定后不同进程得到的哈希相同
+    :return: ZobristKeys
+        * `position[player][age][cell]`: 玩家位置平面的键
+        * `wall[age][wall]`: 墙平面的键
+        * `side`: 轮到绿方走时的键
+    """
+    n_cells = board_len * board_len
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(0, 1 << 64, 6 * n_cells + 6 * n_cells + 1, dtype=np.uint64, endpoint=False).tolist()
+
+    position = tuple(tuple(tuple(keys[(player * 3 + age) * n_cells:(player * 3 + age + 1) * n_cells])
+                           for age in range(3)) for player in range(2))
+    offset = 6 * n_cells
+    wall = tuple(tuple(keys[offset + age * 2 * n_cells:offset + (age + 1) * 2 * n_cells]) for age in range(3))
+    return ZobristKeys(position, wall, keys[-1])
+
+
+def zobrist_hash(state: np.ndarray, board_len: int) -> int:
+    """
+    由特征平面从头计算 Zobrist 哈希
+    :param state: 特征平面
+    :param board_len: 棋盘边长
+    :return: 哈希值
+    """
+    keys = get_zobrist_keys(board_len)
+    n_cells = board_len * board_len
+
+    key = keys.side if state[12, 0, 0] else 0
+    for player in range(2):
+        for age in range(3):
+            for cell in np.flatnonzero(state[player * 3 + age]):
+                key ^= keys.position[player][age][cell]
+
+    for age in range(3):
+        for wall in np.flatnonzero(state[[6 + age, 9 + age]]):
+            key ^= keys.wall[age][wall]
+
+    return key
+
+
+def zobrist_update(key: int, keys: ZobristKeys, player: int, cells: Tuple[int, int, int], new_cell: int,
+                   walls: Tuple[int, int], new_wall: int) -> int:
+    """
+    执行动作后增量更新 Zobrist 哈希：走子玩家的位置历史后移一位，墙历史也后移一位
+    :param key: 执行动作前的哈希
+    :param keys: Zobrist 键
+    :param player: 走子玩家
+    :param cells: 走子玩家 当前、上一个、上上个 位置的格子编号，-1 代表没有
+    :param new_cell: 走子后的格子编号
+    :param walls: 最近一次、上一次放置的墙编号，-1 代表没有
+    :param new_wall: 新放置的墙编号
+    :return: 执行动作后的哈希
+    """
+    position = keys.position[player]
+    cell, last_cell, last_last_cell = cells
+    key ^= position[0][cell] ^ position[0][new_cell] ^ position[1][cell]
+    if last_cell >= 0:
+        key ^= position[1][last_cell] ^ position[2][last_cell]
+    if last_last_cell >= 0:
+        key ^= position[2][last_last_cell]
+
+    # 墙只增不减，第 k 个历史平面比原来多出的正是上一个平面最近放置的墙
+    last_wall, last_last_wall = walls
+    key ^= keys.wall[0][new_wall]
+    if last_wall >= 0:
+        key ^= keys.wall[1][last_wall]
+    if last_last_wall >= 0:
+        key ^= keys.wall[2][last_last_wall]
+
+    return key ^ keys.side
+
+
+def flood_fill(seed: int, horizontal_wall: int, vertical_wall: int, tables: BoardTables, target=0) -> int:
+    """
+    以位运算扩展区域，直到不再变化或者到达目标
+    :param seed: 起始区域掩码
+    :param horizontal_wall: 横向墙掩码
+    :param vertical_wall: 纵向墙掩码
+    :param tables: 预计算表
+    :param target: 目标掩码，区域一旦包含其中的格子就提前返回
+    :return: 可到达的格子掩码
+    """
+    n = tables.board_len
+    open_vertical = ~horizontal_wall
+    open_down = open_vertical & (tables.full_mask >> n)
+    open_horizontal = ~vertical_wall
+    open_right = open_horizontal & tables.not_last_col
+    not_first_col = tables.not_first_col
+    reach = seed
+    while not reach & target:
+        grown = (reach
+                 | ((reach & open_down) << n)
+                 | ((reach >> n) & open_vertical)
+                 | ((reach & open_right) << 1)
+                 | (((reach & not_first_col) >> 1) & open_horizontal))
+        if grown == reach:
+            break
+        reach = grown
+    return reach
+
+
+def separate(blue_pos: int, green_pos: int, horizontal_wall: int, vertical_wall: int,
+             tables: BoardTables) -> Tuple[bool, int, int]:
+    """
+    判断双方是否已被墙隔开。先从蓝方填充，一旦碰到绿方就提前返回；只有在被隔开时才需要再填充一次绿方区域
+    :param blue_pos: 蓝方所在格子编号
+    :param green_pos: 绿方所在格子编号
+    :param horizontal_wall: 横向墙掩码
+    :param vertical_wall: 纵向墙掩码
+    :param tables: 预计算表
+    :return: （是否隔开， 蓝方区域掩码， 绿方区域掩码），未隔开时区域掩码为 0
+    """
+    green_bit = 1 << green_pos
+    blue_territory = flood_fill(1 << blue_pos, horizontal_wall, vertical_wall, tables, target=green_bit)
+    if blue_territory & green_bit:
+        return False, 0, 0
+
+    green_territory = flood_fill(green_bit, horizontal_wall, vertical_wall, tables)
+    return True, blue_territory, green_territory
+
+
+def mask_to_positions(mask: int, tables: BoardTables) -> List[Tuple[int, int]]:
+    """
+    掩码中为 1 的格子坐标列表
+    :param mask: 掩码
+    :param tables: 预计算表
+    :return: 坐标列表，按行优先顺序
+    """
+    return [pos for cell, pos in enumerate(tables.cell_to_pos) if (mask >> cell) & 1]
+
+
+def generate_actions(pos: int, other_pos: int, horizontal_wall: int, vertical_wall: int,
+                     tables: BoardTables, step=3) -> List[int]:
+    """
+    生成可用动作，顺序与原先逐格 BFS 的顺序相同
+    :param pos: 当前玩家所在格子编号
+    :param other_pos: 对方所在格子编号
+    :param horizontal_wall: 横向墙掩码
+    :param vertical_wall: 纵向墙掩码
+    :param tables: 预计算表
+    :param step: 最大步数
+    :return: 动作列表
+    """
+    neighbours = tables.neighbours
+    walls = horizontal_wall | (vertical_wall << tables.n_cells)
+
+    # BFS，对方所在格子视为已访问
+    visited = (1 << pos) | (1 << other_pos)
+    order = [pos]
+    queue = order
+    for _ in range(step):
+        next_queue = []
+        for current in queue:
+            for nb, nb_bit, wall_bit in neighbours[current]:
+                if not (visited & nb_bit or walls & wall_bit):
+                    visited |= nb_bit
+                    next_queue.append(nb)
+        order = order + next_queue
+        queue = next_queue
+
+    slot_mask = tables.slot_mask
+    free_places = tables.free_places
+    place_actions = tables.place_actions
+    move_index = tables.move_index
+    base = pos * tables.n_cells
+
+    actions = []
+    for cell in order:
+        actions += place_actions[move_index[base + cell]][free_places[cell][walls & slot_mask[cell]]]
+
+    return actions
+
+
+def mask_to_array(mask: int, board_len: int) -> np.ndarray:
+    """
+    将掩码展开为 2D 数组
+    :param mask: 掩码
+    :param board_len: 棋盘边长
+    :return: 2D 数组
+    """
+    n_cells = board_len * board_len
+    if n_cells <= 63:
+        bits = (np.int64(mask) >> np.arange(n_cells, dtype=np.int64)) & 1
+    else:
+        bits = np.array([(mask >> i) & 1 for i in range(n_cells)], dtype=np.int64)
+    return bits.reshape(board_len, board_len)
+
+
+def array_to_mask(array: np.ndarray, board_len: int) -> int:
+    """
+    将 0/1 的 2D 数组压缩为掩码
+    :param array: 2D 数组
+    :param board_len: 棋盘边长
+    :return: 掩码
+    """
+    weights = get_board_tables(board_len).cell_weights
+    if weights is not None:
+        return int(array.ravel() @ weights)
+    return sum(1 << i for i, x in enumerate(array.ravel()) if x)
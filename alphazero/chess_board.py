@@ -6,6 +6,10 @@ import numpy as np
 import torch
 from numpy import ndarray
 
+from .board_tables import (get_board_tables, generate_actions, separate, array_to_mask, mask_to_positions,
+                           get_zobrist_keys, zobrist_hash, zobrist_update)
+from .distance import batch_distance_layers, layers_to_distances, pack_walls
+
 
 class ChessBoard:
     """
@@ -64,6 +68,19 @@ class ChessBoard:
 
         self.step_count = 0
 
+        # 撤销栈，每个元素为 push 前的局面
+        self.undo_stack = []
+
+        # 当前局面是否结束的缓存
+        self._game_over = None
+
+        # 特征平面的 Zobrist 哈希，执行动作时增量更新
+        self.zobrist_hash = zobrist_hash(self.state, self.board_len)
+
+        # 增量更新哈希用的 双方上一个、上上个位置 和 最近一次、上一次放置的墙编号，-1 代表没有
+        self.pos_history = ((-1, -1), (-1, -1))
+        self.last_walls = (-1, -1)
+
         self.player_pos = self.get_player_pos()
 
         self.available_actions = self.get_available_actions()
@@ -77,6 +94,15 @@ class ChessBoard:
         return [self.array_to_only_coordinate(self.state[0]),
                 self.array_to_only_coordinate(self.state[3])]
 
+    @property
+    def current_player(self) -> int:
+        """ 该谁走了，0 代表蓝方，1 代表绿方 """
+        return int(self.state[12, 0, 0])
+
+    def get_wall_masks(self) -> Tuple[int, int]:
+        """ 当前的横向墙掩码和纵向墙掩码 """
+        return array_to_mask(self.state[6], self.board_len), array_to_mask(self.state[9], self.board_len)
+
     def clear_board(self):
         """ 清空棋盘 """
         self.state = np.zeros((self.n_feature_planes, self.board_len, self.board_len))
@@ -84,21 +110,57 @@ class ChessBoard:
         self.state[3, self.board_len - 1, self.board_len - 1] = 1
 
         self.step_count = 0
+        self.undo_stack = []
+        self._game_over = None
+        self.zobrist_hash = zobrist_hash(self.state, self.board_len)
+        self.pos_history = ((-1, -1), (-1, -1))
+        self.last_walls = (-1, -1)
 
         self.player_pos = self.get_player_pos()
         self.available_actions = self.get_available_actions()
 
-    def do_action(self, action: int, update_available_actions=True):
+    def push(self, action: int):
+        """
+        执行动作并记录撤销信息，之后可以用 `pop` 撤销
+        :param action: 动作，范围为 0 ~ 99
+        """
+        # do_action 只会丢弃最老的位置历史和墙历史，其余平面都可以从历史平面中恢复
+        oldest = (2, 8, 11) if self.state[12, 0, 0] == 0 else (5, 8, 11)
+        record = (self.state[oldest, :, :], self.player_pos, self.available_actions, self.step_count,
+                  self._game_over, self.zobrist_hash, self.pos_history, self.last_walls)
+        self.do_action(action)
+        self.undo_stack.append(record)
+
+    def pop(self):
+        """ 撤销最近一次 `push` 的动作 """
+        (oldest_planes, self.player_pos, self.available_actions, self.step_count,
+         self._game_over, self.zobrist_hash, self.pos_history, self.last_walls) = self.undo_stack.pop()
+
+        # 撤销谁该走、位置和墙
+        self.state[12] = 1 - self.state[12]
+        first = 0 if self.state[12, 0, 0] == 0 else 3
+        for i, plane in zip((first, 6, 9), oldest_planes):
+            self.state[i] = self.state[i + 1]
+            self.state[i + 1] = self.state[i + 2]
+            self.state[i + 2] = plane
+
+    def do_action(self, action: int, update_available_actions=True, check_legality=True):
         """
         执行动作
         :param update_available_actions:
         :param action: 动作，范围为 0 ~ 99
+        :param check_legality: 是否检查动作合法，重放可信的棋谱时可以关闭，与 `update_available_actions=False` 一起使用
         :return:
         """
         # 判断合法性
-        if action not in self.available_actions:
+        if check_legality and action not in self.available_actions:
             raise ValueError(f'Illegal action {action}')
 
+        # 记录增量更新哈希所需的位置历史
+        active_player = int(self.state[12, 0, 0])
+        row, col = self.player_pos[active_player]
+        cells = (row * self.board_len + col, *self.pos_history[active_player])
+
         # 更新过去历史
         # 仅在轮到某玩家走时更新位置历史
         if self.state[12, 0, 0] == 0:
@@ -117,8 +179,6 @@ class ChessBoard:
         move = action // 4
         wall = action % 4
 
-        active_player = int(self.state[12, 0, 0])
-
         # 更新当前位置
         self.state[0 if active_player == 0 else 3] = self.coordinates_to_array(
             [(self.action_to_pos[move][0] + self.player_pos[active_player][0],
@@ -143,9 +203,22 @@ class ChessBoard:
 
         # 更新谁该走、合法位置
         self.state[12] = np.ones((self.board_len, self.board_len)) - self.state[12]
+        self._game_over = None
         if update_available_actions:
             self.available_actions = self.get_available_actions()
 
+        row, col = self.player_pos[active_player]
+        cell = row * self.board_len + col
+        is_horizontal, bit = get_board_tables(self.board_len).wall_effects[cell * 4 + wall]
+        new_wall = bit.bit_length() - 1 + (0 if is_horizontal else self.board_len ** 2)
+        self.zobrist_hash = zobrist_update(self.zobrist_hash, get_zobrist_keys(self.board_len), active_player, cells,
+                                           cell, self.last_walls, new_wall)
+
+        history = self.pos_history
+        self.pos_history = ((cells[0], cells[1]), history[1]) if active_player == 0 else \
+            (history[0], (cells[0], cells[1]))
+        self.last_walls = (new_wall, self.last_walls[0])
+
         self.step_count += 1
 
     def is_game_over(self) -> Tuple[bool, int]:
@@ -153,38 +226,39 @@ class ChessBoard:
         判断游戏是否结束
         :return: （是否结束， 胜利者） 胜利者为 0 代表 X 胜利， 1 代表 O 胜利， None 代表平局
         """
+        is_over, x_territory, o_territory = self._separation()
+        if not is_over:
+            return False, -1
 
-        if not self.reachable_destination(self.state[0], self.state[3], self.state[6], self.state[9]):
-
-            x_territory = self.reachable_positions(self.state[0], self.state[3],
-                                                   self.state[6], self.state[9],
-                                                   ignore_other_player=True, step=self.board_len ** 2)
-            o_territory = self.reachable_positions(self.state[3], self.state[0],
-                                                   self.state[6], self.state[9],
-                                                   ignore_other_player=True, step=self.board_len ** 2)
-            return True, 0 if len(x_territory) > len(o_territory) else 1 if len(x_territory) < len(
-                o_territory) else None
-
-        return False, -1
+        x_size = x_territory.bit_count()
+        o_size = o_territory.bit_count()
+        return True, 0 if x_size > o_size else 1 if x_size < o_size else None
 
-    def is_game_over_(self) -> tuple[bool, list[list[int, int]], list[list[int, int]]] | tuple[bool, None, None]:
+    def is_game_over_(self) -> tuple[bool, list[tuple[int, int]], list[tuple[int, int]]] | tuple[bool, None, None]:
         """
         判断游戏是否结束
         :return: （是否结束， X玩家可到达的位置， O玩家可到达的位置）
         """
+        is_over, x_territory, o_territory = self._separation()
+        if not is_over:
+            return False, None, None
 
-        if self.player_pos[1] not in self.reachable_positions(self.state[0], self.state[3],
-                                                              self.state[6], self.state[9],
-                                                              ignore_other_player=True, step=self.board_len ** 2):
-            x_territory = self.reachable_positions(self.state[0], self.state[3],
-                                                   self.state[6], self.state[9],
-                                                   ignore_other_player=True, step=self.board_len ** 2)
-            o_territory = self.reachable_positions(self.state[3], self.state[0],
-                                                   self.state[6], self.state[9],
-                                                   ignore_other_player=True, step=self.board_len ** 2)
-            return True, x_territory, o_territory
+        tables = get_board_tables(self.board_len)
+        return True, mask_to_positions(x_territory, tables), mask_to_positions(o_territory, tables)
 
-        return False, None, None
+    def _separation(self) -> Tuple[bool, int, int]:
+        """
+        用位掩码洪水填充判断双方是否被隔开，结果在同一局面内缓存，重复查询不再计算
+        :return: （是否隔开， X玩家区域掩码， O玩家区域掩码）
+        """
+        if self._game_over is None:
+            n = self.board_len
+            self._game_over = separate(self.player_pos[0][0] * n + self.player_pos[0][1],
+                                       self.player_pos[1][0] * n + self.player_pos[1][1],
+                                       array_to_mask(self.state[6], n),
+                                       array_to_mask(self.state[9], n),
+                                       get_board_tables(n))
+        return self._game_over
 
     def get_feature_planes(self) -> torch.Tensor:
         """
@@ -196,23 +270,19 @@ class ChessBoard:
 
     def get_available_actions(self) -> List[int]:
         """
-        获取当前可用动作
+        获取当前可用动作，使用预计算的走子表和墙的掩码生成
         :return: 动作列表
         """
-        active_player_pos = self.state[0] if self.state[12, 0, 0] == 0 else self.state[3]
-        passive_player_pos = self.state[3] if self.state[12, 0, 0] == 0 else self.state[0]
-        horizontal_wall = self.state[6]
-        vertical_wall = self.state[9]
-
-        available_move = []
-
-        pos = self.player_pos[int(self.state[12, 0, 0])]
-        for next_pos in self.reachable_positions(active_player_pos, passive_player_pos, horizontal_wall, vertical_wall):
-            for wall in range(4):
-                if self.placeable(next_pos, wall, horizontal_wall, vertical_wall):
-                    available_move.append(self.pos_to_action[(next_pos[0] - pos[0], next_pos[1] - pos[1])] * 4 + wall)
+        tables = get_board_tables(self.board_len)
+        active_player = int(self.state[12, 0, 0])
+        pos = self.player_pos[active_player]
+        other_pos = self.player_pos[1 - active_player]
 
-        return available_move
+        return generate_actions(pos[0] * self.board_len + pos[1],
+                                other_pos[0] * self.board_len + other_pos[1],
+                                array_to_mask(self.state[6], self.board_len),
+                                array_to_mask(self.state[9], self.board_len),
+                                tables)
 
     def reachable_positions(self, pos, other_player_pos, horizontal_wall, vertical_wall, step=3,
                             ignore_other_player=False) -> list[int | Any]:
@@ -306,49 +376,17 @@ class ChessBoard:
 
     def distance(self, pos, other_player_pos, horizontal_wall, vertical_wall) -> ndarray:
         """
-        可到达的位置，采用BFS遍历
+        到每个格子的距离，用位掩码逐层 BFS，同时计算双方距离时使用 `DistanceMaps`
         :param pos: 起始位置， one-hot编码
-        :param other_player_pos: 对方位置， one-hot编码
+        :param other_player_pos: 对方位置， one-hot编码，不可经过
         :param horizontal_wall: 横向墙， one-hot编码
         :param vertical_wall: 纵向墙， one-hot编码
-        :return: 可到达的位置列表
+        :return: 距离， 不可到达为 -1
         """
-
-        pos = self.array_to_only_coordinate(pos)
-
-        step = self.board_len ** 2
-
-        territory = np.ones((self.board_len, self.board_len)) * -1
-
-        queue = [pos]
-        visited = [pos]
-        for i in range(step):
-            for j in range(len(queue)):
-                current = queue.pop(0)
-                territory[current] = i
-
-                if current[0] - 1 >= 0 and horizontal_wall[current[0] - 1][current[1]] == 0 and \
-                        (current[0] - 1, current[1]) not in visited and not other_player_pos[
-                    current[0] - 1, current[1]]:
-                    queue.append((current[0] - 1, current[1]))
-                    visited.append((current[0] - 1, current[1]))
-                if current[1] - 1 >= 0 and vertical_wall[current[0]][current[1] - 1] == 0 and \
-                        (current[0], current[1] - 1) not in visited and not other_player_pos[
-                    current[0], current[1] - 1]:
-                    queue.append((current[0], current[1] - 1))
-                    visited.append((current[0], current[1] - 1))
-                if current[0] + 1 < self.board_len and horizontal_wall[current[0]][current[1]] == 0 and \
-                        (current[0] + 1, current[1]) not in visited and not other_player_pos[
-                    current[0] + 1, current[1]]:
-                    queue.append((current[0] + 1, current[1]))
-                    visited.append((current[0] + 1, current[1]))
-                if current[1] + 1 < self.board_len and vertical_wall[current[0]][current[1]] == 0 and \
-                        (current[0], current[1] + 1) not in visited and not other_player_pos[
-                    current[0], current[1] + 1]:
-                    queue.append((current[0], current[1] + 1))
-                    visited.append((current[0], current[1] + 1))
-
-        return territory
+        n = self.board_len
+        walls = pack_walls(array_to_mask(horizontal_wall, n), array_to_mask(vertical_wall, n), n, 1)
+        layers = batch_distance_layers(array_to_mask(pos, n), array_to_mask(other_player_pos, n), walls)
+        return layers_to_distances(layers, 1, n * n).reshape(n, n).astype(float)
 
     def placeable(self, pos, place, horizontal_wall, vertical_wall) -> bool:
         """
@@ -0,0 +1,321 @@
+# coding: utf-8
+from collections import namedtuple
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+from .board_tables import BoardTables, get_board_tables
+
+# 每个棋盘在拼接后的大整数中占 64 位
+STRIDE = 64
+
+ActionDistances = namedtuple('ActionDistances', ['actions', 'mine', 'theirs', 'is_over', 'outcome'])
+
+PackedTables = namedtuple('PackedTables', ['full_mask', 'not_first_col', 'not_last_col', 'not_last_row'])
+
+
+@lru_cache(maxsize=None)
+def get_packed_tables(board_len: int, n_boards: int) -> PackedTables:
+    """
+    把单个棋盘的边界掩码复制 `n_boards` 份，第 k 个棋盘位于第 `k * STRIDE` 位开始的 64 位中。
+    每个棋盘只用低 `n_cells` 位，移位时越过边界的比特都会被这些掩码清掉，不会串到相邻棋盘
+    :param board_len: 棋盘边长
+    :param n_boards: 棋盘个数
+    :return: PackedTables
+    """
+    tables = get_board_tables(board_len)
+    if tables.n_cells > STRIDE:
+        raise ValueError(f'棋盘格子数不能超过 {STRIDE}')
+
+    def repeat(mask: int) -> int:
+        return int.from_bytes(np.full(n_boards, mask, dtype=np.uint64).tobytes(), 'little')
+
+    return PackedTables(repeat(tables.full_mask), repeat(tables.not_first_col), repeat(tables.not_last_col),
+                        repeat(tables.full_mask >> board_len))
+
+
+def pack_masks(masks) -> int:
+    """
+    把每个棋盘的掩码拼接成一个大整数
+    :param masks: 每个棋盘的掩码，不超过 64 位
+    :return: 拼接后的掩码
+    """
+    return int.from_bytes(np.asarray(masks, dtype=np.uint64).tobytes(), 'little')
+
+
+def unpack_bits(mask: int, n_boards: int, n_cells: int) -> np.ndarray:
+    """
+    把拼接后的掩码展开为每个棋盘每个格子一个布尔值
+    :param mask: 拼接后的掩码
+    :param n_boards: 棋盘个数
+    :param n_cells: 每个棋盘的格子数
+    :return: np.ndarray of shape (n_boards, n_cells)
+    """
+    data = np.frombuffer(mask.to_bytes(n_boards * STRIDE // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(data, bitorder='little').reshape(n_boards, STRIDE)[:, :n_cells].view(bool)
+
+
+PackedWalls = namedtuple('PackedWalls', ['open_down', 'open_vertical', 'open_right', 'open_horizontal',
+                                         'not_first_col', 'full_mask', 'board_len'])
+
+
+def pack_walls(horizontal_walls: int, vertical_walls: int, board_len: int, n_boards: int) -> PackedWalls:
+    """
+    由拼接后的墙掩码计算每个方向可以通过的格子
+    :param horizontal_walls: 每个棋盘的横向墙掩码
+    :param vertical_walls: 每个棋盘的纵向墙掩码
+    :param board_len: 棋盘边长
+    :param n_boards: 棋盘个数
+    :return: PackedWalls
+    """
+    packed = get_packed_tables(board_len, n_boards)
+    open_vertical = ~horizontal_walls & packed.full_mask
+    open_horizontal = ~vertical_walls & packed.full_mask
+    return PackedWalls(open_vertical & packed.not_last_row, open_vertical, open_horizontal & packed.not_last_col,
+                       open_horizontal, packed.not_first_col, packed.full_mask, board_len)
+
+
+def expand(frontier: int, walls: PackedWalls) -> int:
+    """ 所有棋盘的边界同时向四周扩展一步，不包含原来的边界 """
+    n = walls.board_len
+    return (((frontier & walls.open_down) << n)
+            | ((frontier >> n) & walls.open_vertical)
+            | ((frontier & walls.open_right) << 1)
+            | (((frontier & walls.not_first_col) >> 1) & walls.open_horizontal))
+
+
+def batch_distance_layers(seeds: int, blocked: int, walls: PackedWalls) -> List[int]:
+    """
+    对拼接在一起的多个棋盘同时做逐层 BFS，每层用一次位运算扩展所有棋盘的边界
+    :param seeds: 每个棋盘的起点掩码
+    :param blocked: 每个棋盘不能经过的格子掩码
+    :param walls: `pack_walls` 的结果
+    :return: 第 d 个元素为所有棋盘中距离为 d 的格子掩码
+    """
+    allowed = walls.full_mask & ~blocked
+    layers = [seeds]
+    visited = frontier = seeds
+    while True:
+        frontier = expand(frontier, walls) & allowed & ~visited
+        if not frontier:
+            return layers
+        layers.append(frontier)
+        visited |= frontier
+
+
+def layers_to_distances(layers: List[int], n_boards: int, n_cells: int) -> np.ndarray:
+    """
+    由 BFS 的各层掩码得到距离，所有层一次展开
+    :param layers: `batch_distance_layers` 的结果
+    :param n_boards: 棋盘个数
+    :param n_cells: 每个棋盘的格子数
+    :return: np.ndarray of shape (n_boards, n_cells), dtype int8，不可到达为 -1
+    """
+    n_bytes = n_boards * STRIDE // 8
+    data = np.frombuffer(b''.join(layer.to_bytes(n_bytes, 'little') for layer in layers), dtype=np.uint8)
+    bits = np.unpackbits(data, bitorder='little').reshape(len(layers), -1)
+
+    # 每个格子至多在一层中出现，距离为层号的加权和，一层都不在时为 -1
+    distances = np.arange(1, len(layers) + 1, dtype=np.int8) @ bits - 1
+    return distances.astype(np.int8).reshape(n_boards, STRIDE)[:, :n_cells]
+
+
+def popcounts(mask: int, n_boards: int) -> np.ndarray:
+    """ 每个棋盘的掩码中 1 的个数 """
+    data = np.frombuffer(mask.to_bytes(n_boards * STRIDE // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(data).reshape(n_boards, STRIDE).sum(axis=1, dtype=np.int64)
+
+
+@lru_cache(maxsize=None)
+def get_action_effects(board_len: int):
+    """
+    动作对应的格子编号增量和新放置的墙，供 `evaluate_actions` 批量查表
+    :param board_len: 棋盘边长
+    :return: （格子编号增量，`(是否横向墙, 墙的比特)` 数组），按移动编号和 `cell * 4 + place` 索引
+    """
+    tables = get_board_tables(board_len)
+    move_delta = np.asarray(tables.move_delta, dtype=np.int64)
+    wall_effects = np.asarray(tables.wall_effects, dtype=np.uint64)
+    return move_delta, wall_effects
+
+
+def evaluate_actions(board, actions: List[int] = None) -> ActionDistances:
+    """
+    对当前玩家的每个候选动作，计算执行后双方到每个格子的距离和游戏是否结束。
+    所有动作执行后的棋盘拼接成一个大整数，一次 BFS 同时得到所有棋盘的距离，不需要复制棋盘
+    :param board: ChessBoard 或 BitBoard
+    :param actions: 候选动作，默认为当前所有可用动作
+    :return: ActionDistances
+        * `actions`: 候选动作
+        * `mine`: np.ndarray of shape (n_actions, n_cells), dtype int8，走子方到每个格子的距离，对方所在格子不可经过
+        * `theirs`: 同上，对方到每个格子的距离，走子方执行动作后所在的格子不可经过
+        * `is_over`: np.ndarray of shape (n_actions, ), 执行动作后游戏是否结束
+        * `outcome`: np.ndarray of shape (n_actions, ), 结束时走子方赢为 1，输为 -1，平局为 0，未结束为 0
+    """
+    actions = list(board.available_actions if actions is None else actions)
+    n = board.board_len
+    tables = get_board_tables(n)  # type:BoardTables
+    n_cells = tables.n_cells
+    n_boards = len(actions)
+
+    player = board.current_player
+    player_pos = board.get_player_pos()
+    (r, c), (other_r, other_c) = player_pos[player], player_pos[1 - player]
+    pos, other_pos = r * n + c, other_r * n + other_c
+    horizontal_wall, vertical_wall = board.get_wall_masks()
+
+    # 每个动作执行后走子方的位置和新放的墙
+    move_delta, wall_effects = get_action_effects(n)
+    action_array = np.asarray(actions, dtype=np.int64)
+    cells = pos + move_delta[action_array // 4]
+    effects = wall_effects[cells * 4 + action_array % 4]
+    is_horizontal = effects[:, 0].astype(bool)
+    new_walls = effects[:, 1]
+
+    ones = np.ones(n_boards, dtype=np.uint64)
+    my_seeds = pack_masks(ones << cells.astype(np.uint64))
+    their_seeds = pack_masks(ones << np.uint64(other_pos))
+    horizontal_walls = pack_masks(np.where(is_horizontal, new_walls, 0) | np.uint64(horizontal_wall))
+    vertical_walls = pack_masks(np.where(is_horizontal, 0, new_walls) | np.uint64(vertical_wall))
+
+    walls = pack_walls(horizontal_walls, vertical_walls, n, n_boards)
+    my_layers = batch_distance_layers(my_seeds, their_seeds, walls)
+    their_layers = batch_distance_layers(their_seeds, my_seeds, walls)
+
+    # 走子方的区域再向外扩展一步碰到对方，说明双方仍然连通
+    my_region = their_region = 0
+    for layer in my_layers:
+        my_region |= layer
+    for layer in their_layers:
+        their_region |= layer
+    is_over = popcounts(expand(my_region, walls) & their_seeds, n_boards) == 0
+
+    # 隔开后双方区域就是各自的领地
+    outcome = np.sign(popcounts(my_region, n_boards) - popcounts(their_region, n_boards))
+    outcome = np.where(is_over, outcome, 0)
+
+    mine = layers_to_distances(my_layers, n_boards, n_cells)
+    theirs = layers_to_distances(their_layers, n_boards, n_cells)
+    return ActionDistances(actions, mine, theirs, is_over, outcome)
+
+
+def relative_territory(my_distance: np.ndarray, enemy_distance: np.ndarray, terr_function):
+    """
+    由双方的距离计算双方的领地，最后一维为格子
+    :param my_distance: 走子方到每一格的距离
+    :param enemy_distance: 对方到每一格的距离
+    :param terr_function: 对数组逐元素计算的 距离 -> 领地 函数
+    :return: （走子方领地， 对方领地， 除去双方都不能到达的格子后的格子数）
+    """
+    my_reachable = my_distance >= 0
+    enemy_unreachable = enemy_distance == -1
+
+    # 对方无法到达的位置，自己可以到达时为自己的领地；对方可以到达、自己无法到达的位置为对方的领地
+    active_player_terr = np.where(enemy_unreachable, my_reachable,
+                                  np.where(my_reachable, terr_function(my_distance, enemy_distance), 0))
+    inactive_player_terr = np.where(enemy_unreachable, 0,
+                                    np.where(my_reachable, terr_function(enemy_distance, my_distance), 1))
+
+    # 双方都无法到达的格子不计入
+    all_terr = my_distance.shape[-1] - (enemy_unreachable & ~my_reachable).sum(axis=-1)
+    return active_player_terr.sum(axis=-1), inactive_player_terr.sum(axis=-1), all_terr
+
+
+class DistanceMaps:
+    """
+    双方到每个格子的 BFS 距离。双方拼接成两个棋盘，一次逐层位运算 BFS 同时算出，对方所在格子不可经过。
+    墙只增不减，加一面墙时只有这面墙位于某一方的最短路上、且远端格子没有其他最短路时才重新计算这一方
+    """
+
+    def __init__(self, board_len: int, pos: Tuple[int, int], horizontal_wall: int, vertical_wall: int):
+        """
+        :param board_len: 棋盘边长
+        :param pos: 蓝方和绿方所在的格子编号
+        :param horizontal_wall: 横向墙掩码
+        :param vertical_wall: 纵向墙掩码
+        """
+        self.board_len = board_len
+        self.tables = get_board_tables(board_len)  # type:BoardTables
+        self.pos = tuple(pos)
+        self.horizontal_wall = horizontal_wall
+        self.vertical_wall = vertical_wall
+        self.n_recomputes = 0
+
+        # distances[player] 为该玩家到每个格子的距离，不可到达为 -1
+        self.distances = np.full((2, self.tables.n_cells), -1, dtype=np.int8)
+        self.__recompute((0, 1))
+
+    @classmethod
+    def from_board(cls, board) -> 'DistanceMaps':
+        """
+        由棋盘创建
+        :param board: ChessBoard 或 BitBoard
+        :return: DistanceMaps
+        """
+        n = board.board_len
+        pos = tuple(r * n + c for r, c in board.get_player_pos())
+        return cls(n, pos, *board.get_wall_masks())
+
+    def maps(self) -> np.ndarray:
+        """ 双方的距离图，np.ndarray of shape (2, board_len, board_len)，dtype int8 """
+        return self.distances.reshape(2, self.board_len, self.board_len)
+
+    def add_wall(self, is_horizontal: bool, cell: int):
+        """
+        增量地加入一面墙
+        :param is_horizontal: 是否为横向墙
+        :param cell: 墙所在的格子编号，横向墙隔开 `cell` 和下方的格子，纵向墙隔开 `cell` 和右侧的格子
+        """
+        if is_horizontal:
+            self.horizontal_wall |= 1 << cell
+            other = cell + self.board_len
+        else:
+            self.vertical_wall |= 1 << cell
+            other = cell + 1
+
+        walls = self.horizontal_wall | self.vertical_wall << self.tables.n_cells
+        stale = []
+        for player, distance in enumerate(self.distances):
+            d, d_other = int(distance[cell]), int(distance[other])
+            if d < 0 or d_other < 0 or abs(d - d_other) != 1:
+                continue
+
+            # 远端格子还有其他距离少一的相邻格子时，所有距离都不变
+            far = other if d_other > d else cell
+            target = distance[far] - 1
+            if not any(distance[nb] == target and not walls & wall_bit
+                       for nb, _, wall_bit in self.tables.neighbours[far]):
+                stale.append(player)
+
+        if stale:
+            self.__recompute(tuple(stale))
+
+    def move(self, player: int, cell: int):
+        """ 移动一方到 `cell`，双方的距离都会改变，重新计算 """
+        pos = list(self.pos)
+        pos[player] = cell
+        self.pos = tuple(pos)
+        self.__recompute((0, 1))
+
+    def is_separated(self) -> bool:
+        """ 双方是否已被墙隔开，即蓝方能到达的格子都不与绿方相邻 """
+        walls = self.horizontal_wall | self.vertical_wall << self.tables.n_cells
+        return not any(self.distances[0, nb] >= 0 and not walls & wall_bit
+                       for nb, _, wall_bit in self.tables.neighbours[self.pos[1]])
+
+    def reachable_positions(self, player: int) -> List[Tuple[int, int]]:
+        """ 一方可以到达的格子坐标，按行优先顺序，双方隔开后即为该方的领地 """
+        return [self.tables.cell_to_pos[cell] for cell in np.flatnonzero(self.distances[player] >= 0)]
+
+    def __recompute(self, players: Tuple[int, ...]):
+        """ 重新计算若干玩家的距离，两个玩家时拼接成两个棋盘一起计算 """
+        n_cells = self.tables.n_cells
+        n_boards = len(players)
+        seeds = pack_masks([1 << self.pos[player] for player in players])
+        blocked = pack_masks([1 << self.pos[1 - player] for player in players])
+        walls = pack_walls(pack_masks([self.horizontal_wall] * n_boards), pack_masks([self.vertical_wall] * n_boards),
+                           self.board_len, n_boards)
+        distances = layers_to_distances(batch_distance_layers(seeds, blocked, walls), n_boards, n_cells)
+        self.distances[list(players)] = distances
+        self.n_recomputes += 1
@@ -0,0 +1,158 @@
+# coding: utf-8
+import json
+import os
+import re
+from itertools import islice
+from typing import Any, Iterator, List
+
+from .sample_store import SampleStore
+
+# 数组元素之间的空白和逗号
+_SEPARATOR = re.compile(r'[\s,]*')
+
+
+def iter_records(path: str, chunk_size=1 << 16) -> Iterator[Any]:
+    """ 逐个读取记录文件中的记录，不把整个文件载入内存
+
+    支持以下格式：
+    * JSON Lines：每行一条记录
+    * 旧的 JSON 数组：整个文件是一个数组，每个元素一条记录，例如训练时保存的 `games.json` 和 `train_losses.json`。
+      左括号后紧跟换行、数组或对象时是旧格式，只有 `[]` 的文件是空数组
+    * `.abc` 文件：`BoardWidget.onSave` 保存的单局棋谱，整个文件是一条记录
+
+    Parameters
+    ----------
+    path: str
+        文件路径
+
+    chunk_size: int
+        每次从文件中读取的字符数
+
+    Yields
+    ------
+    record: Any
+        解析后的记录
+    """
+    if path.endswith('.abc'):
+        with open(path, encoding='utf-8') as f:
+            yield json.load(f)
+        return
+
+    with open(path, encoding='utf-8') as f:
+        is_array, head = _detect_json_array(f, f.read(chunk_size), chunk_size)
+        if is_array:
+            yield from _iter_json_array(f, head.lstrip()[1:], chunk_size)
+        else:
+            yield from _iter_json_lines(f, head)
+
+
+def iter_games(path: str) -> Iterator[List[int]]:
+    """ 逐局读取棋谱
+
+    Parameters
+    ----------
+    path: str
+        记录文件或文件夹。文件的格式见 `iter_records`，记录可以是动作列表，也可以是含 `Moves` 字段的对象；
+        文件夹中有 `meta.json` 时作为 `SampleStore` 样本库读取，否则按文件名顺序读取其中所有的 `.abc` 文件
+
+    Yields
+    ------
+    game: List[int]
+        一局的动作列表
+    """
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            yield from SampleStore(path).iter_actions()
+        else:
+            for name in sorted(os.listdir(path)):
+                if name.endswith('.abc'):
+                    yield from iter_games(os.path.join(path, name))
+        return
+
+    for record in iter_records(path):
+        yield record['Moves'] if isinstance(record, dict) else record
+
+
+def load_game(path: str, index: int) -> List[int]:
+    """ 读取第 `index` 局棋谱，只解析到这一局为止 """
+    game = next(islice(iter_games(path), index, None), None)
+    if game is None:
+        raise IndexError(f'{path} 中没有第 {index} 局')
+    return game
+
+
+def write_records(path: str, records, mode='a'):
+    """ 以 JSON Lines 格式写入记录，默认追加到文件末尾 """
+    with open(path, mode, encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+
+
+def _detect_json_array(f, head: str, chunk_size: int):
+    """ 根据第一行判断文件是否为旧的 JSON 数组，返回（是否为旧格式， 已经读出的开头部分）
+
+    JSON Lines 的一行是一局棋谱、对象或者 `[序号, 损失]`，左括号后面是数字或者 `]`，
+    旧格式的左括号后面是换行或者数组、对象元素。`[]` 后面还有内容时是第一局为空的 JSON Lines
+    """
+    while True:
+        stripped = head.lstrip()
+        if stripped and not stripped.startswith('['):
+            return False, head
+
+        after = stripped[1:].lstrip(' \t\r')
+        if after[:1] in ('\n', '[', '{'):
+            return True, head
+        if after and not (after.startswith(']') and not after[1:].strip()):
+            return False, head
+
+        # 还不能判断时继续读，读到文件末尾时只剩下空文件和空数组两种情况
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return bool(stripped), head
+        head += chunk
+
+
+def _iter_json_lines(f, buffer: str) -> Iterator[Any]:
+    """ 逐行解析 JSON Lines，`buffer` 为已经读出的开头部分 """
+    lines = buffer.split('\n')
+    rest = lines.pop()
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+    # 文件剩余部分逐行读取，第一行接上缓冲区里不完整的一行
+    for line in f:
+        line, rest = rest + line, ''
+        if line.strip():
+            yield json.loads(line)
+
+    if rest.strip():
+        yield json.loads(rest)
+
+
+def _iter_json_array(f, buffer: str, chunk_size: int) -> Iterator[Any]:
+    """ 逐个解析 JSON 数组的元素，`buffer` 为左括号之后已经读出的部分 """
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        pos = _SEPARATOR.match(buffer, pos).end()
+        if buffer.startswith(']', pos):
+            return
+
+        try:
+            # 数组和对象被截断时一定会解析失败，数字等标量被截断时恰好停在缓冲区末尾，都要再读一块
+            record, end = decoder.raw_decode(buffer, pos)
+            is_truncated = end == len(buffer)
+        except json.JSONDecodeError:
+            is_truncated = True
+
+        if is_truncated:
+            chunk = f.read(chunk_size)
+            if chunk:
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            record, end = decoder.raw_decode(buffer, pos)
+
+        pos = end
+        yield record
@@ -0,0 +1,224 @@
+# coding: utf-8
+import multiprocessing
+import queue
+import time
+from typing import List, Optional
+
+import numpy as np
+import torch
+
+from .chess_board import ChessBoard
+from .policy_value_net import PolicyValueNet
+
+
+class InferenceClient:
+    """ 推理服务器的客户端
+
+    特征平面写入共享内存中属于自己的槽位，请求队列中只传递槽位编号和局面数，
+    接口与 `PolicyValueNet` 的 `predict` 和 `predict_batch` 相同，可以直接交给 `AlphaZeroMCTS` 使用
+    """
+
+    def __init__(self, worker_id: int, request_queue, response_queue, feature_planes: torch.Tensor,
+                 probs: torch.Tensor, values: torch.Tensor, keys: torch.Tensor):
+        """
+        Parameters
+        ----------
+        worker_id: int
+            槽位编号
+
+        request_queue: Queue
+            所有客户端共用的请求队列
+
+        response_queue: SimpleQueue
+            服务器通知该客户端结果已写好的队列
+
+        feature_planes, probs, values, keys: Tensor
+            共享内存中的输入特征平面、输出先验概率、输出估值和局面哈希
+        """
+        self.worker_id = worker_id
+        self.request_queue = request_queue
+        self.response_queue = response_queue
+        self.feature_planes = feature_planes
+        self.probs = probs
+        self.values = values
+        self.keys = keys
+        self.max_leaves = feature_planes.shape[1]
+
+    def predict(self, chess_board: ChessBoard):
+        """ 获取当前局面上所有可用 `action` 和他对应的先验概率 `P(s, a)`，以及局面的 `value` """
+        probs, values = self.predict_batch(chess_board.get_feature_planes().unsqueeze(0),
+                                           [chess_board.available_actions], [chess_board.zobrist_hash])
+        return probs[0], float(values[0])
+
+    def predict_batch(self, feature_planes: torch.Tensor, available_actions_list: List[List[int]],
+                      keys: Optional[List[int]] = None):
+        """ 请求服务器计算多个局面的先验概率和估值，参数与返回值同 `PolicyValueNet.predict_batch` """
+        probs_list, values = [], []
+        for start in range(0, len(feature_planes), self.max_leaves):
+            end = min(start + self.max_leaves, len(feature_planes))
+            batch_keys = keys[start:end] if keys is not None else None
+            probs, batch_values = self.__request(feature_planes[start:end], batch_keys)
+            probs_list.extend(probs[i, actions] for i, actions in enumerate(available_actions_list[start:end]))
+            values.append(batch_values)
+
+        return probs_list, np.concatenate(values)
+
+    def __request(self, feature_planes: torch.Tensor, keys: Optional[List[int]]):
+        """ 发送一次请求并等待结果 """
+        n = len(feature_planes)
+        worker_id = self.worker_id
+        self.feature_planes[worker_id, :n] = feature_planes
+        if keys is not None:
+            # 哈希为 64 位无符号整数，转换为有符号整数存放
+            self.keys[worker_id, :n] = torch.tensor([key - (1 << 64) if key >> 63 else key for key in keys])
+
+        self.request_queue.put(('predict', worker_id, n, keys is not None))
+        self.response_queue.get()
+        return self.probs[worker_id, :n].numpy().copy(), self.values[worker_id, :n].numpy().copy()
+
+
+class InferenceServer:
+    """ 推理服务器
+
+    单独的估值进程持有唯一一份策略-价值网络，把所有自我博弈进程的请求合并成一批前馈，
+    攒够 `max_batch_size` 个局面或者等待超过 `max_wait` 秒就开始计算
+    """
+
+    def __init__(self, policy_value_net: PolicyValueNet, n_workers: int, max_batch_size=64, max_wait=1e-3,
+                 max_leaves=8, evaluation_cache_size=0):
+        """
+        Parameters
+        ----------
+        policy_value_net: PolicyValueNet
+            策略价值网络，会复制一份到估值进程
+
+        n_workers: int
+            客户端个数
+
+        max_batch_size: int
+            一次前馈的最大局面数
+
+        max_wait: float
+            收到第一个请求后最多等待多少秒再开始前馈
+
+        max_leaves: int
+            每个客户端一次请求的最大局面数，超过时客户端会拆成多次请求
+
+        evaluation_cache_size: int
+            估值进程中估值缓存最多保存的局面数，所有客户端共享，为 0 时不使用缓存
+        """
+        self.policy_value_net = policy_value_net
+        self.n_workers = n_workers
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.evaluation_cache_size = evaluation_cache_size
+
+        n = policy_value_net.board_len
+        policy_dim = policy_value_net.policy_head.fc.out_features
+        ctx = multiprocessing.get_context('spawn')
+        self.request_queue = ctx.Queue()
+        self.response_queues = [ctx.SimpleQueue() for _ in range(n_workers)]
+        self.feature_planes = torch.zeros(n_workers, max_leaves, policy_value_net.n_feature_planes, n, n)
+        self.probs = torch.zeros(n_workers, max_leaves, policy_dim)
+        self.values = torch.zeros(n_workers, max_leaves)
+        self.keys = torch.zeros(n_workers, max_leaves, dtype=torch.int64)
+        # 前馈次数和估值的局面数
+        self.counters = torch.zeros(2, dtype=torch.int64)
+        for tensor in (self.feature_planes, self.probs, self.values, self.keys, self.counters):
+            tensor.share_memory_()
+
+        self.process = ctx.Process(target=serve, daemon=True, args=(
+            policy_value_net, self.request_queue, self.response_queues, self.feature_planes, self.probs,
+            self.values, self.keys, self.counters, max_batch_size, max_wait, evaluation_cache_size))
+
+    def start(self):
+        """ 启动估值进程 """
+        self.process.start()
+
+    def stop(self):
+        """ 处理完已有请求后结束估值进程 """
+        self.request_queue.put(None)
+        self.process.join()
+
+    def get_client(self, worker_id: int) -> InferenceClient:
+        """ 获取第 `worker_id` 个槽位的客户端，客户端可以传给子进程 """
+        return InferenceClient(worker_id, self.request_queue, self.response_queues[worker_id],
+                               self.feature_planes, self.probs, self.values, self.keys)
+
+    def load_state_dict(self, state_dict: dict):
+        """ 更新估值进程中网络的权重 """
+        self.request_queue.put(('weights', {k: v.cpu() for k, v in state_dict.items()}))
+
+    @property
+    def mean_batch_size(self) -> float:
+        """ 平均每次前馈的局面数 """
+        n_batches, n_positions = self.counters.tolist()
+        return n_positions / n_batches if n_batches else 0
+
+
+def serve(policy_value_net: PolicyValueNet, request_queue, response_queues, feature_planes: torch.Tensor,
+          probs: torch.Tensor, values: torch.Tensor, keys: torch.Tensor, counters: torch.Tensor,
+          max_batch_size: int, max_wait: float, evaluation_cache_size: int):
+    """ 估值进程的主循环，收到 `None` 时退出
+
+    请求队列中的消息有两种：
+    * `('predict', worker_id, n, has_keys)`: 对槽位 `worker_id` 中的 `n` 个局面估值
+    * `('weights', state_dict)`: 更新网络权重
+    """
+    policy_value_net.eval()
+    policy_value_net.set_evaluation_cache(evaluation_cache_size)
+    all_actions = list(range(probs.shape[-1]))
+
+    is_running = True
+    while is_running:
+        message = request_queue.get()
+        requests, n_positions = [], 0
+        deadline = time.perf_counter() + max_wait
+        while True:
+            if message is None:
+                is_running = False
+                break
+            elif message[0] == 'weights':
+                # 先用旧权重算完已收到的请求
+                evaluate_requests(policy_value_net, requests, response_queues, feature_planes, probs, values,
+                                  keys, counters, all_actions)
+                requests, n_positions = [], 0
+                policy_value_net.load_state_dict(message[1])
+            else:
+                requests.append(message[1:])
+                n_positions += message[2]
+                if n_positions >= max_batch_size:
+                    break
+
+            timeout = deadline - time.perf_counter()
+            try:
+                message = request_queue.get(timeout=timeout) if timeout > 0 else request_queue.get_nowait()
+            except queue.Empty:
+                break
+
+        evaluate_requests(policy_value_net, requests, response_queues, feature_planes, probs, values, keys,
+                          counters, all_actions)
+
+
+def evaluate_requests(policy_value_net: PolicyValueNet, requests: list, response_queues,
+                      feature_planes: torch.Tensor, probs: torch.Tensor, values: torch.Tensor, keys: torch.Tensor,
+                      counters: torch.Tensor, all_actions: List[int]):
+    """ 合并请求并前馈，把结果写回各自的槽位后通知客户端 """
+    if not requests:
+        return
+
+    batch = torch.cat([feature_planes[worker_id, :n] for worker_id, n, _ in requests])
+    batch_keys = None
+    if all(has_keys for _, _, has_keys in requests):
+        batch_keys = torch.cat([keys[worker_id, :n] for worker_id, n, _ in requests]).tolist()
+
+    batch_probs, batch_values = policy_value_net.predict_batch(batch, [all_actions] * len(batch), batch_keys)
+    counters[0] += 1
+    counters[1] += len(batch)
+
+    start = 0
+    for worker_id, n, _ in requests:
+        probs[worker_id, :n] = torch.from_numpy(np.stack(batch_probs[start:start + n]))
+        values[worker_id, :n] = torch.from_numpy(np.asarray(batch_values[start:start + n]))
+        start += n
+        response_queues[worker_id].put(None)
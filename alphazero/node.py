@@ -19,9 +19,10 @@ class Node:
         parent: Optional[Node]
             父级节点
         """
-        self.Q = 0
+        self.W = 0
         self.U = 0
         self.N = 0
+        self.n_virtual = 0  # 尚未返回结果的虚拟访问次数，每次视为一次失败
         self.score = 0
         self.P = prior_prob
         self.c_puct = c_puct
@@ -53,26 +54,46 @@ class Node:
         for action, prior_prob in action_probs:
             self.children[action] = Node(prior_prob, self.c_puct, self)
 
-    def __update(self, value: float):
-        """ 更新节点的访问次数 `N(s, a)`、节点的累计平均奖赏 `Q(s, a)`
+    @property
+    def Q(self) -> float:
+        """ 节点的平均奖赏 `Q(s, a) = W(s, a) / N(s, a)` """
+        return self.W / self.N if self.N else 0
+
+    def backup(self, value: float):
+        """ 反向传播，沿父节点迭代更新访问次数 `N(s, a)` 和累计奖赏 `W(s, a)`，每向上一层价值取反 """
+        node = self
+        while node:
+            node.N += 1
+            node.W += value
+            value = -value
+            node = node.parent
+
+    def add_virtual_loss(self, virtual_loss: float):
+        """ 从当前节点到根节点施加虚拟损失，使批量搜索时其他模拟倾向于选择别的路径
 
         Parameters
         ----------
-        value: float
-            用来更新节点内部数据
+        virtual_loss: float
+            虚拟访问次数
         """
-        self.Q = (self.N * self.Q + value) / (self.N + 1)
-        self.N += 1
+        node = self
+        while node:
+            node.n_virtual += virtual_loss
+            node = node.parent
 
-    def backup(self, value: float):
-        """ 反向传播 """
-        if self.parent:
-            self.parent.backup(-value)
-
-        self.__update(value)
+    def revert_virtual_loss(self, virtual_loss: float):
+        """ 撤销 `add_virtual_loss` 施加的虚拟损失 """
+        self.add_virtual_loss(-virtual_loss)
 
     def get_score(self):
         """ 计算节点得分 """
+        if self.n_virtual or self.parent.n_virtual:
+            N = self.N + self.n_virtual
+            Q = (self.W - self.n_virtual) / N if N else 0
+            self.U = self.c_puct * self.P * sqrt(self.parent.N + self.parent.n_virtual) / (1 + N)
+            self.score = self.U + Q
+            return self.score
+
         self.U = self.c_puct * self.P * sqrt(self.parent.N) / (1 + self.N)
         self.score = self.U + self.Q
         return self.score
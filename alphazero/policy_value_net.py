@@ -1,9 +1,14 @@
 # coding: utf-8
+from typing import List, Optional
+
+import numpy as np
 import torch
 from torch import nn
 from torch.nn import functional as F
 
 from .chess_board import ChessBoard
+from .symmetry import get_symmetry_indexes
+from .transposition_table import TranspositionTable
 
 
 class ConvBlock(nn.Module):
@@ -104,6 +109,12 @@ class ValueHead(nn.Module):
 class PolicyValueNet(nn.Module):
     """ 策略价值网络 """
 
+    # 以棋盘哈希为键的估值缓存，在 `predict` 和 `predict_batch` 前查询，权重改变后需要清空
+    evaluation_cache = None  # type:Optional[TranspositionTable]
+
+    # 估值时使用的对称变换：`None` 不变换，`'average'` 对所有对称变换取平均，`'random'` 随机选一个对称变换
+    symmetry_mode = None  # type:Optional[str]
+
     def __init__(self, board_len=7, n_feature_planes=13, policy_output_dim=100,  is_use_gpu=True):
         """
         Parameters
@@ -163,20 +174,147 @@ class PolicyValueNet(nn.Module):
         value: float
             当前局面的估值
         """
-        feature_planes = chess_board.get_feature_planes().to(self.device)
-        feature_planes.unsqueeze_(0)
-        p_hat, value = self.forward(feature_planes)
+        cache = self.evaluation_cache
+        if cache is not None:
+            entry = cache.get(chess_board.zobrist_hash)
+            if entry is not None:
+                return entry
+
+        feature_planes = chess_board.get_feature_planes().unsqueeze(0)
+        probs, values = self.__forward_batch(feature_planes, [chess_board.available_actions])
+        p, value = probs[0], values[0].item()
+
+        if cache is not None:
+            cache.put(chess_board.zobrist_hash, p, value)
+
+        return p, value
+
+    def predict_batch(self, feature_planes: torch.Tensor, available_actions_list: List[List[int]],
+                      keys: Optional[List[int]] = None):
+        """ 一次前馈计算多个局面的先验概率和估值
 
-        # 将对数概率转换为概率
-        p = torch.exp(p_hat).flatten()
+        Parameters
+        ----------
+        feature_planes: Tensor of shape (N, C, H, W)
+            多个局面的特征平面
+
+        available_actions_list: List[List[int]]
+            每个局面的可用动作
+
+        keys: Optional[List[int]]
+            每个局面的哈希，设置了估值缓存时用于查询缓存，只有未命中的局面才送入网络
+
+        Returns
+        -------
+        probs_list: List[np.ndarray]
+            每个局面上所有可用 `action` 对应的先验概率 `P(s, a)`
 
-        # 只取可行的落点
-        if self.is_use_gpu:
-            p = p[chess_board.available_actions].cpu().detach().numpy()
+        values: np.ndarray of shape `(N, )`
+            每个局面的估值
+        """
+        cache = self.evaluation_cache
+        if cache is None or keys is None:
+            return self.__forward_batch(feature_planes, available_actions_list)
+
+        probs_list = [None] * len(keys)
+        values = np.zeros(len(keys), dtype=np.float32)
+        misses = []
+        for i, key in enumerate(keys):
+            entry = cache.get(key)
+            if entry is None:
+                misses.append(i)
+            else:
+                probs_list[i], values[i] = entry
+
+        if misses:
+            probs, miss_values = self.__forward_batch(feature_planes[misses],
+                                                      [available_actions_list[i] for i in misses])
+            for i, p, value in zip(misses, probs, miss_values):
+                probs_list[i], values[i] = p, value
+                cache.put(keys[i], p, float(value))
+
+        return probs_list, values
+
+    def __forward_batch(self, feature_planes: torch.Tensor, available_actions_list: List[List[int]]):
+        """ 不经过缓存的批量前馈 """
+        if self.symmetry_mode is None:
+            with torch.no_grad():
+                p_hat, value = self.forward(feature_planes.to(self.device))
+
+            # 将对数概率转换为概率
+            p = torch.exp(p_hat).cpu().numpy()
+            value = value.flatten().cpu().numpy()
+        else:
+            p, value = self.__forward_symmetries(feature_planes.cpu())
+
+        return [p[i, actions] for i, actions in enumerate(available_actions_list)], value
+
+    def __forward_symmetries(self, feature_planes: torch.Tensor):
+        """ 在对称变换后的局面上前馈，再把先验概率变换回原局面 """
+        n, c, h, w = feature_planes.shape
+        feature_index, action_map, is_swap_colors = get_symmetry_indexes(self.board_len, self.n_feature_planes)
+        if self.symmetry_mode == 'random':
+            choices = torch.randint(len(feature_index), (n, 1))
         else:
-            p = p[chess_board.available_actions].detach().numpy()
+            choices = torch.arange(len(feature_index)).repeat(n, 1)
+
+        # 每个局面的所有变换排在一起，拼成一批前馈
+        n_choices = choices.shape[1]
+        x = feature_planes.flatten(1)[torch.arange(n)[:, None, None], feature_index[choices]]
+        x = x.reshape(-1, c, h, w)
+        swap = is_swap_colors[choices].flatten()
+        x[swap, 12] = 1 - x[swap, 12]
+        with torch.no_grad():
+            p_hat, value = self.forward(x.to(self.device))
+
+        # 原局面上的动作 a 对应变换后局面上的动作 action_map[a]
+        p = torch.exp(p_hat).cpu().reshape(n, n_choices, -1)
+        p = p.gather(2, action_map[choices])
+        value = value.cpu().reshape(n, n_choices)
+        return p.mean(dim=1).numpy(), value.mean(dim=1).numpy()
+
+    def set_symmetry_mode(self, mode: Optional[str]):
+        """ 设置估值时使用的对称变换，修改后清空估值缓存
 
-        return p, value[0].item()
+        Parameters
+        ----------
+        mode: Optional[str]
+            * `None`: 只在原局面上估值
+            * `'average'`: 在所有保持初始角落不变的对称变换下估值，一次前馈后对先验概率和价值取平均
+            * `'random'`: 每个局面随机选一个对称变换估值，适合在搜索中使用
+        """
+        if mode not in (None, 'average', 'random'):
+            raise ValueError(f'Unknown symmetry mode {mode}')
+
+        self.symmetry_mode = mode
+        self.clear_evaluation_cache()
+
+    def set_evaluation_cache(self, capacity: int):
+        """ 设置估值缓存
+
+        Parameters
+        ----------
+        capacity: int
+            最多缓存的局面数，超出时淘汰最久未使用的局面，为 0 时关闭缓存
+        """
+        self.evaluation_cache = TranspositionTable(capacity) if capacity > 0 else None
+
+    def clear_evaluation_cache(self):
+        """ 清空估值缓存，每次更新权重后都需要调用 """
+        if self.evaluation_cache is not None:
+            self.evaluation_cache.clear()
+
+    def load_state_dict(self, *args, **kwargs):
+        # 权重改变，缓存的估值失效
+        self.clear_evaluation_cache()
+        return super().load_state_dict(*args, **kwargs)
+
+    def __getstate__(self):
+        # 保存模型或传给子进程时不带上缓存的局面，只保留缓存容量
+        state = super().__getstate__()
+        if self.evaluation_cache is not None:
+            state['evaluation_cache'] = TranspositionTable(self.evaluation_cache.capacity)
+        return state
 
     def set_device(self, is_use_gpu: bool):
         """ 设置神经网络运行设备 """
@@ -0,0 +1,289 @@
+# coding: utf-8
+import random
+from collections import namedtuple
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .board_tables import BoardTables, flood_fill, get_board_tables, separate
+
+RolloutTables = namedtuple('RolloutTables', ['place_bits', 'place_neighbours', 'horizontal_bits', 'vertical_bits',
+                                             'cell_shifts'])
+
+
+@lru_cache(maxsize=None)
+def get_rollout_tables(board_len: int) -> RolloutTables:
+    """
+    随机走棋用的查表，按 `cell * 4 + place` 索引
+    :param board_len: 棋盘边长
+    :return: RolloutTables
+        * `place_bits`: 墙的合并比特，位于棋盘边缘时为 0
+        * `place_neighbours`: 墙另一侧的格子编号，位于棋盘边缘时为 -1
+        * `horizontal_bits`, `vertical_bits`: 横向墙和纵向墙的比特，int64 数组，供 `batch_rollout` 使用
+        * `cell_shifts`: 0 ~ n_cells-1 的 int64 数组，用于把掩码展开成比特
+    """
+    tables = get_board_tables(board_len)
+    n, n_cells = board_len, tables.n_cells
+    if n_cells > 63:
+        raise ValueError('棋盘格子数不能超过 63')
+
+    place_bits = []
+    place_neighbours = []
+    horizontal_bits = []
+    vertical_bits = []
+    for cell in range(n_cells):
+        for place, delta in enumerate((-n, -1, n, 1)):
+            is_horizontal, bit = tables.wall_effects[cell * 4 + place]
+            place_bits.append(bit if is_horizontal else bit << n_cells)
+            place_neighbours.append(cell + delta if bit else -1)
+            horizontal_bits.append(bit if is_horizontal else 0)
+            vertical_bits.append(0 if is_horizontal else bit)
+
+    return RolloutTables(tuple(place_bits), tuple(place_neighbours), np.array(horizontal_bits, dtype=np.int64),
+                         np.array(vertical_bits, dtype=np.int64), np.arange(n_cells, dtype=np.int64))
+
+
+def rollout_state(board) -> Tuple[Tuple[int, int], int, int, int]:
+    """
+    取出随机走棋需要的局面
+    :param board: ChessBoard 或 BitBoard
+    :return: （蓝方和绿方所在格子编号， 横向墙掩码， 纵向墙掩码， 该谁走了）
+    """
+    n = board.board_len
+    pos = tuple(r * n + c for r, c in board.get_player_pos())
+    return (pos, *board.get_wall_masks(), board.current_player)
+
+
+def random_action(pos: int, other_pos: int, horizontal_wall: int, vertical_wall: int, tables: BoardTables,
+                  rng=random) -> int:
+    """
+    均匀随机地选一个合法动作，不生成全部动作。
+    先用位运算求出三步内可到达的格子，再均匀地选格子和放置方式，放置方式不合法就重选，
+    每个合法动作被选中的概率都相同
+    :param pos: 当前玩家所在格子编号
+    :param other_pos: 对方所在格子编号
+    :param horizontal_wall: 横向墙掩码
+    :param vertical_wall: 纵向墙掩码
+    :param tables: 预计算表
+    :param rng: 提供 `random()` 的随机数生成器
+    :return: 动作
+    """
+    n = tables.board_len
+    open_vertical = ~horizontal_wall
+    open_down = open_vertical & (tables.full_mask >> n)
+    open_horizontal = ~vertical_wall
+    open_right = open_horizontal & tables.not_last_col
+    not_first_col = tables.not_first_col
+    allowed = tables.full_mask & ~(1 << other_pos)
+
+    reach = frontier = 1 << pos
+    for _ in range(3):
+        frontier = (((frontier & open_down) << n)
+                    | ((frontier >> n) & open_vertical)
+                    | ((frontier & open_right) << 1)
+                    | (((frontier & not_first_col) >> 1) & open_horizontal)) & allowed & ~reach
+        reach |= frontier
+
+    destinations = []
+    while reach:
+        low = reach & -reach
+        destinations.append(low.bit_length() - 1)
+        reach ^= low
+
+    place_bits = get_rollout_tables(n).place_bits
+    walls = horizontal_wall | (vertical_wall << tables.n_cells)
+    n_destinations = len(destinations)
+    while True:
+        cell = destinations[int(rng.random() * n_destinations)]
+        place = int(rng.random() * 4)
+        bit = place_bits[cell * 4 + place]
+        if bit and not walls & bit:
+            return tables.move_index[pos * tables.n_cells + cell] * 4 + place
+
+
+def rollout(pos: Tuple[int, int], horizontal_wall: int, vertical_wall: int, player: int, board_len: int,
+            rng=random) -> Optional[int]:
+    """
+    从给定局面开始双方随机走棋直到游戏结束。
+    只维护位置和墙的掩码，墙只增不减，所以只有新墙两侧不再连通时双方才可能被隔开，
+    其余时候不需要判断游戏是否结束
+    :param pos: 蓝方和绿方所在的格子编号
+    :param horizontal_wall: 横向墙掩码
+    :param vertical_wall: 纵向墙掩码
+    :param player: 该谁走了
+    :param board_len: 棋盘边长
+    :param rng: 提供 `random()` 的随机数生成器
+    :return: 胜利者，0 代表蓝方，1 代表绿方，None 代表平局
+    """
+    tables = get_board_tables(board_len)
+    place_neighbours = get_rollout_tables(board_len).place_neighbours
+    move_delta = tables.move_delta
+    cells = list(pos)
+    h, v = horizontal_wall, vertical_wall
+
+    is_over, blue, green = separate(cells[0], cells[1], h, v, tables)
+    while not is_over:
+        action = random_action(cells[player], cells[1 - player], h, v, tables, rng)
+        cell = cells[player] + move_delta[action >> 2]
+        cells[player] = cell
+        is_horizontal, bit = tables.wall_effects[cell * 4 + (action & 3)]
+        if is_horizontal:
+            h |= bit
+        else:
+            v |= bit
+
+        # 放墙前双方连通，放墙后整个区域至多分成墙两侧的两块，走子方一定在新格子所在的一块
+        other_side = 1 << place_neighbours[cell * 4 + (action & 3)]
+        region = flood_fill(1 << cell, h, v, tables, target=other_side)
+        if not region & other_side and (region >> cells[0] & 1) != (region >> cells[1] & 1):
+            is_over = True
+            other = flood_fill(1 << cells[1 - player], h, v, tables)
+            blue, green = (region, other) if player == 0 else (other, region)
+
+        player = 1 - player
+
+    return _winner(blue, green)
+
+
+def _winner(blue: int, green: int) -> Optional[int]:
+    """ 由双方区域判断胜利者，None 代表平局 """
+    blue_size, green_size = blue.bit_count(), green.bit_count()
+    return 0 if blue_size > green_size else 1 if blue_size < green_size else None
+
+
+def batch_rollout(pos: Tuple[int, int], horizontal_wall: int, vertical_wall: int, player: int, board_len: int,
+                  n_rollouts: int, rng: np.random.Generator = None) -> np.ndarray:
+    """
+    从同一局面开始同时进行多局随机走棋。所有对局步调一致，每一步对还没结束的对局
+    用 int64 数组上的位运算一起求可到达的格子、选动作、放墙和判断是否隔开
+    :param pos: 蓝方和绿方所在的格子编号
+    :param horizontal_wall: 横向墙掩码
+    :param vertical_wall: 纵向墙掩码
+    :param player: 该谁走了
+    :param board_len: 棋盘边长
+    :param n_rollouts: 对局数
+    :param rng: 随机数生成器，默认新建一个
+    :return: np.ndarray of shape (n_rollouts, ), dtype int8，每局的胜利者，-1 代表平局
+    """
+    tables = get_board_tables(board_len)
+    rollout_tables = get_rollout_tables(board_len)
+    rng = rng or np.random.default_rng()
+    n = board_len
+    full = np.int64(tables.full_mask)
+    place_neighbours = np.asarray(rollout_tables.place_neighbours, dtype=np.int64)
+
+    winners = np.full(n_rollouts, -1, dtype=np.int8)
+    is_over, blue, green = separate(pos[0], pos[1], horizontal_wall, vertical_wall, tables)
+    if is_over:
+        winner = _winner(blue, green)
+        winners[:] = -1 if winner is None else winner
+        return winners
+
+    cells = np.array([[pos[0]] * n_rollouts, [pos[1]] * n_rollouts], dtype=np.int64)
+    h = np.full(n_rollouts, horizontal_wall, dtype=np.int64)
+    v = np.full(n_rollouts, vertical_wall, dtype=np.int64)
+    active = np.arange(n_rollouts)
+    while active.size:
+        me, enemy = cells[player, active], cells[1 - player, active]
+        active_h, active_v = h[active], v[active]
+
+        # 三步内可到达的格子
+        walls = _batch_walls(active_h, active_v, tables)
+        allowed = full & ~(np.int64(1) << enemy)
+        reach = frontier = np.int64(1) << me
+        for _ in range(3):
+            frontier = _batch_expand(frontier, walls, n) & allowed & ~reach
+            reach |= frontier
+
+        # 均匀地选格子和放置方式，不合法的对局重选
+        reach_bits = (reach[:, None] >> rollout_tables.cell_shifts) & 1
+        counts = reach_bits.sum(axis=1)
+        cumulative = reach_bits.cumsum(axis=1)
+        places = np.empty(active.size, dtype=np.int64)
+        pending = np.arange(active.size)
+        while pending.size:
+            ranks = (rng.random(pending.size) * counts[pending]).astype(np.int64)
+            destinations = (cumulative[pending] <= ranks[:, None]).sum(axis=1)
+            places[pending] = destinations * 4 + rng.integers(0, 4, pending.size)
+            hb = rollout_tables.horizontal_bits[places[pending]]
+            vb = rollout_tables.vertical_bits[places[pending]]
+            ok = ((hb | vb) != 0) & ((active_h[pending] & hb) == 0) & ((active_v[pending] & vb) == 0)
+            pending = pending[~ok]
+
+        moved = places >> 2
+        cells[player, active] = moved
+        active_h |= rollout_tables.horizontal_bits[places]
+        active_v |= rollout_tables.vertical_bits[places]
+        h[active], v[active] = active_h, active_v
+
+        # 新墙两侧仍然连通的对局不可能结束
+        walls = _batch_walls(active_h, active_v, tables)
+        other_side = np.int64(1) << place_neighbours[places]
+        region = _batch_flood_fill(np.int64(1) << moved, walls, n, other_side)
+        in_region = (region[:, None] >> np.stack([cells[0, active], cells[1, active]], axis=1)) & 1
+        finished = ((region & other_side) == 0) & (in_region[:, 0] != in_region[:, 1])
+
+        if finished.any():
+            region = region[finished]
+            other = _batch_flood_fill(np.int64(1) << enemy[finished], _select_walls(walls, finished), n)
+            mover_size = _popcount(region, rollout_tables.cell_shifts)
+            other_size = _popcount(other, rollout_tables.cell_shifts)
+            winners[active[finished]] = np.where(mover_size > other_size, player,
+                                                 np.where(mover_size < other_size, 1 - player, -1))
+            active = active[~finished]
+
+        player = 1 - player
+
+    return winners
+
+
+def _batch_walls(horizontal_walls: np.ndarray, vertical_walls: np.ndarray, tables: BoardTables):
+    """ 每个对局每个方向可以通过的格子，顺序为 下、上、右、左 """
+    full = np.int64(tables.full_mask)
+    open_vertical = ~horizontal_walls & full
+    open_horizontal = ~vertical_walls & full
+    return (open_vertical & np.int64(tables.full_mask >> tables.board_len), open_vertical,
+            open_horizontal & np.int64(tables.not_last_col), open_horizontal, np.int64(tables.not_first_col))
+
+
+def _select_walls(walls, index):
+    """ 取出部分对局的 `_batch_walls` 结果 """
+    return tuple(w[index] for w in walls[:4]) + walls[4:]
+
+
+def _batch_expand(frontier: np.ndarray, walls, n: int) -> np.ndarray:
+    """ 所有对局的边界同时向四周扩展一步，不包含原来的边界 """
+    open_down, open_vertical, open_right, open_horizontal, not_first_col = walls
+    return (((frontier & open_down) << n)
+            | ((frontier >> n) & open_vertical)
+            | ((frontier & open_right) << 1)
+            | (((frontier & not_first_col) >> 1) & open_horizontal))
+
+
+def _batch_flood_fill(seed: np.ndarray, walls, n: int, target: np.ndarray = None) -> np.ndarray:
+    """ 对每个对局扩展区域，直到不再变化或者到达目标，已经停止的对局不再参与计算 """
+    reach = seed.copy()
+    live = np.arange(seed.size)
+    current, live_walls, live_target = reach, walls, target
+    while live.size:
+        grown = current | _batch_expand(current, live_walls, n)
+        done = grown == current
+        if live_target is not None:
+            done |= (grown & live_target) != 0
+
+        reach[live] = grown
+        if done.any():
+            keep = ~done
+            live, grown = live[keep], grown[keep]
+            live_walls = _select_walls(live_walls, keep)
+            if live_target is not None:
+                live_target = live_target[keep]
+        current = grown
+
+    return reach
+
+
+def _popcount(masks: np.ndarray, cell_shifts: np.ndarray) -> np.ndarray:
+    """ 每个掩码中 1 的个数 """
+    return ((masks[:, None] >> cell_shifts) & 1).sum(axis=1)
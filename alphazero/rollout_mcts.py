@@ -1,16 +1,15 @@
 # coding: utf-8
-import random
-
 import numpy as np
 
 from .chess_board import ChessBoard
-from .node import Node
+from .array_tree import ArrayTree
+from .rollout import batch_rollout, rollout, rollout_state
 
 
 class RolloutMCTS:
     """ 基于随机走棋策略的蒙特卡洛树搜索 """
 
-    def __init__(self, c_puct: float = 5, n_iters=1000):
+    def __init__(self, c_puct: float = 5, n_iters=1000, n_rollouts=1):
         """
         Parameters
         ----------
@@ -19,10 +18,16 @@ class RolloutMCTS:
 
         n_iters: int
             迭代搜索次数
+
+        n_rollouts: int
+            每个叶节点随机走棋的局数，大于 1 时同时模拟多局并取平均价值。
+            同时模拟的开销主要在每一步的数组运算上，局数上百时才比逐局模拟快
         """
         self.c_puct = c_puct
         self.n_iters = n_iters
-        self.root = Node(1, c_puct, parent=None)
+        self.n_rollouts = n_rollouts
+        self.tree = ArrayTree(c_puct)
+        self.rng = np.random.default_rng()
 
     def get_action(self, chess_board: ChessBoard) -> int:
         """ 根据当前局面返回下一步动作
@@ -32,30 +37,38 @@ class RolloutMCTS:
         chess_board: ChessBoard
             棋盘
         """
+        tree = self.tree
         for i in range(self.n_iters):
-            # 拷贝一个棋盘用来模拟
-            board = chess_board.copy()
+            # 直接在棋盘上模拟，结束后撤销
+            board = chess_board
 
-            # 如果没有遇到叶节点，就一直向下搜索并更新棋盘
-            node = self.root
-            while not node.is_leaf_node():
-                action, node = node.select()
-                board.do_action(action)
+            # 如果没有遇到叶节点，就一直向下搜索并更新棋盘，记录经过的节点供反向传播使用
+            node = tree.root
+            path = [node]
+            while not tree.is_leaf_node(node):
+                action, node = tree.select(node)
+                board.push(action)
+                path.append(node)
 
             # 判断游戏是否结束，如果没结束就拓展叶节点
             is_over, winner = board.is_game_over()
             if not is_over:
-                node.expand(self.__default_policy(board))
+                tree.expand(node, self.__default_policy(board))
 
             # 模拟
             value = self.__rollout(board)
             # 反向传播
-            node.backup(-value)
+            tree.backup(path, -value)
+
+            for _ in range(len(path) - 1):
+                board.pop()
 
         # 根据子节点的访问次数来选择动作
-        action = max(self.root.children.items(), key=lambda x: x[1].N)[0]
-        # 更新根节点
-        self.root = Node(prior_prob=1)
+        actions, visits = tree.children(tree.root)
+        action = int(actions[np.argmax(visits)])
+
+        # 重置搜索树
+        tree.reset()
         return action
 
     def __default_policy(self, chess_board: ChessBoard):
@@ -72,17 +85,16 @@ class RolloutMCTS:
         return zip(chess_board.available_actions, probs)
 
     def __rollout(self, board: ChessBoard):
-        """ 快速走棋，模拟一局 """
-        current_player = board.state[12, 0, 0]
-
-        while True:
-            is_over, winner = board.is_game_over()
-            if is_over:
-                break
-            action = random.choice(board.available_actions)
-            board.do_action(action)
+        """ 快速走棋，只在位置和墙的掩码上模拟，不修改棋盘 """
+        pos, horizontal_wall, vertical_wall, current_player = rollout_state(board)
 
         # 计算 Value，平局为 0，当前玩家胜利则为 1, 输为 -1
-        if winner is not None:
-            return 1 if winner == current_player else -1
-        return 0
+        if self.n_rollouts == 1:
+            winner = rollout(pos, horizontal_wall, vertical_wall, current_player, board.board_len)
+            if winner is not None:
+                return 1 if winner == current_player else -1
+            return 0
+
+        winners = batch_rollout(pos, horizontal_wall, vertical_wall, current_player, board.board_len,
+                                self.n_rollouts, self.rng)
+        return float(np.mean(np.where(winners == current_player, 1, np.where(winners == -1, 0, -1))))
@@ -0,0 +1,240 @@
+# coding: utf-8
+import json
+import os
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from .self_play_dataset import SelfPlayData, pack_feature_planes, random_symmetries, unpack_feature_planes
+from .symmetry import get_symmetries
+
+GameRecord = Tuple[List[int], Tensor, Tensor, Tensor]
+
+
+class SampleStore:
+    """ 磁盘上的分块样本库
+
+    每个样本为一条定长记录，包含按位压缩的特征平面、float16 的 `pi`、float32 的 `z` 和这一步的动作，
+    每 `chunk_size` 条记录存放在一个文件中，用 `np.memmap` 读写，不需要把全部数据载入内存。
+    `games.bin` 中依次存放每局第一个样本的编号，`meta.json` 记录棋盘参数和已写入的样本数与局数，
+    写入时先写记录和对局编号、最后更新 `meta.json`，读取时只看 `meta.json` 中已经提交的部分
+    """
+
+    def __init__(self, root: str, board_len=7, n_feature_planes=13, policy_dim=100, chunk_size=65536,
+                 is_lazy_augment=True):
+        """
+        Parameters
+        ----------
+        root: str
+            样本库所在文件夹，已有样本库时棋盘参数以 `meta.json` 为准
+
+        board_len: int
+            棋盘大小
+
+        n_feature_planes: int
+            特征平面个数
+
+        policy_dim: int
+            策略向量的维度
+
+        chunk_size: int
+            每个文件的记录数
+
+        is_lazy_augment: bool
+            是否在抽样时随机对样本做对称变换
+        """
+        self.root = root
+        self.is_lazy_augment = is_lazy_augment
+        self.meta_path = os.path.join(root, 'meta.json')
+        self.games_path = os.path.join(root, 'games.bin')
+        os.makedirs(root, exist_ok=True)
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+        else:
+            meta = dict(board_len=board_len, n_feature_planes=n_feature_planes, policy_dim=policy_dim,
+                        chunk_size=chunk_size, n_samples=0, n_games=0)
+            self.__write_meta(meta)
+            open(self.games_path, 'wb').close()
+
+        self.board_len = meta['board_len']
+        self.n_feature_planes = meta['n_feature_planes']
+        self.policy_dim = meta['policy_dim']
+        self.chunk_size = meta['chunk_size']
+        self.n_samples = meta['n_samples']
+        self.n_games = meta['n_games']
+
+        n_bytes = (self.n_feature_planes * self.board_len ** 2 + 7) // 8
+        self.dtype = np.dtype([('planes', np.uint8, (n_bytes,)), ('pi', np.float16, (self.policy_dim,)),
+                               ('z', np.float32), ('action', np.int16)])
+        self.symmetries = get_symmetries(self.board_len, self.n_feature_planes)
+        self.__chunks = {}
+        self.__rng = np.random.default_rng()
+
+    def __len__(self):
+        return self.n_samples
+
+    def append(self, self_play_data: SelfPlayData, action_list: List[int]):
+        """ 写入一局自我博弈数据，每一步一个样本 """
+        feature_planes = torch.stack(self_play_data.feature_planes_list)
+        self.extend_game(feature_planes, np.stack(self_play_data.pi_list), self_play_data.z_list, action_list)
+
+    def extend_game(self, feature_planes, pi, z, actions):
+        """ 写入一局的所有样本
+
+        Parameters
+        ----------
+        feature_planes: Tensor or np.ndarray of shape (N, n_feature_planes, board_len, board_len)
+            特征平面，元素只能为 0 或 1
+
+        pi: Tensor or np.ndarray of shape (N, policy_dim)
+            策略
+
+        z: Tensor or np.ndarray of shape (N, )
+            价值
+
+        actions: List[int]
+            每一步的动作
+        """
+        n = len(actions)
+        records = np.zeros(n, dtype=self.dtype)
+        records['planes'] = pack_feature_planes(feature_planes)
+        records['pi'] = np.asarray(pi)
+        records['z'] = np.asarray(z)
+        records['action'] = actions
+
+        # 按文件边界分段写入
+        start = 0
+        while start < n:
+            chunk, offset = divmod(self.n_samples + start, self.chunk_size)
+            end = min(n, start + self.chunk_size - offset)
+            memmap = self.__chunk(chunk, 'r+')
+            memmap[offset:offset + end - start] = records[start:end]
+            memmap.flush()
+            start = end
+
+        # 上次写到一半中断时文件末尾可能有未提交的编号，直接覆盖
+        with open(self.games_path, 'r+b') as f:
+            f.seek(self.n_games * 8)
+            f.write(np.array([self.n_samples], dtype=np.int64).tobytes())
+
+        self.n_samples += n
+        self.n_games += 1
+        self.__write_meta()
+
+    def refresh(self):
+        """ 重新读取 `meta.json`，看到其他进程新写入的数据 """
+        with open(self.meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        self.n_samples = meta['n_samples']
+        self.n_games = meta['n_games']
+
+    def read(self, index) -> Tuple[Tensor, Tensor, Tensor]:
+        """ 随机读取样本，不做对称变换
+
+        Parameters
+        ----------
+        index: array_like of int
+            样本编号
+
+        Returns
+        -------
+        feature_planes: Tensor of shape (N, n_feature_planes, board_len, board_len)
+            特征平面
+
+        pi: Tensor of shape (N, policy_dim)
+            策略
+
+        z: Tensor of shape (N, )
+            价值
+        """
+        records = self.__records(np.asarray(index, dtype=np.int64))
+        return self.__decode(records)
+
+    def sample(self, batch_size: int) -> Tuple[Tensor, Tensor, Tensor]:
+        """ 不放回地随机抽取一个 mini-batch，返回值同 `read`，设置了 `is_lazy_augment` 时每个样本随机做一种对称变换 """
+        index = self.__rng.choice(self.n_samples, min(batch_size, self.n_samples), replace=False)
+        feature_planes, pi, z = self.read(np.sort(index))
+        if self.is_lazy_augment:
+            feature_planes, pi = random_symmetries(feature_planes, pi, self.symmetries, self.__rng)
+        return feature_planes, pi, z
+
+    def tail(self, n: int) -> Tuple[Tensor, Tensor, Tensor]:
+        """ 读取最后写入的 `n` 个样本，返回值同 `read` """
+        return self.read(np.arange(max(self.n_samples - n, 0), self.n_samples))
+
+    def game_starts(self) -> np.ndarray:
+        """ 每局第一个样本的编号，最后附加样本总数 """
+        starts = np.fromfile(self.games_path, dtype=np.int64, count=self.n_games)
+        return np.append(starts, self.n_samples)
+
+    def iter_games(self, start=0) -> Iterator[GameRecord]:
+        """ 按写入顺序逐局读取
+
+        Parameters
+        ----------
+        start: int
+            从第几局开始
+
+        Yields
+        ------
+        actions: List[int]
+            棋谱
+
+        feature_planes, pi, z: Tensor
+            这一局每一步的样本
+        """
+        starts = self.game_starts()
+        for i in range(start, self.n_games):
+            records = self.__records(np.arange(starts[i], starts[i + 1]))
+            yield (records['action'].tolist(), *self.__decode(records))
+
+    def iter_actions(self) -> Iterator[List[int]]:
+        """ 逐局读取棋谱，不解压样本 """
+        starts = self.game_starts()
+        for i in range(self.n_games):
+            yield self.__records(np.arange(starts[i], starts[i + 1]))['action'].tolist()
+
+    def __records(self, index: np.ndarray) -> np.ndarray:
+        """ 按编号读取记录，编号所在的文件分别读取 """
+        records = np.zeros(len(index), dtype=self.dtype)
+        chunks, offsets = np.divmod(index, self.chunk_size)
+        for chunk in np.unique(chunks):
+            mask = chunks == chunk
+            records[mask] = self.__chunk(int(chunk), 'r')[offsets[mask]]
+        return records
+
+    def __decode(self, records: np.ndarray) -> Tuple[Tensor, Tensor, Tensor]:
+        """ 把记录解压成张量 """
+        feature_planes = unpack_feature_planes(records['planes'], self.n_feature_planes, self.board_len)
+        pi = torch.from_numpy(records['pi'].astype(np.float32))
+        z = torch.from_numpy(records['z'].copy())
+        return feature_planes, pi, z
+
+    def __chunk(self, chunk: int, mode: str) -> np.memmap:
+        """ 打开第 `chunk` 个文件，不存在时创建 """
+        memmap = self.__chunks.get(chunk)
+        if memmap is not None and (mode == 'r' or memmap.mode != 'r'):
+            return memmap
+
+        path = os.path.join(self.root, f'chunk_{chunk:05d}.bin')
+        if not os.path.exists(path):
+            mode = 'w+'
+        memmap = np.memmap(path, dtype=self.dtype, mode=mode, shape=(self.chunk_size,))
+        self.__chunks[chunk] = memmap
+        return memmap
+
+    def __write_meta(self, meta: dict = None):
+        """ 原子地更新 `meta.json` """
+        if meta is None:
+            meta = dict(board_len=self.board_len, n_feature_planes=self.n_feature_planes,
+                        policy_dim=self.policy_dim, chunk_size=self.chunk_size, n_samples=self.n_samples,
+                        n_games=self.n_games)
+
+        path = self.meta_path + '.tmp'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(path, self.meta_path)
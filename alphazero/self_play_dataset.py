@@ -1,61 +1,185 @@
 # coding:utf-8
-from collections import deque, namedtuple
+from collections import namedtuple
+from typing import Tuple
 
+import numpy as np
 import torch
 from torch import Tensor
 from torch.utils.data import Dataset
-from tqdm import tqdm
+
+from .symmetry import get_symmetries, transform
 
 SelfPlayData = namedtuple(
     'SelfPlayData', ['pi_list', 'z_list', 'feature_planes_list'])
 
 
+def pack_feature_planes(feature_planes) -> np.ndarray:
+    """ 把只含 0 和 1 的特征平面按位压缩，每个样本一行
+
+    Parameters
+    ----------
+    feature_planes: Tensor or np.ndarray of shape (N, n_feature_planes, board_len, board_len)
+        特征平面
+
+    Returns
+    -------
+    packed: np.ndarray of shape (N, ceil(n_feature_planes * board_len^2 / 8))
+        压缩后的特征平面
+    """
+    feature_planes = np.asarray(feature_planes).reshape(len(feature_planes), -1)
+    return np.packbits(feature_planes.astype(bool), axis=1)
+
+
+def unpack_feature_planes(packed: np.ndarray, n_feature_planes: int, board_len: int) -> Tensor:
+    """ 解压 `pack_feature_planes` 压缩的特征平面，返回 float32 张量 """
+    n = board_len
+    planes = np.unpackbits(packed, axis=1, count=n_feature_planes * n * n)
+    return torch.from_numpy(planes.reshape(-1, n_feature_planes, n, n).astype(np.float32))
+
+
+def random_symmetries(feature_planes: Tensor, pi: Tensor, symmetries: list, rng: np.random.Generator):
+    """ 对每个样本随机做一种对称变换，原地修改并返回 `(feature_planes, pi)` """
+    choices = torch.from_numpy(rng.integers(len(symmetries), size=len(pi)))
+    for i, symmetry in enumerate(symmetries):
+        mask = choices == i
+        if i > 0 and mask.any():
+            feature_planes[mask], pi[mask] = transform(feature_planes[mask], pi[mask], symmetry)
+
+    return feature_planes, pi
+
+
 class SelfPlayDataSet(Dataset):
-    """ 自我博弈数据集类，每个样本为元组 `(feature_planes, pi, z)` """
+    """ 自我博弈数据集类，每个样本为元组 `(feature_planes, pi, z)`
+
+    样本存放在预先分配的环形缓冲区中，写满后覆盖最旧的样本。特征平面只含 0 和 1，按位压缩存放，
+    `pi` 存为 float16，`z` 存为 float32，每个样本约占 `n_feature_planes * board_len^2 / 8 + 2 * policy_dim + 4` 字节。
+    默认只存原样本，抽样时对每个样本随机做一种对称变换，相当于存下了对称扩充后的数据集
+    """
+
+    def __init__(self, board_len=7, n_feature_planes=13, policy_dim=100, capacity=1000000, is_lazy_augment=True):
+        """
+        Parameters
+        ----------
+        board_len: int
+            棋盘大小
 
-    def __init__(self, board_len=7):
+        n_feature_planes: int
+            特征平面个数
+
+        policy_dim: int
+            策略向量的维度
+
+        capacity: int
+            最多保存的样本数
+
+        is_lazy_augment: bool
+            是否在抽样时随机对样本做对称变换，否则插入数据时就把所有对称变换后的样本一起存下来
+        """
         super().__init__()
-        self.__data_deque = deque(maxlen=1000000)
         self.board_len = board_len
-        self.flip_dict = {0: 37, 1: 36, 2: 39, 3: 38, 4: 17, 5: 16, 6: 19, 7: 18, 8: 41, 9: 40, 10: 43, 11: 42, 12: 65,
-                          13: 64, 14: 67, 15: 66, 16: 5, 17: 4, 18: 7, 19: 6, 20: 21, 21: 20, 22: 23, 23: 22, 24: 45,
-                          25: 44, 26: 47, 27: 46, 28: 69, 29: 68, 30: 71, 31: 70, 32: 85, 33: 84, 34: 87, 35: 86, 36: 1,
-                          37: 0, 38: 3, 39: 2, 40: 9, 41: 8, 42: 11, 43: 10, 44: 25, 45: 24, 46: 27, 47: 26, 48: 49,
-                          49: 48, 50: 51, 51: 50, 52: 73, 53: 72, 54: 75, 55: 74, 56: 89, 57: 88, 58: 91, 59: 90,
-                          60: 97, 61: 96, 62: 99, 63: 98, 64: 13, 65: 12, 66: 15, 67: 14, 68: 29, 69: 28, 70: 31,
-                          71: 30, 72: 53, 73: 52, 74: 55, 75: 54, 76: 77, 77: 76, 78: 79, 79: 78, 80: 93, 81: 92,
-                          82: 95, 83: 94, 84: 33, 85: 32, 86: 35, 87: 34, 88: 57, 89: 56, 90: 59, 91: 58, 92: 81,
-                          93: 80, 94: 83, 95: 82, 96: 61, 97: 60, 98: 63, 99: 62}
+        self.n_feature_planes = n_feature_planes
+        self.policy_dim = policy_dim
+        self.capacity = capacity
+        self.is_lazy_augment = is_lazy_augment
+        self.symmetries = get_symmetries(board_len, n_feature_planes)
+
+        self.__planes = np.zeros((capacity, (n_feature_planes * board_len ** 2 + 7) // 8), dtype=np.uint8)
+        self.__pi = np.zeros((capacity, policy_dim), dtype=np.float16)
+        self.__z = np.zeros(capacity, dtype=np.float32)
+        self.__index = 0  # 下一个样本写入的位置
+        self.__size = 0
+        self.__rng = np.random.default_rng()
 
     def __len__(self):
-        return len(self.__data_deque)
+        return self.__size
 
     def __getitem__(self, index):
-        return self.__data_deque[index]
+        if not -self.__size <= index < self.__size:
+            raise IndexError('数据集下标越界')
+
+        feature_planes, pi, z = self.__gather(np.array([index % self.__size]))
+        return feature_planes[0], pi[0], z[0]
+
+    @property
+    def nbytes(self) -> int:
+        """ 缓冲区占用的字节数 """
+        return self.__planes.nbytes + self.__pi.nbytes + self.__z.nbytes
 
     def clear(self):
         """ 清空数据集 """
-        self.__data_deque.clear()
+        self.__index = 0
+        self.__size = 0
 
     def append(self, self_play_data: SelfPlayData):
-        """ 向数据集中插入数据 """
-        n = self.board_len
-        z_list = Tensor(self_play_data.z_list)
-        pi_list = self_play_data.pi_list
-        feature_planes_list = self_play_data.feature_planes_list
-        # 使用翻转和镜像扩充已有数据集
-        for z, pi, feature_planes in tqdm(zip(z_list, pi_list, feature_planes_list), ncols=80, desc="Expanding data"):
-            self.__data_deque.append((feature_planes, Tensor(pi), z))
-
-            # 沿主对角线翻转
-            flip_features = torch.transpose(Tensor(feature_planes.clone().detach()), 1, 2)
-            # 翻转后水平和垂直的墙互换
-            _ = flip_features.clone().detach()
-            flip_features[6:9] = _[9:12]
-            flip_features[9:12] = _[6:9]
-
-            flip_pi = torch.zeros_like(Tensor(pi))
-            for i in range(len(pi)):
-                flip_pi[self.flip_dict[i]] = pi[i]
-
-            self.__data_deque.append((flip_features, flip_pi, z))
+        """ 向数据集中插入一局的数据，不是在抽样时做对称变换的话同时插入所有对称变换后的数据 """
+        feature_planes = torch.stack(self_play_data.feature_planes_list)
+        pi = torch.from_numpy(np.stack(self_play_data.pi_list)).float()
+        z = Tensor(self_play_data.z_list)
+        self.extend(feature_planes, pi, z)
+
+        # 使用对称变换扩充已有数据集，第一个变换为恒等变换
+        if not self.is_lazy_augment:
+            for symmetry in self.symmetries[1:]:
+                self.extend(*transform(feature_planes, pi, symmetry), z)
+
+    def extend(self, feature_planes, pi, z):
+        """ 把一批样本写入环形缓冲区，不做数据扩充
+
+        Parameters
+        ----------
+        feature_planes: Tensor or np.ndarray of shape (N, n_feature_planes, board_len, board_len)
+            特征平面，元素只能为 0 或 1
+
+        pi: Tensor or np.ndarray of shape (N, policy_dim)
+            策略
+
+        z: Tensor or np.ndarray of shape (N, )
+            价值
+        """
+        n = len(feature_planes)
+        if n > self.capacity:
+            feature_planes, pi, z = feature_planes[-self.capacity:], pi[-self.capacity:], z[-self.capacity:]
+            n = self.capacity
+
+        index = (self.__index + np.arange(n)) % self.capacity
+        self.__planes[index] = pack_feature_planes(feature_planes)
+        self.__pi[index] = np.asarray(pi)
+        self.__z[index] = np.asarray(z)
+        self.__index = (self.__index + n) % self.capacity
+        self.__size = min(self.__size + n, self.capacity)
+
+    def sample(self, batch_size: int) -> Tuple[Tensor, Tensor, Tensor]:
+        """ 不放回地随机抽取一个 mini-batch，样本数不足时返回全部样本
+
+        Parameters
+        ----------
+        batch_size: int
+            mini-batch 大小
+
+        Returns
+        -------
+        feature_planes: Tensor of shape (N, n_feature_planes, board_len, board_len)
+            特征平面
+
+        pi: Tensor of shape (N, policy_dim)
+            策略
+
+        z: Tensor of shape (N, )
+            价值
+        """
+        index = self.__rng.choice(self.__size, min(batch_size, self.__size), replace=False)
+        feature_planes, pi, z = self.__gather(index)
+
+        # 每个样本随机做一种对称变换
+        if self.is_lazy_augment:
+            feature_planes, pi = random_symmetries(feature_planes, pi, self.symmetries, self.__rng)
+
+        return feature_planes, pi, z
+
+    def __gather(self, index: np.ndarray) -> Tuple[Tensor, Tensor, Tensor]:
+        """ 解压指定位置的样本，`index` 为相对最旧样本的下标 """
+        index = (self.__index - self.__size + index) % self.capacity
+        feature_planes = unpack_feature_planes(self.__planes[index], self.n_feature_planes, self.board_len)
+        pi = torch.from_numpy(self.__pi[index].astype(np.float32))
+        z = torch.from_numpy(self.__z[index])
+        return feature_planes, pi, z
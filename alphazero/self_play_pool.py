@@ -0,0 +1,220 @@
+# coding: utf-8
+import multiprocessing
+import queue
+import time
+import traceback
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from .alpha_zero_mcts import AlphaZeroMCTS
+from .chess_board import ChessBoard
+from .policy_value_net import PolicyValueNet
+from .self_play_dataset import SelfPlayData
+
+
+def self_play(mcts: AlphaZeroMCTS, chess_board: ChessBoard, gamma: float):
+    """ 用蒙特卡洛树自我博弈一局
+
+    Parameters
+    ----------
+    mcts: AlphaZeroMCTS
+        处于自我博弈状态的蒙特卡洛树
+
+    chess_board: ChessBoard
+        棋盘，开始时会被清空
+
+    gamma: float
+        奖赏的折扣因子
+
+    Returns
+    -------
+    self_play_data: SelfPlayData
+        自我博弈数据
+
+    action_list: List[int]
+        棋谱
+    """
+    # 初始化棋盘和数据容器
+    chess_board.clear_board()
+    pi_list, feature_planes_list, players = [], [], []
+    action_list = []
+
+    # 开始一局游戏
+    while True:
+        action, pi = mcts.get_action(chess_board)
+
+        # 保存每一步的数据
+        feature_planes_list.append(chess_board.get_feature_planes())
+        players.append(chess_board.state[12, 0, 0])
+        action_list.append(action)
+        pi_list.append(pi)
+        chess_board.do_action(action)
+
+        # 判断游戏是否结束
+        is_over, winner = chess_board.is_game_over()
+        if is_over:
+            if winner is not None:
+                z_list = []
+
+                # 最后一步价值为1，每向前一步价值乘以gamma
+                for i in range(len(players)):
+                    if players[i] == winner:
+                        z_list.append(gamma ** (players[i:].count(winner) - 1))
+                    else:
+                        z_list.append(-gamma ** (players[i:].count(1 - winner) - 1))
+
+            else:
+                z_list = [0] * len(players)
+            break
+
+    # 重置根节点
+    mcts.reset_root()
+
+    self_play_data = SelfPlayData(pi_list=pi_list, z_list=z_list, feature_planes_list=feature_planes_list)
+    return self_play_data, action_list
+
+
+class SelfPlayWorkerPool:
+    """ 常驻的自我博弈进程池
+
+    每个进程不停地自我博弈，下完一局就通过队列传回棋局数据；
+    网络权重放在共享内存中，只有在 `broadcast` 更新权重后进程才会在下一局开始前重新载入
+    """
+
+    def __init__(self, policy_value_net: PolicyValueNet, n_workers: int, mcts_kwargs: dict, gamma: float,
+                 board_len=7, n_feature_planes=13, clients: Optional[list] = None):
+        """
+        Parameters
+        ----------
+        policy_value_net: PolicyValueNet
+            策略价值网络，每个进程启动时复制一份
+
+        n_workers: int
+            进程数
+
+        mcts_kwargs: dict
+            创建 `AlphaZeroMCTS` 的参数
+
+        gamma: float
+            奖赏的折扣因子
+
+        board_len: int
+            棋盘大小
+
+        n_feature_planes: int
+            特征平面个数
+
+        clients: Optional[list]
+            推理服务器的客户端，每个进程一个。设置后进程内不持有网络，权重由推理服务器负责更新
+        """
+        self.n_workers = n_workers
+        self.n_games = 0
+        ctx = multiprocessing.get_context('spawn')
+        self.games = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.lock = ctx.Lock()
+
+        # 共享内存中的权重和版本号
+        self.version = torch.zeros(1, dtype=torch.int64).share_memory_()
+        self.shared_state = None
+        # 每个进程一行：下完的局数、局面数、网络估值的局面数
+        self.counters = torch.zeros(n_workers, 3, dtype=torch.int64).share_memory_()
+        if clients is None:
+            self.shared_state = {k: v.detach().cpu().clone().share_memory_()
+                                 for k, v in policy_value_net.state_dict().items()}
+
+        self.processes = []
+        for worker_id in range(n_workers):
+            net = policy_value_net if clients is None else clients[worker_id]
+            self.processes.append(ctx.Process(target=run_self_play_worker, daemon=True, args=(
+                worker_id, net, self.shared_state, self.version, self.lock, self.games, self.stop_event,
+                self.counters, mcts_kwargs, gamma, board_len, n_feature_planes)))
+
+    def start(self):
+        """ 启动所有进程 """
+        for process in self.processes:
+            process.start()
+
+    def stop(self):
+        """ 结束所有进程，正在进行的对局会被丢弃 """
+        self.stop_event.set()
+        for process in self.processes:
+            process.terminate()
+            process.join()
+
+    def broadcast(self, state_dict: dict):
+        """ 把新的权重写入共享内存，各进程在下一局开始前载入 """
+        if self.shared_state is None:
+            return
+
+        with self.lock:
+            for k, v in state_dict.items():
+                self.shared_state[k].copy_(v.detach())
+            self.version += 1
+
+    @property
+    def n_evaluations(self) -> int:
+        """ 所有进程累计网络估值的局面数 """
+        return int(self.counters[:, 2].sum())
+
+    def get_game(self, timeout: Optional[float] = None) -> Tuple[SelfPlayData, List[int]]:
+        """ 取出一局已经下完的棋局，没有时阻塞等待
+
+        Returns
+        -------
+        self_play_data: SelfPlayData
+            自我博弈数据
+
+        action_list: List[int]
+            棋谱
+        """
+        self_play_data, action_list = self.games.get(timeout=timeout)
+        self.n_games += 1
+
+        # 特征平面以一个 uint8 数组传输，在这里还原为张量列表
+        feature_planes = torch.from_numpy(self_play_data.feature_planes_list).float()
+        return self_play_data._replace(feature_planes_list=list(feature_planes)), action_list
+
+    def get_games(self) -> List[Tuple[SelfPlayData, List[int]]]:
+        """ 取出所有已经下完的棋局，不等待 """
+        games = []
+        while True:
+            try:
+                games.append(self.get_game(timeout=0))
+            except queue.Empty:
+                return games
+
+
+def run_self_play_worker(worker_id: int, policy_value_net, shared_state: Optional[dict], version: torch.Tensor,
+                         lock, games, stop_event, counters: torch.Tensor, mcts_kwargs: dict, gamma: float,
+                         board_len: int, n_feature_planes: int):
+    """ 自我博弈进程的主循环，直到 `stop_event` 被设置 """
+    torch.set_num_threads(1)
+    mcts = AlphaZeroMCTS(policy_value_net, is_self_play=True, **mcts_kwargs)
+    chess_board = ChessBoard(board_len, n_feature_planes)
+    if shared_state is not None:
+        policy_value_net.eval()
+
+    current_version = 0
+    while not stop_event.is_set():
+        # 权重有更新时才从共享内存中载入
+        if shared_state is not None and int(version) != current_version:
+            with lock:
+                policy_value_net.load_state_dict(shared_state)
+                current_version = int(version)
+
+        try:
+            game_timer = time.time()
+            self_play_data, action_list = self_play(mcts, chess_board, gamma)
+        except Exception:
+            traceback.print_exc()
+            mcts.reset_root()
+            continue
+
+        print(f'⏱️ 进程 {worker_id} 下完一局，耗时 {time.time() - game_timer:.1f} 秒')
+        counters[worker_id] = torch.tensor([counters[worker_id, 0] + 1, counters[worker_id, 1] + len(action_list),
+                                            mcts.n_total_evaluations])
+        feature_planes = np.stack([x.numpy() for x in self_play_data.feature_planes_list]).astype(np.uint8)
+        games.put((self_play_data._replace(feature_planes_list=feature_planes), action_list))
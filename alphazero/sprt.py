@@ -0,0 +1,82 @@
+# coding: utf-8
+import math
+from typing import Optional
+
+
+def elo_to_score(elo: float) -> float:
+    """ elo 差对应的期望得分 """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class SPRT:
+    """ 序贯概率比检验，判断当前模型比历史最优模型强 `elo1` 还是只强 `elo0`
+
+    每局得分为 1、0.5 或 0，用得分的均值和方差计算广义对数似然比（GSPRT 的正态近似），
+    对数似然比超过上界时接受 H1，低于下界时接受 H0，两个界由两类错误率决定
+    """
+
+    def __init__(self, elo0=0.0, elo1=100.0, alpha=0.1, beta=0.1):
+        """
+        Parameters
+        ----------
+        elo0: float
+            H0 下的 elo 差
+
+        elo1: float
+            H1 下的 elo 差，默认的 100 约等于 64% 的期望得分。
+            与 H0 越接近，需要的局数越多：35 时平均要下四百多局，100 时实力相同或相差 100 的模型平均 30 局左右就有结论
+
+        alpha: float
+            H0 成立时错误接受 H1 的概率
+
+        beta: float
+            H1 成立时错误接受 H0 的概率
+        """
+        self.score0 = elo_to_score(elo0)
+        self.score1 = elo_to_score(elo1)
+        self.lower_bound = math.log(beta / (1 - alpha))
+        self.upper_bound = math.log((1 - beta) / alpha)
+        self.n_wins = 0
+        self.n_draws = 0
+        self.n_losses = 0
+
+    def __len__(self):
+        return self.n_wins + self.n_draws + self.n_losses
+
+    def update(self, score: float):
+        """ 加入一局的得分，1 代表胜利，0.5 代表平局，0 代表失败 """
+        if score == 1:
+            self.n_wins += 1
+        elif score == 0:
+            self.n_losses += 1
+        else:
+            self.n_draws += 1
+
+    @property
+    def score(self) -> float:
+        """ 平均得分 """
+        return (self.n_wins + 0.5 * self.n_draws) / len(self) if len(self) else 0.5
+
+    @property
+    def llr(self) -> float:
+        """ 对数似然比 """
+        n = len(self)
+        if n == 0:
+            return 0
+
+        # 每种结果至少算半局，避免开始时全胜或全负导致方差为零
+        wins, draws, losses = (max(k, 0.5) for k in (self.n_wins, self.n_draws, self.n_losses))
+        total = wins + draws + losses
+        mean = (wins + 0.5 * draws) / total
+        variance = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2) / total
+        return n * (self.score1 - self.score0) * (2 * mean - self.score0 - self.score1) / (2 * variance)
+
+    @property
+    def decision(self) -> Optional[bool]:
+        """ 接受 H1 时为 `True`，接受 H0 时为 `False`，还不能判断时为 `None` """
+        llr = self.llr
+        if llr >= self.upper_bound:
+            return True
+        if llr <= self.lower_bound:
+            return False
+        return None
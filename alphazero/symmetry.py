@@ -0,0 +1,183 @@
+# coding: utf-8
+from collections import namedtuple
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from .chess_board import ChessBoard
+
+Symmetry = namedtuple('Symmetry', ['name', 'matrix', 'is_swap_colors', 'feature_index', 'action_index', 'action_map'])
+
+# 正方形的 8 个对称变换，作用在 (行, 列) 位移上的矩阵
+DIHEDRAL_MATRICES = {
+    'identity': ((1, 0), (0, 1)),
+    'transpose': ((0, 1), (1, 0)),
+    'anti_transpose': ((0, -1), (-1, 0)),
+    'rotate_180': ((-1, 0), (0, -1)),
+    'rotate_90': ((0, -1), (1, 0)),
+    'rotate_270': ((0, 1), (-1, 0)),
+    'flip_rows': ((-1, 0), (0, 1)),
+    'flip_cols': ((1, 0), (0, -1)),
+}
+
+# 放墙方式 上、左、下、右 对应的方向
+PLACE_DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+
+
+def transform_offset(matrix, offset: Tuple[int, int]) -> Tuple[int, int]:
+    """ 对相对位移做对称变换 """
+    (a, b), (c, d) = matrix
+    return a * offset[0] + b * offset[1], c * offset[0] + d * offset[1]
+
+
+def transform_pos(matrix, pos: Tuple[int, int], board_len: int) -> Tuple[int, int]:
+    """ 对棋盘坐标做绕棋盘中心的对称变换 """
+    # 以两倍坐标计算，棋盘中心落在整数点上
+    m = board_len - 1
+    r, c = transform_offset(matrix, (2 * pos[0] - m, 2 * pos[1] - m))
+    return (r + m) // 2, (c + m) // 2
+
+
+@lru_cache(maxsize=None)
+def get_symmetries(board_len=7, n_feature_planes=13) -> List[Symmetry]:
+    """ 获取保持双方初始角落不变的所有对称变换，第一个为恒等变换
+
+    双方初始位置在左上角和右下角，主对角线翻转保持两个角不变；副对角线翻转和旋转 180° 会交换两个角，
+    需要同时交换双方颜色。其余变换会把棋子移到另外两个角，不在对局中出现，不用于数据扩充。
+    对称变换不改变走法规则和胜负，局面价值和走子方视角下的奖赏都保持不变
+
+    Parameters
+    ----------
+    board_len: int
+        棋盘大小
+
+    n_feature_planes: int
+        特征平面个数，平面顺序与 `ChessBoard.state` 相同
+
+    Returns
+    -------
+    symmetries: List[Symmetry]
+        每个元素的字段为：
+        * `name`: 变换名
+        * `matrix`: 作用在 (行, 列) 位移上的矩阵
+        * `is_swap_colors`: 是否交换双方颜色
+        * `feature_index`: 展平后的特征平面下标，变换后的第 i 个元素来自变换前的第 `feature_index[i]` 个元素
+        * `action_index`: 变换后第 i 个动作的概率来自变换前的第 `action_index[i]` 个动作
+        * `action_map`: 变换前的动作对应的变换后的动作
+    """
+    n = board_len
+    corners = {(0, 0), (n - 1, n - 1)}
+    symmetries = []
+    for name, matrix in DIHEDRAL_MATRICES.items():
+        if {transform_pos(matrix, pos, n) for pos in corners} != corners:
+            continue
+
+        is_swap_colors = transform_pos(matrix, (0, 0), n) != (0, 0)
+        feature_index = _feature_index(matrix, is_swap_colors, n, n_feature_planes)
+        action_map = _action_map(matrix)
+        action_index = np.argsort(action_map)
+        symmetries.append(Symmetry(name, matrix, is_swap_colors, torch.from_numpy(feature_index),
+                                   torch.from_numpy(action_index), tuple(action_map.tolist())))
+
+    return symmetries
+
+
+@lru_cache(maxsize=None)
+def get_symmetry_indexes(board_len=7, n_feature_planes=13) -> Tuple[Tensor, Tensor, Tensor]:
+    """ 把 `get_symmetries` 中各变换的下标堆叠起来，用于一次对一批样本做不同的对称变换
+
+    Returns
+    -------
+    feature_index: Tensor of shape (n_symmetries, n_feature_planes * board_len^2)
+        展平后的特征平面下标
+
+    action_map: Tensor of shape (n_symmetries, policy_dim)
+        变换前的动作对应的变换后的动作
+
+    is_swap_colors: Tensor of shape (n_symmetries, )
+        是否交换双方颜色
+    """
+    symmetries = get_symmetries(board_len, n_feature_planes)
+    feature_index = torch.stack([symmetry.feature_index for symmetry in symmetries])
+    action_map = torch.tensor([symmetry.action_map for symmetry in symmetries])
+    is_swap_colors = torch.tensor([symmetry.is_swap_colors for symmetry in symmetries])
+    return feature_index, action_map, is_swap_colors
+
+
+def transform(feature_planes: Tensor, pi: Tensor, symmetry: Symmetry) -> Tuple[Tensor, Tensor]:
+    """ 对样本做对称变换，可以是单个样本，也可以是一批样本
+
+    Parameters
+    ----------
+    feature_planes: Tensor of shape (..., n_feature_planes, board_len, board_len)
+        特征平面
+
+    pi: Tensor of shape (..., policy_dim)
+        策略
+
+    symmetry: Symmetry
+        对称变换
+
+    Returns
+    -------
+    feature_planes: Tensor
+        变换后的特征平面
+
+    pi: Tensor
+        变换后的策略
+    """
+    return transform_feature_planes(feature_planes, symmetry), pi[..., symmetry.action_index]
+
+
+def transform_feature_planes(feature_planes: Tensor, symmetry: Symmetry) -> Tensor:
+    """ 只对特征平面做对称变换，形状同 `transform` """
+    shape = feature_planes.shape
+    feature_planes = feature_planes.flatten(-3)[..., symmetry.feature_index].reshape(shape)
+    if symmetry.is_swap_colors:
+        feature_planes[..., 12, :, :] = 1 - feature_planes[..., 12, :, :]
+
+    return feature_planes
+
+
+def _feature_index(matrix, is_swap_colors: bool, board_len: int, n_feature_planes: int) -> np.ndarray:
+    """ 计算展平后特征平面的下标，谁该走的平面只交换位置不取反 """
+    n = board_len
+    n_cells = n * n
+    index = np.arange(n_feature_planes * n_cells).reshape(n_feature_planes, n_cells)
+    cell_map = [transform_pos(matrix, (cell // n, cell % n), n) for cell in range(n_cells)]
+
+    # 位置平面：格子随变换移动，交换颜色时蓝色和绿色的历史平面互换
+    for plane in range(6):
+        new_plane = (plane + 3) % 6 if is_swap_colors else plane
+        for cell, (r, c) in enumerate(cell_map):
+            index[new_plane, r * n + c] = plane * n_cells + cell
+
+    # 墙平面：横向墙 (r, c) 隔开 (r, c) 和 (r + 1, c)，纵向墙 (r, c) 隔开 (r, c) 和 (r, c + 1)，
+    # 变换后的两个格子决定新的墙是横向还是纵向
+    for age in range(3):
+        for is_horizontal, plane in ((True, 6 + age), (False, 9 + age)):
+            for r in range(n - 1 if is_horizontal else n):
+                for c in range(n if is_horizontal else n - 1):
+                    other = (r + 1, c) if is_horizontal else (r, c + 1)
+                    (r0, c0), (r1, c1) = sorted([transform_pos(matrix, (r, c), n), transform_pos(matrix, other, n)])
+                    new_plane = 6 + age if r0 != r1 else 9 + age
+                    index[new_plane, r0 * n + c0] = plane * n_cells + r * n + c
+
+    # 棋盘边缘外没有墙，保持原样
+    return index.flatten()
+
+
+def _action_map(matrix) -> np.ndarray:
+    """ 计算变换前的动作对应的变换后的动作 """
+    n_places = len(PLACE_DIRECTIONS)
+    action_map = np.zeros(len(ChessBoard.action_to_pos) * n_places, dtype=np.int64)
+    for move, offset in ChessBoard.action_to_pos.items():
+        new_move = ChessBoard.pos_to_action[transform_offset(matrix, offset)]
+        for place, direction in enumerate(PLACE_DIRECTIONS):
+            new_place = PLACE_DIRECTIONS.index(transform_offset(matrix, direction))
+            action_map[move * n_places + place] = new_move * n_places + new_place
+
+    return action_map
@@ -1,10 +1,9 @@
 # coding: utf-8
-import math
-
 import numpy as np
 
 from .chess_board import ChessBoard
-from .node import Node
+from .array_tree import ArrayTree
+from .distance import DistanceMaps, relative_territory
 
 
 class TerritoryMCTS:
@@ -22,7 +21,7 @@ class TerritoryMCTS:
         """
         self.c_puct = c_puct
         self.n_iters = n_iters
-        self.root = Node(1, c_puct, parent=None)
+        self.tree = ArrayTree(c_puct)
 
     def get_action(self, chess_board: ChessBoard) -> int:
         """ 根据当前局面返回下一步动作
@@ -32,32 +31,38 @@ class TerritoryMCTS:
         chess_board: ChessBoard
             棋盘
         """
+        tree = self.tree
         for i in range(self.n_iters):
-            # 拷贝一个棋盘用来模拟
-            board = chess_board.copy()
+            # 直接在棋盘上模拟，结束后撤销
+            board = chess_board
 
-            # 如果没有遇到叶节点，就一直向下搜索并更新棋盘
-            node = self.root
-            while not node.is_leaf_node():
-                action, node = node.select()
-                board.do_action(action)
+            # 如果没有遇到叶节点，就一直向下搜索并更新棋盘，记录经过的节点供反向传播使用
+            node = tree.root
+            path = [node]
+            while not tree.is_leaf_node(node):
+                action, node = tree.select(node)
+                board.push(action)
+                path.append(node)
 
             # 判断游戏是否结束，如果没结束就拓展叶节点
             is_over, winner = board.is_game_over()
             if not is_over:
-                node.expand(self.__default_policy(board))
+                tree.expand(node, self.__default_policy(board))
 
             # 模拟
             value = self.__max_territory_value(board)
             # 反向传播
-            node.backup(-value)
+            tree.backup(path, -value)
 
-        # 根据子节点的访问次数来选择动作
-        action = max(self.root.children.items(), key=lambda x: x[1].N)[0]
+            for _ in range(len(path) - 1):
+                board.pop()
 
+        # 根据子节点的访问次数来选择动作
+        actions, visits = tree.children(tree.root)
+        action = int(actions[np.argmax(visits)])
 
-        # 更新根节点
-        self.root = Node(prior_prob=1)
+        # 重置搜索树
+        tree.reset()
         return action
 
     def __default_policy(self, chess_board: ChessBoard):
@@ -73,76 +78,29 @@ class TerritoryMCTS:
         probs = np.ones(n) / n
         return zip(chess_board.available_actions, probs)
 
-    def __max_territory_value(self, chess_board: ChessBoard) -> int:
+    def __max_territory_value(self, chess_board: ChessBoard) -> float:
         """
         根据领地大小判断单签局面的价值
         :returns: value
         """
-
-        def terr_function(my_distance, enemy_distance):
-            """
-            距离 -> 领地计算函数
-            :param my_distance: 我方到某一格的距离
-            :param enemy_distance: 敌方到某一格的距离
-            :return: 领地函数值，0~1，1代表完全为自己领地
-            """
-            if my_distance == -1:
-                return 0
-
-            if enemy_distance == -1:
-                return 1
-
-            return 1 / (1 + math.e ** (2 * (my_distance - enemy_distance) + 2))
-
-        if chess_board.is_game_over()[0]:
-            if chess_board.is_game_over()[1] == chess_board.state[12, 0, 0]:
-                # 一步杀
-                score = 1
-            elif chess_board.is_game_over()[1] == 1 - chess_board.state[12, 0, 0]:
-                # 一步死
-                score = -1
-            else:
-                # 一步平
-                score = 0
-
-        else:
-            active_player = 0 if chess_board.state[12, 0, 0] == 0 else 3
-
-            active_player_distance = chess_board.distance(chess_board.state[active_player],
-                                                          chess_board.state[3 - active_player],
-                                                          chess_board.state[6],
-                                                          chess_board.state[9])
-            inactive_player_distance = chess_board.distance(chess_board.state[3 - active_player],
-                                                            chess_board.state[active_player],
-                                                            chess_board.state[6],
-                                                            chess_board.state[9])
-            active_player_terr = 0
-            inactive_player_terr = 0
-            all_terr = chess_board.board_len ** 2  # 所有格子数
-
-            for i in range(chess_board.board_len):
-                for j in range(chess_board.board_len):
-                    if inactive_player_distance[i, j] == -1:
-                        # 对方无法到达的位置
-                        if active_player_distance[i, j] >= 0:
-                            # 自己可以到达
-                            active_player_terr += 1
-                        else:
-                            # 自己也无法到达，所有格子数减一
-                            all_terr -= 1
-                    else:
-                        # 对方可以到达的位置
-                        if active_player_distance[i, j] >= 0:
-                            # 自己可以到达
-                            active_player_terr += terr_function(
-                                active_player_distance[i, j], inactive_player_distance[i, j])
-
-                            inactive_player_terr += terr_function(
-                                inactive_player_distance[i, j], active_player_distance[i, j])
-
-                        else:
-                            inactive_player_terr += 1
-
-            score = (active_player_terr - inactive_player_terr) / all_terr
-
-        return score
+        is_over, winner = chess_board.is_game_over()
+        player = chess_board.current_player
+        if is_over:
+            # 一步杀为 1，一步死为 -1，一步平为 0
+            return 0 if winner is None else 1 if winner == player else -1
+
+        distances = DistanceMaps.from_board(chess_board).distances
+        active_player_terr, inactive_player_terr, all_terr = relative_territory(
+            distances[player], distances[1 - player], terr_function)
+        return float((active_player_terr - inactive_player_terr) / all_terr)
+
+
+def terr_function(my_distance, enemy_distance):
+    """
+    距离 -> 领地计算函数，对数组逐元素计算
+    :param my_distance: 我方到某一格的距离
+    :param enemy_distance: 敌方到某一格的距离
+    :return: 领地函数值，0~1，1代表完全为自己领地
+    """
+    value = 1 / (1 + np.exp(2 * (my_distance.astype(float) - enemy_distance) + 2))
+    return np.where(my_distance == -1, 0.0, np.where(enemy_distance == -1, 1.0, value))
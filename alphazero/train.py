@@ -2,19 +2,26 @@
 import json
 import multiprocessing
 import os
+import queue
 import time
 import traceback
+from collections import namedtuple
+from typing import List, Optional
 
+import numpy as np
 import torch
 import torch.nn.functional as F
 from torch import nn, optim, cuda
 from torch.optim.lr_scheduler import ExponentialLR
-from torch.utils.data import DataLoader
 
 from .alpha_zero_mcts import AlphaZeroMCTS
 from .chess_board import ChessBoard
+from .inference_server import InferenceServer
 from .policy_value_net import PolicyValueNet
-from .self_play_dataset import SelfPlayData, SelfPlayDataSet
+from .sample_store import SampleStore
+from .self_play_dataset import SelfPlayDataSet
+from .self_play_pool import SelfPlayWorkerPool
+from .sprt import SPRT
 
 
 def exception_handler(train_func):
@@ -33,6 +40,159 @@ def exception_handler(train_func):
     return wrapper
 
 
+GateResult = namedtuple('GateResult', ['is_promoted', 'score', 'n_games', 'llr'])
+
+# 测试进程中的两个模型和棋盘，由 `init_gate_worker` 创建
+_gate_players = None
+
+
+def gate_model(policy_value_net: PolicyValueNet, model_path: str, n_test_games: int, mcts_kwargs: dict,
+               evaluation_cache_size=0, is_use_gpu=False, board_len=7, n_feature_planes=13, n_workers=1,
+               sprt: SPRT = None) -> Optional[GateResult]:
+    """ 当前模型与历史最优模型轮流执蓝比赛，用序贯概率比检验决定是否保存当前模型为最优模型
+
+    每下完一局就更新检验，结论明确时立即停止；下满 `n_test_games` 局仍没有结论时，平均得分大于 55% 才保存
+
+    Parameters
+    ----------
+    policy_value_net: PolicyValueNet
+        当前模型
+
+    model_path: str
+        历史最优模型的路径，不存在时直接保存当前模型
+
+    n_test_games: int
+        最多比赛局数，先后手各一局为一对，为奇数时不下最后一局
+
+    mcts_kwargs: dict
+        创建 `AlphaZeroMCTS` 的参数
+
+    n_workers: int
+        同时比赛的进程数，为 1 时在当前进程中比赛
+
+    sprt: SPRT
+        序贯概率比检验，默认为 `SPRT()`
+
+    Returns
+    -------
+    result: Optional[GateResult]
+        是否保存了当前模型、当前模型的平均得分、比赛局数和对数似然比，历史最优模型不存在时为 `None`
+    """
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+
+    # 如果最佳模型不存在保存当前模型为最佳模型
+    if not os.path.exists(model_path):
+        torch.save(policy_value_net, model_path)
+        return None
+
+    sprt = sprt or SPRT()
+    initargs = (policy_value_net, model_path, mcts_kwargs, evaluation_cache_size, is_use_gpu, board_len,
+                n_feature_planes)
+    games = range(n_test_games - n_test_games % 2)
+    if n_workers == 1:
+        init_gate_worker(*initargs)
+        scores = map(play_gate_game, games)
+    else:
+        pool = multiprocessing.get_context('spawn').Pool(n_workers, init_gate_worker, initargs)
+        scores = pool.imap(play_gate_game, games)
+
+    # 按对局顺序取结果，每凑齐一对先后手对局才更新检验，避免提前停止偏向结束得快的对局，
+    # 结论明确后丢弃还在进行的对局
+    try:
+        for current_blue_score, current_green_score in zip(scores, scores):
+            sprt.update(current_blue_score)
+            sprt.update(current_green_score)
+            if sprt.decision is not None:
+                break
+    finally:
+        if n_workers == 1:
+            init_gate_worker(None)
+        else:
+            pool.terminate()
+            pool.join()
+
+    is_promoted = sprt.decision if sprt.decision is not None else sprt.score > 0.55
+    if is_promoted:
+        torch.save(policy_value_net, model_path)
+
+    return GateResult(is_promoted, sprt.score, len(sprt), sprt.llr)
+
+
+def init_gate_worker(policy_value_net: Optional[PolicyValueNet], model_path: str = None, mcts_kwargs: dict = None,
+                     evaluation_cache_size=0, is_use_gpu=False, board_len=7, n_feature_planes=13):
+    """ 载入历史最优模型，创建两个模型的蒙特卡洛树和棋盘，`policy_value_net` 为 `None` 时释放它们 """
+    global _gate_players
+    if policy_value_net is None:
+        _gate_players = None
+        return
+
+    # 进程池中的每个进程只用一个线程，避免互相争抢 CPU
+    if multiprocessing.parent_process() is not None:
+        torch.set_num_threads(1)
+
+    best_model = torch.load(model_path, weights_only=False)  # type:PolicyValueNet
+    best_model.eval()
+    best_model.set_device(is_use_gpu)
+    best_model.set_symmetry_mode(policy_value_net.symmetry_mode)
+    best_model.set_evaluation_cache(evaluation_cache_size)
+    policy_value_net.eval()
+    mcts = AlphaZeroMCTS(policy_value_net, **mcts_kwargs)
+    best_mcts = AlphaZeroMCTS(best_model, **mcts_kwargs)
+    _gate_players = (mcts, best_mcts, ChessBoard(board_len, n_feature_planes))
+
+
+def play_gate_game(game_index: int) -> float:
+    """ 下一局测试对局，偶数局当前模型执蓝，奇数局执绿，返回当前模型的得分 """
+    mcts, best_mcts, chess_board = _gate_players
+    players = (mcts, best_mcts) if game_index % 2 == 0 else (best_mcts, mcts)
+
+    chess_board.clear_board()
+    mcts.reset_root()
+    best_mcts.reset_root()
+    is_over, winner = False, None
+    while not is_over:
+        # 两个模型轮流走一步
+        for player_mcts in players:
+            chess_board.do_action(player_mcts.get_action(chess_board))
+            is_over, winner = chess_board.is_game_over()
+            if is_over:
+                break
+
+    if winner is None:
+        return 0.5
+    return float(winner == game_index % 2)
+
+
+def run_evaluator(policy_value_net: PolicyValueNet, candidates, results, model_path: str, n_test_games: int,
+                  mcts_kwargs: dict, evaluation_cache_size: int, is_use_gpu: bool, board_len: int,
+                  n_feature_planes: int, sprt_kwargs: dict):
+    """ 后台测试模型的进程，从 `candidates` 取出待测试的权重，把 `gate_model` 的结果放入 `results`，收到 `None` 时退出 """
+    torch.set_num_threads(1)
+    policy_value_net.eval()
+    while True:
+        state_dict = candidates.get()
+        if state_dict is None:
+            break
+
+        # 后台进程是守护进程，不能再创建进程池，只在本进程中比赛
+        policy_value_net.load_state_dict(state_dict)
+        results.put(gate_model(policy_value_net, model_path, n_test_games, mcts_kwargs, evaluation_cache_size,
+                               is_use_gpu, board_len, n_feature_planes, sprt=SPRT(**sprt_kwargs)))
+
+
+def print_gate_result(result: Optional[GateResult]):
+    """ 打印 `gate_model` 的结果 """
+    if result is None:
+        print('🥇 历史最优模型不存在，保存当前模型为最优模型\n')
+        return
+
+    summary = f'当前模型 {result.n_games} 局平均得分为：{result.score:.1%}，对数似然比为：{result.llr:.2f}'
+    if result.is_promoted:
+        print(f'🥇 保存当前模型为最优模型，{summary}\n')
+    else:
+        print(f'🎃 保持历史最优模型不变，{summary}\n')
+
+
 class PolicyValueLoss(nn.Module):
     """ 根据 self-play 产生的 `z` 和 `π` 计算误差 """
 
@@ -68,7 +228,11 @@ class TrainModel:
     def __init__(self, board_len=7, lr=1e-4, n_self_plays=10, n_mcts_iters=500,
                  n_feature_planes=13, policy_output_dim=100, batch_size=500, start_train_size=500, max_process=4,
                  check_frequency=100,
-                 n_test_games=10, c_puct=4, gamma=0.8, is_use_gpu=True, is_save_game=False, **kwargs):
+                 n_test_games=100, c_puct=4, gamma=0.8, is_use_gpu=True, is_save_game=False,
+                 evaluation_cache_size=20000, use_inference_server=False, max_inference_batch_size=64,
+                 max_inference_wait=1e-3, is_async=False, sample_reuse=4, sample_store_dir=None, n_test_processes=1,
+                 gate_elo_bounds=(0, 100), gate_error_rate=0.1, symmetry_mode=None, mcts_batch_size=1,
+                 virtual_loss=3, **kwargs):
         """
         Parameters
         ----------
@@ -84,6 +248,12 @@ class TrainModel:
         n_mcts_iters: int
             蒙特卡洛树搜索次数
 
+        mcts_batch_size: int
+            蒙特卡洛树搜索每轮收集的叶节点个数，这些叶节点用一次前馈批量估值，自我博弈和测试模型时都使用
+
+        virtual_loss: float
+            批量搜索时对尚未估值的路径施加的虚拟损失（虚拟失败的次数）
+
         n_feature_planes: int
             特征平面个数
 
@@ -97,7 +267,7 @@ class TrainModel:
             测试模型的频率
 
         n_test_games: int
-            测试模型时与历史最优模型的比赛局数
+            测试模型时与历史最优模型最多比赛的局数，序贯概率比检验有结论时提前停止
 
         c_puct: float
             探索常数
@@ -107,6 +277,42 @@ class TrainModel:
 
         is_save_game: bool
             是否保存自对弈的棋谱
+
+        evaluation_cache_size: int
+            策略-价值网络估值缓存最多保存的局面数，为 0 时不使用缓存
+
+        use_inference_server: bool
+            是否使用推理服务器，自我博弈进程不再各自持有网络，而是把局面发给同一个估值进程批量计算
+
+        max_inference_batch_size: int
+            推理服务器一次前馈的最大局面数
+
+        max_inference_wait: float
+            推理服务器收到第一个请求后最多等待多少秒再开始前馈
+
+        is_async: bool
+            是否异步训练：自我博弈进程不停地产生棋局，主进程一有数据就训练，测试模型在后台进程中进行
+
+        sample_reuse: float
+            异步训练时平均每个自我博弈产生的局面被训练的次数，训练过快时会等待新的棋局
+
+        sample_store_dir: str
+            磁盘样本库所在文件夹，设置后每局自我博弈数据都会追加到样本库中，
+            启动时用样本库中最新的样本填充数据集，为 `None` 时不使用样本库
+
+        n_test_processes: int
+            同步训练时测试模型的进程数，异步训练时测试在后台进程中进行，始终只用一个进程
+
+        gate_elo_bounds: Tuple[float, float]
+            序贯概率比检验 H0 和 H1 下当前模型比历史最优模型高的 elo，
+            两者越接近需要的局数越多，默认值平均 30~40 局就有结论，不会超出 `n_test_games` 的默认值
+
+        gate_error_rate: float
+            序贯概率比检验的两类错误率
+
+        symmetry_mode: Optional[str]
+            自我博弈和测试模型时网络估值使用的对称变换，见 `PolicyValueNet.set_symmetry_mode`，
+            为 `'average'` 时每次估值更准，可以用更少的搜索次数
         """
         self.c_puct = c_puct
         self.is_use_gpu = is_use_gpu
@@ -115,21 +321,32 @@ class TrainModel:
         self.gamma = gamma
         self.n_self_plays = n_self_plays
         self.n_test_games = n_test_games
+        self.n_test_processes = n_test_processes
+        self.sprt_kwargs = dict(elo0=gate_elo_bounds[0], elo1=gate_elo_bounds[1], alpha=gate_error_rate,
+                                beta=gate_error_rate)
         self.n_mcts_iters = n_mcts_iters
+        self.mcts_batch_size = mcts_batch_size
+        self.virtual_loss = virtual_loss
         self.is_save_game = is_save_game
         self.check_frequency = check_frequency
         self.start_train_size = start_train_size
         self.max_process = max_process
+        self.evaluation_cache_size = evaluation_cache_size
+        self.use_inference_server = use_inference_server
+        self.max_inference_batch_size = max_inference_batch_size
+        self.max_inference_wait = max_inference_wait
+        self.is_async = is_async
+        self.sample_reuse = sample_reuse
+        self.model_path = './model/best_policy_value_net.pth'
         self.device = torch.device('cuda:0' if is_use_gpu and cuda.is_available() else 'cpu')
         self.chess_board = ChessBoard(board_len, n_feature_planes)
 
-        # 创建策略-价值网络和蒙特卡洛搜索树
+        # 创建策略-价值网络
         self.policy_value_net = self.__get_policy_value_net(board_len)
+        self.policy_value_net.set_symmetry_mode(symmetry_mode)
+        self.policy_value_net.set_evaluation_cache(evaluation_cache_size)
         # summary(self.policy_value_net)
 
-        self.mcts = AlphaZeroMCTS(self.policy_value_net, c_puct=c_puct, n_iters=n_mcts_iters,
-                                  policy_dim=policy_output_dim, is_self_play=True)
-
         # 创建优化器和损失函数
         self.optimizer = optim.Adam(self.policy_value_net.parameters(), lr=lr, weight_decay=1e-4)
         self.criterion = PolicyValueLoss()
@@ -137,180 +354,201 @@ class TrainModel:
         self.lr_scheduler = ExponentialLR(self.optimizer, gamma=0.998)  # 0.998 ** 1000 = 0.135
 
         # 创建数据集
-        self.dataset = SelfPlayDataSet(board_len)
+        self.dataset = SelfPlayDataSet(board_len, n_feature_planes, policy_output_dim)
+        self.sample_store = None
+        if sample_store_dir is not None:
+            self.sample_store = SampleStore(sample_store_dir, board_len, n_feature_planes, policy_output_dim)
+            self.__load_samples()
 
         # 记录数据
         self.train_losses = self.__load_data('log/train_losses.json')
         self.games = self.__load_data('log/games.json')
 
-    def __self_play(self):
-        """ 自我博弈一局
-
-        Returns
-        -------
-        self_play_data: namedtuple
-            自我博弈数据，有以下三个成员:
-            * `pi_list`: 蒙特卡洛树搜索产生的动作概率向量 π 组成的列表
-            * `z_list`: 一局之中每个动作的玩家相对最后的游戏结果的奖赏列表
-            * `feature_planes_list`: 一局之中每个动作对应的特征平面组成的列表
-        """
-        # 初始化棋盘和数据容器
-        self.policy_value_net.eval()
-        self.chess_board.clear_board()
-        pi_list, feature_planes_list, players = [], [], []
-        action_list = []
-
-        # 开始一局游戏
-        while True:
-            action, pi = self.mcts.get_action(self.chess_board)
-
-            # 保存每一步的数据
-            feature_planes_list.append(self.chess_board.get_feature_planes())
-            players.append(self.chess_board.state[12, 0, 0])
-            action_list.append(action)
-            pi_list.append(pi)
-            self.chess_board.do_action(action)
-
-            # 判断游戏是否结束
-            is_over, winner = self.chess_board.is_game_over()
-            if is_over:
-                if winner is not None:
-                    z_list = []
-
-                    # 最后一步价值为1，每向前一步价值乘以gamma
-                    for i in range(len(players)):
-                        if players[i] == winner:
-                            z_list.append(self.gamma ** (players[i:].count(winner) - 1))
-                        else:
-                            z_list.append(-self.gamma ** (players[i:].count(1 - winner) - 1))
-
-                else:
-                    z_list = [0] * len(players)
-                break
-
-        # 重置根节点
-        self.mcts.reset_root()
-
-        self_play_data = SelfPlayData(pi_list=pi_list, z_list=z_list, feature_planes_list=feature_planes_list)
-        if self.is_save_game:
-            return (self_play_data, action_list)
-        else:
-            return (self_play_data,)
-
-    def play_once(self, num):
-        """进行单次自对弈并且加入数据集"""
-        try:
-            game_timer = time.time()
-            result = self.__self_play()
-            print(f'⏱️ 第 {num + 1} 局耗时 {time.time() - game_timer:.1f} 秒')
-            return result
-        except BaseException as e:
-            if not isinstance(e, KeyboardInterrupt):
-                traceback.print_exc()
-            pass
-
     @exception_handler
     def train(self):
         """ 训练模型 """
-        ctx = multiprocessing.get_context("spawn")
-        pool = ctx.Pool(processes=self.max_process)
+        workers, server = self.__create_workers()
+        try:
+            if self.is_async:
+                self.__train_async(workers, server)
+            else:
+                self.__train(workers, server)
+        finally:
+            workers.stop()
+            if server is not None:
+                server.stop()
+
+    def __train(self, workers: SelfPlayWorkerPool, server: Optional[InferenceServer]):
+        """ 训练主循环，每收到 `max_process` 局新棋局训练一次，训练时自我博弈进程继续下棋 """
         for i in range(self.n_self_plays // self.max_process):
-            pool.apply(func=print, args=(
-                f'🏹 正在进行第 {i * self.max_process + 1} 至 {(i + 1) * self.max_process} 局自我博弈游戏...', ' '))
-            results = pool.map(func=self.play_once, iterable=range(i * self.max_process, (i + 1) * self.max_process))
-
-            for result in results:
-                self.dataset.append(result[0])
-                if self.is_save_game:
-                    self.games.append(result[1])
+            print(f'🏹 正在收集第 {i * self.max_process + 1} 至 {(i + 1) * self.max_process} 局自我博弈游戏...')
+            for _ in range(self.max_process):
+                self.__add_game(*workers.get_game())
 
             if len(self.dataset) >= self.start_train_size:
-                data_loader = iter(DataLoader(self.dataset, self.batch_size, shuffle=True, drop_last=False))
-
                 print('💊 开始训练...', end=' ')
-
                 train_timer = time.time()
-
-                self.policy_value_net.train()
-
-                # 随机选出一批数据来训练，防止过拟合
-                feature_planes, pi, z = next(data_loader)
-                feature_planes = feature_planes.to(self.device)
-                pi, z = pi.to(self.device), z.to(self.device)
-
-                for _ in range(5):
-                    # 前馈
-                    p_hat, value = self.policy_value_net(feature_planes)
-                    # 梯度清零
-                    self.optimizer.zero_grad()
-                    # 计算损失
-                    loss = self.criterion(p_hat, pi, value.flatten(), z)
-                    # 误差反向传播
-                    loss.backward()
-                    # 更新参数
-                    self.optimizer.step()
-                    # 学习率退火
-                    self.lr_scheduler.step()
+                loss = self.__update(5)
 
                 # 记录误差
-                self.train_losses.append([i, loss.item()])
+                self.train_losses.append([i, loss])
 
                 print(f'⏱️ 耗时 {time.time() - train_timer:.1f} 秒')
-                print(f"🚩 train_loss = {loss.item():<10.5f}")
+                print(f"🚩 train_loss = {loss:<10.5f}")
+
+                # 把新的权重发给自我博弈进程或推理服务器
+                self.__broadcast(workers, server)
+                if server is not None:
+                    print(f'📡 推理服务器平均每批 {server.mean_batch_size:.1f} 个局面')
+
                 # 测试模型
                 if (i + 1) * self.max_process % self.check_frequency == 0:
                     self.__test_model()
             print()
-        pool.close()
-        pool.join()
 
-    def __test_model(self):
-        """ 测试模型 """
-        os.makedirs('./model', exist_ok=True)
+    def __train_async(self, workers: SelfPlayWorkerPool, server: Optional[InferenceServer]):
+        """ 异步训练主循环：自我博弈进程不停下棋，主进程按 `sample_reuse` 控制训练速度，测试模型在后台进程中进行 """
+        ctx = multiprocessing.get_context('spawn')
+        candidates, results = ctx.Queue(), ctx.Queue()
+        evaluator = ctx.Process(target=run_evaluator, daemon=True, args=(
+            self.policy_value_net, candidates, results, self.model_path, self.n_test_games, self.__mcts_kwargs(),
+            self.evaluation_cache_size, self.is_use_gpu, self.chess_board.board_len,
+            self.chess_board.n_feature_planes, self.sprt_kwargs))
+        evaluator.start()
+
+        n_games = n_positions = n_trained = n_steps = 0
+        next_check = self.check_frequency
+        is_evaluating = False
+        start_time = last_report = time.time()
+        try:
+            while n_games < self.n_self_plays:
+                # 取出已经下完的棋局，不能训练时阻塞等待下一局
+                can_train = len(self.dataset) >= self.start_train_size and \
+                    n_trained < self.sample_reuse * n_positions
+                for self_play_data, action_list in workers.get_games() if can_train else [workers.get_game()]:
+                    self.__add_game(self_play_data, action_list)
+                    n_games += 1
+                    n_positions += len(action_list)
+
+                if can_train:
+                    loss = self.__update(1)
+                    n_trained += self.batch_size
+                    n_steps += 1
+                    if n_steps % 5 == 0:
+                        self.train_losses.append([n_steps, loss])
+                        self.__broadcast(workers, server)
+
+                # 后台测试模型，同一时间只测试一个模型
+                if n_games >= next_check and not is_evaluating:
+                    next_check += self.check_frequency
+                    is_evaluating = True
+                    candidates.put({k: v.cpu().clone() for k, v in self.policy_value_net.state_dict().items()})
+                try:
+                    print_gate_result(results.get_nowait())
+                    is_evaluating = False
+                except queue.Empty:
+                    pass
+
+                # 每分钟报告一次吞吐量
+                if time.time() - last_report > 60:
+                    last_report = time.time()
+                    self.__report_throughput(last_report - start_time, n_games, n_positions, n_trained, workers)
+
+            self.__report_throughput(time.time() - start_time, n_games, n_positions, n_trained, workers)
+        finally:
+            # 正在进行的测试会被丢弃
+            candidates.put(None)
+            evaluator.join(timeout=1)
+            evaluator.terminate()
+
+    def __add_game(self, self_play_data, action_list: List[int]):
+        """ 把一局自我博弈数据加入数据集，并追加到样本库 """
+        self.dataset.append(self_play_data)
+        if self.sample_store is not None:
+            self.sample_store.append(self_play_data, action_list)
+        if self.is_save_game:
+            self.games.append(action_list)
+
+    def __load_samples(self, chunk_size=65536):
+        """ 用样本库中最新的样本填充数据集，分段读取以免占用太多内存 """
+        store = self.sample_store
+        start = max(len(store) - self.dataset.capacity, 0)
+        for i in range(start, len(store), chunk_size):
+            self.dataset.extend(*store.read(np.arange(i, min(i + chunk_size, len(store)))))
+
+        if len(store):
+            print(f'📂 从样本库 {store.root} 载入 {len(self.dataset)} 个样本')
+
+    @staticmethod
+    def __report_throughput(elapsed: float, n_games: int, n_positions: int, n_trained: int,
+                            workers: SelfPlayWorkerPool):
+        """ 打印异步训练的吞吐量 """
+        print(f'📈 {n_games / elapsed * 3600:.1f} 局/小时，训练 {n_trained / elapsed:.1f} 局面/秒，'
+              f'网络估值 {workers.n_evaluations / elapsed:.1f} 局面/秒，'
+              f'样本复用率 {n_trained / max(n_positions, 1):.2f}')
+
+    def __update(self, n_steps: int) -> float:
+        """ 从数据集中随机选出一个 mini-batch，在上面更新 `n_steps` 次参数，返回最后一次的误差 """
+        self.policy_value_net.train()
+
+        # 随机选出一批数据来训练，防止过拟合
+        feature_planes, pi, z = self.dataset.sample(self.batch_size)
+        feature_planes = feature_planes.to(self.device)
+        pi, z = pi.to(self.device), z.to(self.device)
+
+        for _ in range(n_steps):
+            # 前馈
+            p_hat, value = self.policy_value_net(feature_planes)
+            # 梯度清零
+            self.optimizer.zero_grad()
+            # 计算损失
+            loss = self.criterion(p_hat, pi, value.flatten(), z)
+            # 误差反向传播
+            loss.backward()
+            # 更新参数，缓存的估值随之失效
+            self.optimizer.step()
+            self.policy_value_net.clear_evaluation_cache()
+            # 学习率退火
+            self.lr_scheduler.step()
 
-        model_path = './model/best_policy_value_net.pth'
+        self.policy_value_net.eval()
+        return loss.item()
 
-        # 如果最佳模型不存在保存当前模型为最佳模型
-        if not os.path.exists(model_path):
-            torch.save(self.policy_value_net, model_path)
-            return
+    def __broadcast(self, workers: SelfPlayWorkerPool, server: Optional[InferenceServer]):
+        """ 把新的权重发给自我博弈进程或推理服务器 """
+        if server is not None:
+            server.load_state_dict(self.policy_value_net.state_dict())
+        else:
+            workers.broadcast(self.policy_value_net.state_dict())
+
+    def __create_workers(self):
+        """ 创建并启动常驻的自我博弈进程，使用推理服务器时同时启动推理服务器 """
+        server, clients = None, None
+        if self.use_inference_server:
+            server = InferenceServer(self.policy_value_net, self.max_process, self.max_inference_batch_size,
+                                     self.max_inference_wait, evaluation_cache_size=self.evaluation_cache_size)
+            server.start()
+            clients = [server.get_client(worker_id) for worker_id in range(self.max_process)]
 
-        # 载入历史最优模型
-        best_model = torch.load(model_path)  # type:PolicyValueNet
-        best_model.eval()
-        best_model.set_device(self.is_use_gpu)
-        mcts = AlphaZeroMCTS(best_model, self.c_puct, self.n_mcts_iters, self.policy_output_dim)
-        self.mcts.set_self_play(False)
         self.policy_value_net.eval()
+        workers = SelfPlayWorkerPool(self.policy_value_net, self.max_process, self.__mcts_kwargs(), self.gamma,
+                                     self.chess_board.board_len, self.chess_board.n_feature_planes, clients)
+        workers.start()
+        return workers, server
 
-        # 开始比赛
+    def __test_model(self):
+        """ 测试模型 """
         print('🩺 正在测试当前模型...')
-        n_wins = 0
-        for i in range(self.n_test_games):
-            self.chess_board.clear_board()
-            self.mcts.reset_root()
-            mcts.reset_root()
-            while True:
-                # 当前模型走一步
-                is_over, winner = self.__do_mcts_action(self.mcts)
-                if is_over:
-                    n_wins += int(winner == self.chess_board.Player_Blue)
-                    break
-                # 历史最优模型走一步
-                is_over, winner = self.__do_mcts_action(mcts)
-                if is_over:
-                    n_wins += int(winner == self.chess_board.Player_Blue)
-                    break
-
-        # 如果胜率大于 55%，就保存当前模型为最优模型
-        win_prob = n_wins / self.n_test_games
-        if win_prob > 0.55:
-            torch.save(self.mcts.policy_value_net, model_path)
-            print(f'🥇 保存当前模型为最优模型，当前模型胜率为：{win_prob:.1%}\n')
-        else:
-            print(f'🎃 保持历史最优模型不变，当前模型胜率为：{win_prob:.1%}\n')
+        self.policy_value_net.eval()
+        result = gate_model(self.policy_value_net, self.model_path, self.n_test_games, self.__mcts_kwargs(),
+                            self.evaluation_cache_size, self.is_use_gpu, self.chess_board.board_len,
+                            self.chess_board.n_feature_planes, self.n_test_processes, SPRT(**self.sprt_kwargs))
+        print_gate_result(result)
 
-        self.mcts.set_self_play(True)
+    def __mcts_kwargs(self) -> dict:
+        """ 创建 `AlphaZeroMCTS` 的参数 """
+        return dict(c_puct=self.c_puct, n_iters=self.n_mcts_iters, policy_dim=self.policy_output_dim,
+                    batch_size=self.mcts_batch_size, virtual_loss=self.virtual_loss)
 
     def save_model(self, model_name: str, loss_name: str, game_name: str):
         """ 保存模型
@@ -343,13 +581,6 @@ class TrainModel:
             with open(f'log/train/{game_name}.json', 'w', encoding='utf-8') as f:
                 json.dump(self.games, f)
 
-    def __do_mcts_action(self, mcts):
-        """ 获取动作 """
-        action = mcts.get_action(self.chess_board)
-        self.chess_board.do_action(action)
-        is_over, winner = self.chess_board.is_game_over()
-        return is_over, winner
-
     def __get_policy_value_net(self, board_len=9):
         """ 创建策略-价值网络，如果存在历史最优模型则直接载入最优模型 """
         os.makedirs('./model', exist_ok=True)
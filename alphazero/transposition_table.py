@@ -0,0 +1,67 @@
+# coding: utf-8
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class TranspositionTable:
+    """ 以棋盘 Zobrist 哈希为键的置换表，保存策略价值网络的估值，超出容量时淘汰最久未使用的项 """
+
+    def __init__(self, capacity: int = 100000):
+        """
+        Parameters
+        ----------
+        capacity: int
+            最多保存的局面数
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: int) -> Optional[Tuple[np.ndarray, float]]:
+        """ 查询局面的估值
+
+        Parameters
+        ----------
+        key: int
+            局面的哈希
+
+        Returns
+        -------
+        entry: Optional[Tuple[np.ndarray, float]]
+            `(可用动作的先验概率, 价值)`，没有记录时为 `None`
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: int, probs: np.ndarray, value: float):
+        """ 保存局面的估值 """
+        self.entries[key] = (probs, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        """ 命中率 """
+        n_lookups = self.hits + self.misses
+        return self.hits / n_lookups if n_lookups else 0
+
+    def clear(self):
+        """ 清空置换表，在网络权重改变后调用 """
+        self.entries.clear()
+
+    def reset_stats(self):
+        """ 重置命中次数统计 """
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
@@ -8,6 +8,7 @@ from PySide6.QtWidgets import QFileDialog
 from qfluentwidgets import InfoBar, FluentIcon, InfoBarPosition, StateToolTip, CardWidget, isDarkTheme
 
 from alphazero import ChessBoard
+from alphazero.distance import DistanceMaps
 from app.common import *
 from app.config import *
 from arena import *
@@ -645,11 +646,13 @@ class BoardWidget(CardWidget):
             self.onHistoryChanged.emit(self.history)
             self.onStepChanged.emit(self.current_step)
 
-        if self.board.is_game_over_()[0]:
+        if self.board.is_game_over()[0]:
             self.running = False
 
-            self.blue_final_territory = self.board.is_game_over_()[1]
-            self.green_final_territory = self.board.is_game_over_()[2]
+            # 双方隔开后，各自能到达的格子就是领地
+            distance_maps = DistanceMaps.from_board(self.board)
+            self.blue_final_territory = distance_maps.reachable_positions(ChessBoard.Player_Blue)
+            self.green_final_territory = distance_maps.reachable_positions(ChessBoard.Player_Green)
 
             self.all_games.append(self.history)
 
@@ -703,8 +706,8 @@ class BoardWidget(CardWidget):
         打印游戏结果
         :return:
         """
-        blue_score = len(self.board.is_game_over_()[1])
-        green_score = len(self.board.is_game_over_()[2])
+        blue_score = len(self.blue_final_territory)
+        green_score = len(self.green_final_territory)
 
         title = ""
         content = ""
@@ -1,3 +1,4 @@
 from .robot import Robot, Random, MaxSigmoidTerritory, Quickest, MaxDictTerritory, MaxTerritory, \
     MaxPercentSigmoidTerritory, MaxDiffSigmoidTerritory, MaxTolerantPercentSigmoidTerritory
 from .elo_arena import Arena
+from .rating import BradleyTerry
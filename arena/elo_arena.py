@@ -1,58 +1,207 @@
 import itertools
+import multiprocessing
+import os
 import random
+import time
+from contextlib import nullcontext
 
 from tqdm import tqdm
 
 from alphazero import ChessBoard
+from alphazero.game_records import iter_records, write_records
 from arena import *
+from .rating import BradleyTerry
+
+# 工作进程自己的棋盘和机器人实例，由 `init_worker` 创建
+_board = None
+_players = []
 
 
 class Arena:
     def __init__(self, robots: list[type], param_list: list[dict]):
         """
         :param robots: 机器人的类的列表
-        :param N: 每个机器人的对局次数
+        :param param_list: 每个机器人的构造参数
         """
         self.board = ChessBoard()
+        self.robot_classes = robots
+        self.param_list = param_list
         self.robots = [robot(self.board, **param) for robot, param in zip(robots, param_list)]  # 实例化
+        self.ratings = BradleyTerry([robot.name for robot in self.robots])
         self.all_games = []
 
-    def generate_matches(self, N):
-        all_matches = []
-        for m in itertools.permutations(self.robots, 2):
-            all_matches.append(m)
+    def generate_matches(self, N, seed=None):
+        """
+        生成对局表，每个元素为 (蓝方编号, 绿方编号)
+        :param N: 每个机器人的对局次数
+        :param seed: 打乱顺序的随机种子，相同的种子得到相同的对局表
+        :return: 对局表
+        """
+        all_matches = list(itertools.permutations(range(len(self.robots)), 2))
         all_matches *= N // (len(self.robots) - 1) // 2
-        random.shuffle(all_matches)
+        random.Random(seed).shuffle(all_matches)
 
         return all_matches
 
-    def match(self, N=120, elo=True):
-        for player_blue, player_green in tqdm(self.generate_matches(N), ncols=80, desc="Playing"):
-
-            game = Game(self.board, player_blue, player_green)
+    def match(self, N=120, elo=True, n_workers=1, results_path=None, seed=None, stop_width=None,
+              check_every=None):
+        """
+        进行循环赛，对局分发到多个进程中进行，全部结束后按对局表的顺序更新 elo，结果与进程数和完成顺序无关。
+        每局结果同时加入 `self.ratings`，可以用 Bradley–Terry 模型的 elo 代替逐局更新的 elo
+        :param N: 每个机器人的对局次数
+        :param elo: 是否更新 elo
+        :param n_workers: 进程数，为 1 时在当前进程中对局，为 None 时使用 CPU 核数
+        :param results_path: 结果文件，每局结束后追加一行，已有的对局不再重复进行
+        :param seed: 随机种子，决定对局表和每局中机器人的随机选择，续跑时必须与之前相同
+        :param stop_width: 所有机器人 Bradley–Terry elo 的 95% 置信区间半宽都小于该值时提前结束。
+            只在对局表已经连续下完的前缀上检查，所以提前结束的位置与进程数和完成顺序无关
+        :param check_every: 前缀每增加多少局检查一次置信区间，默认为机器人数的平方
+        :return: 按对局表顺序排列的每局棋谱，提前结束时只包含对局表的前缀
+        """
+        if results_path is not None and seed is None:
+            raise ValueError('续跑结果文件需要固定 seed')
+
+        matches = self.generate_matches(N, seed)
+        results = self.load_results(results_path, matches) if results_path else {}
+        check_every = check_every or len(self.robots) ** 2
+        n_prefix, is_stopped = self.__extend_prefix(results, 0, stop_width, check_every)
+        tasks = [] if is_stopped else [(i, blue, green, None if seed is None else seed * len(matches) + i)
+                                       for i, (blue, green) in enumerate(matches) if i not in results]
+
+        n_workers = n_workers or multiprocessing.cpu_count()
+        initargs = (self.robot_classes, self.param_list)
+        t = time.time()
+        if n_workers == 1:
+            init_worker(*initargs)
+            pool = nullcontext()
+        else:
+            pool = multiprocessing.get_context('spawn').Pool(n_workers, init_worker, initargs)
+
+        # 退出时终止进程池，对局出错或提前结束时都不会留下工作进程
+        with pool, tqdm(total=len(matches), initial=len(results), ncols=80, desc="Playing") as p_bar:
+            records = map(play_match, tasks) if n_workers == 1 else pool.imap_unordered(play_match, tasks)
+            n_played = 0
+            for record in records:
+                results[record['Index']] = record
+                if results_path:
+                    write_records(results_path, [record])
+                p_bar.update()
+                n_played += 1
+
+                n_prefix, is_stopped = self.__extend_prefix(results, n_prefix, stop_width, check_every)
+                if is_stopped:
+                    break
+
+        if n_played:
+            print(f"{n_played} games in {time.time() - t:.1f} s, {n_played / (time.time() - t):.2f} games/s")
+
+        # 提前结束时前缀之后已经下完的对局留在结果文件中，续跑时可以直接使用
+        if is_stopped:
+            results = {i: results[i] for i in range(n_prefix)}
+
+        for i in sorted(results):
+            record = results[i]
+            self.all_games.append(record['Moves'])
+            if elo:
+                self.update_elo(record)
 
-            blue_score, green_score, game_moves = game.run()
+        return self.all_games
 
-            self.all_games.append(game_moves)
+    def __extend_prefix(self, results: dict, start: int, stop_width, check_every: int):
+        """
+        把对局表中从 `start` 开始连续下完的对局按顺序加入评分，前缀长度每到 `check_every` 的倍数时检查是否收敛
+        :param results: 已经下完的对局，键为对局编号
+        :param start: 已经加入评分的前缀长度
+        :param stop_width: 置信区间半宽的阈值，为 None 时不检查
+        :param check_every: 检查间隔
+        :return: （新的前缀长度， 是否收敛）
+        """
+        while start in results:
+            self.add_rating(results[start])
+            start += 1
+            if stop_width and start % check_every == 0 and self.ratings.is_converged(stop_width):
+                return start, True
+        return start, False
+
+    def update_elo(self, record: dict):
+        """
+        根据一局的结果更新双方的 elo
+        :param record: `play_match` 返回的对局结果
+        """
+        player_blue = self.robots[record['Blue']]
+        player_green = self.robots[record['Green']]
+        blue_score, green_score = record['Blue Score'], record['Green Score']
 
-            if elo:
+        blue_elo = player_blue.elo
+        green_elo = player_green.elo
 
-                blue_elo = player_blue.elo
-                green_elo = player_green.elo
+        if blue_score > green_score:
+            player_blue.update_elo(1, green_elo)
+            player_green.update_elo(0, blue_elo)
 
-                if blue_score > green_score:
-                    player_blue.update_elo(1, green_elo)
-                    player_green.update_elo(0, blue_elo)
+        elif blue_score < green_score:
+            player_blue.update_elo(0, green_elo)
+            player_green.update_elo(1, blue_elo)
 
-                elif blue_score < green_score:
-                    player_blue.update_elo(0, green_elo)
-                    player_green.update_elo(1, blue_elo)
+        else:
+            player_blue.update_elo(0.5, green_elo)
+            player_green.update_elo(0.5, blue_elo)
 
-                else:
-                    player_blue.update_elo(0.5, green_elo)
-                    player_green.update_elo(0.5, blue_elo)
+    def add_rating(self, record: dict):
+        """
+        把一局的结果加入 Bradley–Terry 评分
+        :param record: `play_match` 返回的对局结果
+        """
+        blue_score, green_score = record['Blue Score'], record['Green Score']
+        score = 1 if blue_score > green_score else 0 if blue_score < green_score else 0.5
+        self.ratings.add_game(record['Blue'], record['Green'], score)
 
-        return self.all_games
+    @staticmethod
+    def load_results(results_path: str, matches: list) -> dict:
+        """
+        读取已经完成的对局，检查与对局表是否一致
+        :param results_path: 结果文件
+        :param matches: 对局表
+        :return: 对局编号 -> 对局结果
+        """
+        results = {}
+        if not os.path.exists(results_path):
+            return results
+
+        for record in iter_records(results_path):
+            i = record['Index']
+            if i >= len(matches) or tuple(matches[i]) != (record['Blue'], record['Green']):
+                raise ValueError(f'{results_path} 中第 {i} 局与对局表不一致，请检查 N 和 seed')
+            results[i] = record
+
+        return results
+
+
+def init_worker(robots: list[type], param_list: list[dict]):
+    """
+    在工作进程中创建棋盘和所有机器人，机器人持有的是这个进程自己的棋盘
+    :param robots: 机器人的类的列表
+    :param param_list: 每个机器人的构造参数
+    """
+    global _board, _players
+    _board = ChessBoard()
+    _players = [robot(_board, **param) for robot, param in zip(robots, param_list)]
+
+
+def play_match(task: tuple) -> dict:
+    """
+    在工作进程中下一局
+    :param task: (对局编号, 蓝方编号, 绿方编号, 随机种子)
+    :return: 对局结果，`Moves` 字段为棋谱
+    """
+    i, blue, green, seed = task
+    if seed is not None:
+        random.seed(seed)
+
+    _board.clear_board()
+    blue_score, green_score, game_moves = Game(_board, _players[blue], _players[green]).run()
+    return {'Index': i, 'Blue': blue, 'Green': green, 'Blue Score': blue_score, 'Green Score': green_score,
+            'Moves': game_moves}
 
 
 class Game:
@@ -67,17 +216,19 @@ class Game:
             blue_action = self.blue.play()
             self.all_moves.append(blue_action)
             self.board.do_action(blue_action)
-            if self.board.is_game_over_()[0]:
-                blue_score = len(self.board.is_game_over_()[1])
-                green_score = len(self.board.is_game_over_()[2])
+            is_over, blue_territory, green_territory = self.board.is_game_over_()
+            if is_over:
+                blue_score = len(blue_territory)
+                green_score = len(green_territory)
                 self.board.clear_board()
                 return blue_score, green_score, self.all_moves
 
             green_action = self.green.play()
             self.all_moves.append(green_action)
             self.board.do_action(green_action)
-            if self.board.is_game_over_()[0]:
-                blue_score = len(self.board.is_game_over_()[1])
-                green_score = len(self.board.is_game_over_()[2])
+            is_over, blue_territory, green_territory = self.board.is_game_over_()
+            if is_over:
+                blue_score = len(blue_territory)
+                green_score = len(green_territory)
                 self.board.clear_board()
                 return blue_score, green_score, self.all_moves
@@ -0,0 +1,118 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+# 自然对数尺度的实力差与 elo 差之间的比例
+ELO_SCALE = 400 / math.log(10)
+
+
+class BradleyTerry:
+    def __init__(self, names: list, prior_games=1.0, base_elo=1000):
+        """
+        Bradley–Terry 模型的极大似然 elo，对全部对局结果一次求解，与对局顺序无关
+        :param names: 机器人的名字
+        :param prior_games: 每个机器人与一个虚拟对手的虚拟和棋数，避免全胜或全负的机器人 elo 发散，必须大于 0
+        :param base_elo: 所有机器人 elo 的平均值
+        """
+        if prior_games <= 0:
+            raise ValueError('prior_games 必须大于 0')
+
+        n = len(names)
+        self.names = list(names)
+        self.prior_games = prior_games
+        self.base_elo = base_elo
+        self.scores = np.zeros((n, n))  # scores[i, j] 为 i 对 j 的总得分，和棋双方各记 0.5
+        self.theta = np.zeros(n)  # 自然对数尺度的实力
+        self.covariance = (np.eye(n) - 1 / n) * 4 / prior_games
+        self.__is_dirty = False
+
+    def __len__(self):
+        return int(self.scores.sum())
+
+    @property
+    def games(self) -> np.ndarray:
+        """ games[i, j] 为 i 与 j 之间的对局数 """
+        return self.scores + self.scores.T
+
+    def add_game(self, i: int, j: int, score: float):
+        """
+        加入一局结果
+        :param i: 一方的编号
+        :param j: 另一方的编号
+        :param score: i 的得分，1 代表胜利，0.5 代表平局，0 代表失败
+        """
+        self.scores[i, j] += score
+        self.scores[j, i] += 1 - score
+        self.__is_dirty = True
+
+    def add_games(self, i, j, score):
+        """ 批量加入对局结果，参数同 `add_game`，为等长的数组 """
+        score = np.asarray(score, dtype=float)
+        np.add.at(self.scores, (i, j), score)
+        np.add.at(self.scores, (j, i), 1 - score)
+        self.__is_dirty = True
+
+    def fit(self, max_iters=100, tol=1e-9) -> np.ndarray:
+        """
+        用牛顿法求极大似然的实力，从上一次的解开始迭代，新加入少量对局时只需要迭代几次
+        :param max_iters: 最大迭代次数
+        :param tol: 实力变化小于该值时停止
+        :return: 每个机器人的 elo
+        """
+        if not self.__is_dirty:
+            return self.elo
+
+        scores = self.scores
+        games = self.games
+        prior = self.prior_games
+        theta = self.theta.copy()
+        for _ in range(max_iters):
+            p = 1 / (1 + np.exp(theta[None, :] - theta[:, None]))  # p[i, j] 为 i 胜 j 的概率
+            p_prior = 1 / (1 + np.exp(-theta))  # 对虚拟对手的胜率
+            gradient = (scores - games * p).sum(axis=1) + prior * (0.5 - p_prior)
+
+            curvature = games * p * (1 - p)
+            hessian = curvature - np.diag(curvature.sum(axis=1) + prior * p_prior * (1 - p_prior))
+            step = np.linalg.solve(hessian, gradient)
+            theta -= step
+            if np.abs(step).max() < tol:
+                break
+
+        # 只有相对实力有意义，把实力和协方差都变换到以平均值为零点
+        n = len(theta)
+        center = np.eye(n) - 1 / n
+        self.theta = theta - theta.mean()
+        self.covariance = center @ np.linalg.inv(-hessian) @ center
+        self.__is_dirty = False
+        return self.elo
+
+    @property
+    def elo(self) -> np.ndarray:
+        """ 上一次 `fit` 得到的 elo """
+        return self.base_elo + ELO_SCALE * self.theta
+
+    def intervals(self, confidence=0.95) -> tuple[np.ndarray, np.ndarray]:
+        """
+        elo 相对于平均值的置信区间，由对数似然在极值点的曲率近似得到
+        :param confidence: 置信水平
+        :return: (下界, 上界)
+        """
+        elo = self.fit()
+        half_width = self.half_widths(confidence)
+        return elo - half_width, elo + half_width
+
+    def half_widths(self, confidence=0.95) -> np.ndarray:
+        """ 每个机器人 elo 置信区间的半宽 """
+        self.fit()
+        z = NormalDist().inv_cdf((1 + confidence) / 2)
+        return z * ELO_SCALE * np.sqrt(np.diag(self.covariance))
+
+    def is_converged(self, half_width: float, confidence=0.95) -> bool:
+        """ 所有机器人 elo 置信区间的半宽是否都小于 `half_width` """
+        return bool(np.all(self.half_widths(confidence) < half_width))
+
+    def expected_score(self, i: int, j: int) -> float:
+        """ i 对 j 的期望得分 """
+        self.fit()
+        return float(1 / (1 + math.exp(self.theta[j] - self.theta[i])))
@@ -31,7 +31,7 @@ if __name__ == "__main__":
     p = [{'K': 2, 'B': 2, 'error': 0.0}, {}]
 
     arena = Arena(robots=r, param_list=p)
-    history = arena.match(N=25000, elo=False)
+    history = arena.match(N=25000, elo=False, n_workers=None)
 
     os.makedirs('../log/arena', exist_ok=True)
 
@@ -43,6 +43,11 @@ if __name__ == "__main__":
     print("NAME                   ELO           WIN-DRAW-LOSE")
     print("=" * 60)
 
+    lower, upper = arena.ratings.intervals()
+    for name, elo, low, high in zip(arena.ratings.names, arena.ratings.elo, lower, upper):
+        print(f"{name:<20}{elo:>7.1f}  [{low:.1f}, {high:.1f}]")
+    print("-" * 60)
+
     plt.figure(figsize=(12, 8))
 
     for robot in arena.robots:
@@ -1,7 +1,9 @@
-import math
 import random
 
+import numpy as np
+
 from alphazero import ChessBoard
+from alphazero.distance import evaluate_actions, relative_territory
 
 
 class Robot:
@@ -67,60 +69,51 @@ class MaxTerritory(Robot):
 
     def terr_function(self, my_distance, enemy_distance):
         """
-        距离 -> 领地计算函数
+        距离 -> 领地计算函数，对数组逐元素计算
         :param my_distance: 我方到某一格的距离
         :param enemy_distance: 敌方到某一格的距离
         :return: 领地函数值，0~1，1代表完全为自己领地
         """
+        value = np.where(my_distance < enemy_distance, 1.0, np.where(my_distance > enemy_distance, 0.0, 0.5))
+        return self.reachable_terr(my_distance, enemy_distance, value)
 
-        if my_distance == -1:
-            return 0
-
-        if enemy_distance == -1:
-            return 1
-
-        return 1 if my_distance < enemy_distance else 0 if my_distance > enemy_distance else 0.5
+    @staticmethod
+    def reachable_terr(my_distance, enemy_distance, value):
+        """
+        双方都能到达的格子取 `value`，只有我方能到达的为 1，我方不能到达的为 0
+        :param my_distance: 我方到每一格的距离
+        :param enemy_distance: 敌方到每一格的距离
+        :param value: 双方都能到达时的领地函数值
+        :return: 领地函数值
+        """
+        return np.where(my_distance == -1, 0.0, np.where(enemy_distance == -1, 1.0, value))
 
     def get_action_scores(self):
-        active_player_pos_index = 0 if self.board.state[12, 0, 0] == 0 else 3
-        inactive_player_pos_index = 3 - active_player_pos_index
+        """
+        所有可用动作的得分，一步杀为 1，一步死为 -1，一步平为 0，其余为领地函数的平均值
+        :return: 得分列表，与 `self.board.available_actions` 一一对应
+        """
+        result = evaluate_actions(self.board)
+        scores = self.territory_scores(result.mine, result.theirs)
+        return np.where(result.is_over, result.outcome, scores).tolist()
 
-        all_scores = []
+    def territory_scores(self, my_distance: np.ndarray, enemy_distance: np.ndarray) -> np.ndarray:
+        """
+        由双方的距离计算每个动作的领地得分
+        :param my_distance: 走子方到每一格的距离，shape (n_actions, n_cells)
+        :param enemy_distance: 对方到每一格的距离，shape (n_actions, n_cells)
+        :return: 得分，shape (n_actions, )
+        """
+        return self.terr_function(my_distance, enemy_distance).sum(axis=1) / self.board.board_len ** 2
 
-        for action in self.board.available_actions:
-            board = self.board.copy()
-            board.do_action(action, update_available_actions=False)
-            score = 0
-
-            if board.is_game_over()[0]:
-                if board.is_game_over()[1] == self.board.state[12, 0, 0]:
-                    # 一步杀
-                    score = 1
-                elif board.is_game_over()[1] == 1 - self.board.state[12, 0, 0]:
-                    # 一步死
-                    score = -1
-                else:
-                    # 一步平
-                    score = 0
-
-            else:
-                active_player_distance = self.board.distance(board.state[active_player_pos_index],
-                                                             board.state[inactive_player_pos_index],
-                                                             board.state[6],
-                                                             board.state[9])
-                inactive_player_distance = self.board.distance(board.state[inactive_player_pos_index],
-                                                               board.state[active_player_pos_index],
-                                                               board.state[6],
-                                                               board.state[9])
-
-                for i in range(self.board.board_len):
-                    for j in range(self.board.board_len):
-                        score += self.terr_function(active_player_distance[i, j],
-                                                    inactive_player_distance[i, j]) / self.board.board_len ** 2
-
-            all_scores.append(score)
-
-        return all_scores
+    def relative_territory(self, my_distance: np.ndarray, enemy_distance: np.ndarray):
+        """
+        双方的领地和双方都不能到达的格子之外的格子数
+        :param my_distance: 走子方到每一格的距离，shape (n_actions, n_cells)
+        :param enemy_distance: 对方到每一格的距离，shape (n_actions, n_cells)
+        :return: （走子方领地， 对方领地， 格子数），shape 均为 (n_actions, )
+        """
+        return relative_territory(my_distance, enemy_distance, self.terr_function)
 
     def play(self):
         if random.random() < self.error:
@@ -144,18 +137,13 @@ class MaxSigmoidTerritory(MaxTerritory):
 
     def terr_function(self, my_distance, enemy_distance):
         """
-        距离 -> 领地计算函数
+        距离 -> 领地计算函数，对数组逐元素计算
         :param my_distance: 我方到某一格的距离
         :param enemy_distance: 敌方到某一格的距离
         :return: 领地函数值，0~1，1代表完全为自己领地
         """
-        if my_distance == -1:
-            return 0
-
-        if enemy_distance == -1:
-            return 1
-
-        return 1 / (1 + math.e ** (self.K * (my_distance - enemy_distance) + self.B))
+        diff = np.asarray(my_distance, dtype=float) - enemy_distance
+        return self.reachable_terr(my_distance, enemy_distance, 1 / (1 + np.exp(self.K * diff + self.B)))
 
 
 class MaxDictTerritory(MaxTerritory):
@@ -169,20 +157,16 @@ class MaxDictTerritory(MaxTerritory):
 
     def terr_function(self, my_distance, enemy_distance):
         """
-        距离 -> 领地计算函数
+        距离 -> 领地计算函数，对数组逐元素计算
         :param my_distance: 我方到某一格的距离
         :param enemy_distance: 敌方到某一格的距离
         :return: 领地函数值，0~1，1代表完全为自己领地
         """
-        if my_distance == -1:
-            return 0
-
-        if enemy_distance == -1:
-            return 1
-
-        if my_distance - enemy_distance in self.D.keys():
-            return self.D[my_distance - enemy_distance]
-        return 1 if my_distance < enemy_distance else 0 if my_distance > enemy_distance else 0.5
+        diff = np.asarray(my_distance, dtype=int) - enemy_distance
+        value = np.where(diff < 0, 1.0, np.where(diff > 0, 0.0, 0.5))
+        for key, terr in self.D.items():
+            value = np.where(diff == key, terr, value)
+        return self.reachable_terr(my_distance, enemy_distance, value)
 
 
 class MaxPercentSigmoidTerritory(MaxSigmoidTerritory):
@@ -191,67 +175,9 @@ class MaxPercentSigmoidTerritory(MaxSigmoidTerritory):
         if not name:
             self.name = "Max Relative Sigmoid Territory Bot"
 
-    def get_action_scores(self):
-        all_scores = []
-
-        for action in self.board.available_actions:
-            board = self.board.copy()
-            board.do_action(action, update_available_actions=False)
-
-            if board.is_game_over()[0]:
-                if board.is_game_over()[1] == self.board.state[12, 0, 0]:
-                    # 一步杀
-                    score = 1
-                elif board.is_game_over()[1] == 1 - self.board.state[12, 0, 0]:
-                    # 一步死
-                    score = -1
-                else:
-                    # 一步平
-                    score = 0
-
-            else:
-                active_player = 0 if self.board.state[12, 0, 0] == 0 else 3
-
-                active_player_distance = self.board.distance(board.state[active_player],
-                                                             board.state[3 - active_player],
-                                                             board.state[6],
-                                                             board.state[9])
-                inactive_player_distance = self.board.distance(board.state[3 - active_player],
-                                                               board.state[active_player],
-                                                               board.state[6],
-                                                               board.state[9])
-                active_player_terr = 0
-                inactive_player_terr = 0
-                all_terr = self.board.board_len ** 2  # 所有格子数
-
-                for i in range(self.board.board_len):
-                    for j in range(self.board.board_len):
-                        if inactive_player_distance[i, j] == -1:
-                            # 对方无法到达的位置
-                            if active_player_distance[i, j] >= 0:
-                                # 自己可以到达
-                                active_player_terr += 1
-                            else:
-                                # 自己也无法到达，所有格子数减一
-                                all_terr -= 1
-                        else:
-                            # 对方可以到达的位置
-                            if active_player_distance[i, j] >= 0:
-                                # 自己可以到达
-                                active_player_terr += self.terr_function(
-                                    active_player_distance[i, j], inactive_player_distance[i, j])
-
-                                inactive_player_terr += self.terr_function(
-                                    inactive_player_distance[i, j], active_player_distance[i, j])
-
-                            else:
-                                inactive_player_terr += 1
-
-                score = active_player_terr / all_terr
-                # score = (active_player_terr - inactive_player_terr) / all_terr
-
-            all_scores.append(score)
-        return all_scores
+    def territory_scores(self, my_distance: np.ndarray, enemy_distance: np.ndarray) -> np.ndarray:
+        active_player_terr, inactive_player_terr, all_terr = self.relative_territory(my_distance, enemy_distance)
+        return active_player_terr / all_terr
 
 
 class MaxDiffSigmoidTerritory(MaxSigmoidTerritory):
@@ -260,67 +186,9 @@ class MaxDiffSigmoidTerritory(MaxSigmoidTerritory):
         if not name:
             self.name = "Max Relative Sigmoid Territory Bot"
 
-    def get_action_scores(self):
-        all_scores = []
-
-        for action in self.board.available_actions:
-            board = self.board.copy()
-            board.do_action(action, update_available_actions=False)
-
-            if board.is_game_over()[0]:
-                if board.is_game_over()[1] == self.board.state[12, 0, 0]:
-                    # 一步杀
-                    score = 1
-                elif board.is_game_over()[1] == 1 - self.board.state[12, 0, 0]:
-                    # 一步死
-                    score = -1
-                else:
-                    # 一步平
-                    score = 0
-
-            else:
-                active_player = 0 if self.board.state[12, 0, 0] == 0 else 3
-
-                active_player_distance = self.board.distance(board.state[active_player],
-                                                             board.state[3 - active_player],
-                                                             board.state[6],
-                                                             board.state[9])
-                inactive_player_distance = self.board.distance(board.state[3 - active_player],
-                                                               board.state[active_player],
-                                                               board.state[6],
-                                                               board.state[9])
-                active_player_terr = 0
-                inactive_player_terr = 0
-                all_terr = self.board.board_len ** 2  # 所有格子数
-
-                for i in range(self.board.board_len):
-                    for j in range(self.board.board_len):
-                        if inactive_player_distance[i, j] == -1:
-                            # 对方无法到达的位置
-                            if active_player_distance[i, j] >= 0:
-                                # 自己可以到达
-                                active_player_terr += 1
-                            else:
-                                # 自己也无法到达，所有格子数减一
-                                all_terr -= 1
-                        else:
-                            # 对方可以到达的位置
-                            if active_player_distance[i, j] >= 0:
-                                # 自己可以到达
-                                active_player_terr += self.terr_function(
-                                    active_player_distance[i, j], inactive_player_distance[i, j])
-
-                                inactive_player_terr += self.terr_function(
-                                    inactive_player_distance[i, j], active_player_distance[i, j])
-
-                            else:
-                                inactive_player_terr += 1
-
-                # score = active_player_terr / all_terr
-                score = (active_player_terr - inactive_player_terr) / all_terr
-
-            all_scores.append(score)
-        return all_scores
+    def territory_scores(self, my_distance: np.ndarray, enemy_distance: np.ndarray) -> np.ndarray:
+        active_player_terr, inactive_player_terr, all_terr = self.relative_territory(my_distance, enemy_distance)
+        return (active_player_terr - inactive_player_terr) / all_terr
 
 
 class MaxTolerantPercentSigmoidTerritory(MaxPercentSigmoidTerritory):
@@ -1,24 +1,16 @@
-import json
+import multiprocessing
+import time
+from contextlib import nullcontext
 
 import numpy as np
-import torch
-from torch import Tensor
 from tqdm import tqdm
 
-from alphazero import ChessBoard
+from alphazero import BitBoard
+from alphazero.game_records import iter_games
+from alphazero.sample_store import SampleStore
 
-flip_dict = {0: 37, 1: 36, 2: 39, 3: 38, 4: 17, 5: 16, 6: 19, 7: 18, 8: 41, 9: 40, 10: 43, 11: 42, 12: 65,
-             13: 64, 14: 67, 15: 66, 16: 5, 17: 4, 18: 7, 19: 6, 20: 21, 21: 20, 22: 23, 23: 22, 24: 45,
-             25: 44, 26: 47, 27: 46, 28: 69, 29: 68, 30: 71, 31: 70, 32: 85, 33: 84, 34: 87, 35: 86, 36: 1,
-             37: 0, 38: 3, 39: 2, 40: 9, 41: 8, 42: 11, 43: 10, 44: 25, 45: 24, 46: 27, 47: 26, 48: 49,
-             49: 48, 50: 51, 51: 50, 52: 73, 53: 72, 54: 75, 55: 74, 56: 89, 57: 88, 58: 91, 59: 90,
-             60: 97, 61: 96, 62: 99, 63: 98, 64: 13, 65: 12, 66: 15, 67: 14, 68: 29, 69: 28, 70: 31,
-             71: 30, 72: 53, 73: 52, 74: 55, 75: 54, 76: 77, 77: 76, 78: 79, 79: 78, 80: 93, 81: 92,
-             82: 95, 83: 94, 84: 33, 85: 32, 86: 35, 87: 34, 88: 57, 89: 56, 90: 59, 91: 58, 92: 81,
-             93: 80, 94: 83, 95: 82, 96: 61, 97: 60, 98: 63, 99: 62}
 
-
-def get_data(data_path, board_len=7):
+def get_data(data_path, board_len=7, n_workers=None, gamma=0.8):
     """ 从历史记录中获取训练数据
 
     Parameters
@@ -29,80 +21,202 @@ def get_data(data_path, board_len=7):
     board_len: int
         棋盘大小
 
+    n_workers: int
+        重放棋局的进程数，默认为 CPU 核数
+
+    gamma: float
+        奖赏的折扣因子
+
     Returns
     -------
-    X: np.ndarray
+    X: np.ndarray of shape (N, 13, board_len, board_len), dtype uint8
         输入数据
 
-    Y: np.ndarray
-        标签数据
+    Y1: np.ndarray of shape (N, 100), dtype float32
+        实际走的动作的独热编码
+
+    Y2: np.ndarray of shape (N, ), dtype float32
+        价值
     """
+    games = list(iter_games(data_path))
+    X, actions, Y2 = extract_positions(games, board_len, n_workers, gamma)
 
-    with open(data_path, 'r', encoding='utf-8') as f:
-        history = json.load(f)
+    Y1 = np.zeros((len(actions), 100), dtype=np.float32)
+    Y1[np.arange(len(actions)), actions] = 1
+    return X, Y1, Y2
 
-    X = []
-    Y1 = []
-    Y2 = []
-    board = ChessBoard(board_len)
 
-    for game in tqdm(history, ncols=80, desc="Generating data"):
-        board.clear_board()
-        players = []
+def extract_positions(games: list, board_len=7, n_workers=None, gamma=0.8):
+    """ 把棋局分片交给多个进程重放，结果写入预先分配的数组
+
+    棋谱来自已经下完的对局，重放时不检查动作合法性，也不生成可用动作
+
+    Parameters
+    ----------
+    games: list
+        棋谱列表
+
+    board_len: int
+        棋盘大小
+
+    n_workers: int
+        进程数，默认为 CPU 核数，为 1 时在当前进程中重放
+
+    gamma: float
+        奖赏的折扣因子
+
+    Returns
+    -------
+    feature_planes: np.ndarray of shape (N, 13, board_len, board_len), dtype uint8
+        每一步的特征平面，按棋局顺序排列
+
+    actions: np.ndarray of shape (N, ), dtype int64
+        每一步实际走的动作
+
+    z: np.ndarray of shape (N, ), dtype float32
+        每一步的价值
+    """
+    n_workers = n_workers or multiprocessing.cpu_count()
+    lengths = np.array([len(game) for game in games], dtype=np.int64)
+    n_positions = int(lengths.sum())
+    feature_planes = np.zeros((n_positions, 13, board_len, board_len), dtype=np.uint8)
+    actions = np.zeros(n_positions, dtype=np.int64)
+    z = np.zeros(n_positions, dtype=np.float32)
+
+    # 每个进程分到多个分片，分片太大时进度条更新不及时，太小时进程间通信开销大
+    shard_size = max(1, min(500, len(games) // (4 * n_workers) or 1))
+    shards = [(games[i:i + shard_size], board_len, gamma) for i in range(0, len(games), shard_size)]
+
+    t = time.time()
+    start = 0
+    # 退出时终止进程池，重放出错时也不会留下工作进程
+    pool = multiprocessing.get_context('spawn').Pool(n_workers) if n_workers > 1 else nullcontext()
+    with pool, tqdm(total=n_positions, ncols=80, desc="Generating data") as p_bar:
+        results = pool.imap(replay_games, shards) if n_workers > 1 else map(replay_games, shards)
+        for cells, walls, players, shard_z, shard_actions in results:
+            end = start + len(shard_z)
+            feature_planes[start:end] = build_feature_planes(cells, walls, players, board_len)
+            actions[start:end] = shard_actions
+            z[start:end] = shard_z
+            p_bar.update(end - start)
+            start = end
+
+    print(f"{n_positions} positions from {len(games)} games, {n_positions / (time.time() - t):.0f} positions/s")
+    return feature_planes, actions, z
+
+
+def replay_games(shard):
+    """ 重放一个分片中的所有棋局，只记录位置和墙的掩码，特征平面由主进程批量生成
+
+    Parameters
+    ----------
+    shard: tuple
+        `(棋谱列表, 棋盘大小, 折扣因子)`
+
+    Returns
+    -------
+    cells: np.ndarray of shape (N, 6)
+        蓝色和绿色 当前、上一个、上上个 位置的格子编号，-1 代表没有
 
-        feature_list = []
-        pi_list = []
+    walls: np.ndarray of shape (N, 6)
+        横向墙和纵向墙 当前、上一个、上上个 的掩码
 
+    players: np.ndarray of shape (N, )
+        该谁走了
+
+    z: np.ndarray of shape (N, )
+        价值
+
+    actions: np.ndarray of shape (N, )
+        实际走的动作
+    """
+    games, board_len, gamma = shard
+    n_positions = sum(len(game) for game in games)
+    cells = np.zeros((n_positions, 6), dtype=np.int16)
+    walls = np.zeros((n_positions, 6), dtype=np.int64)
+    players = np.zeros(n_positions, dtype=np.int8)
+    z = np.zeros(n_positions, dtype=np.float32)
+    actions = np.zeros(n_positions, dtype=np.int64)
+
+    board = BitBoard(board_len)
+    i = 0
+    for game in games:
+        board.clear_board()
+        start = i
         for action in game:
-            players.append(board.state[12, 0, 0])
-            feature_list.append(board.get_feature_planes())
-            pi_list.append(action)
-
-            board.do_action(action)
-
-        _, winner = board.is_game_over()
-        gamma = 0.8
-        if winner is not None:
-            z_list = []
-            # 最后一步价值为1，每向前一步价值乘以gamma
-            for i in range(len(players)):
-                if players[i] == winner:
-                    z_list.append(gamma ** (players[i:].count(winner) - 1))
-                else:
-                    z_list.append(-gamma ** (players[i:].count(1 - winner) - 1))
-        else:
-            z_list = [0 for _ in range(len(players))]
-
-        for i in range(len(feature_list)):
-            X.append(feature_list[i])
-            one_hot_pi = np.zeros((100,))
-            one_hot_pi[pi_list[i]] = 1
-            Y1.append(one_hot_pi)
-            Y2.append(z_list[i])
-
-    return torch.from_numpy(np.array(X)), torch.from_numpy(np.array(Y1)), torch.from_numpy(np.array(Y2))
+            cells[i] = (board.pos[0], *board.pos_history[0], board.pos[1], *board.pos_history[1])
+            walls[i] = (*board.horizontal_walls, *board.vertical_walls)
+            players[i] = board.current_player
+            board.do_action(action, update_available_actions=False, check_legality=False)
+            i += 1
 
+        actions[start:i] = game
+        z[start:i] = discounted_rewards(players[start:i], board.is_game_over()[1], gamma)
 
-if __name__ == '__main__':
-    feature_planes_list, pi_list, z_list = get_data(r'./data/match_history_maxrand_25k.json')
-    data_deque = []
+    return cells, walls, players, z, actions
+
+
+def discounted_rewards(players: np.ndarray, winner, gamma: float) -> np.ndarray:
+    """ 最后一步价值为1，每向前一步价值乘以gamma，输的一方取负，平局为 0 """
+    if winner is None:
+        return np.zeros(len(players))
 
-    for z, pi, feature_planes in tqdm(zip(z_list, pi_list, feature_planes_list), ncols=80, desc="Expanding data"):
-        data_deque.append((feature_planes, Tensor(pi), z))
+    # 从这一步到结束，同一方还要走的步数
+    is_winner = players == winner
+    remaining = np.where(is_winner, np.cumsum(is_winner[::-1])[::-1], np.cumsum(~is_winner[::-1])[::-1])
+    return np.where(is_winner, 1, -1) * gamma ** (remaining - 1)
 
-        # 沿主对角线翻转
-        flip_features = torch.transpose(Tensor(feature_planes.clone().detach()), 1, 2)
-        # 翻转后水平和垂直的墙互换
-        _ = flip_features.clone().detach()
-        flip_features[6:9] = _[9:12]
-        flip_features[9:12] = _[6:9]
 
-        flip_pi = torch.zeros_like(Tensor(pi))
-        for i in range(len(pi)):
-            flip_pi[flip_dict[i]] = pi[i]
+def build_feature_planes(cells: np.ndarray, walls: np.ndarray, players: np.ndarray, board_len: int) -> np.ndarray:
+    """ 由 `replay_games` 记录的位置和墙掩码批量生成特征平面 """
+    n_cells = board_len ** 2
+    feature_planes = np.zeros((len(players), 13, n_cells), dtype=np.uint8)
 
-        data_deque.append((flip_features, flip_pi, z))
+    rows = np.arange(len(players))
+    for plane in range(6):
+        has_cell = cells[:, plane] >= 0
+        feature_planes[rows[has_cell], plane, cells[has_cell, plane]] = 1
 
-    print(len(data_deque))
+    bits = np.arange(n_cells)
+    for plane in range(6):
+        feature_planes[:, 6 + plane] = walls[:, plane, None] >> bits & 1
 
-    torch.save(data_deque, './data/maxrand_data_650k.pth')
+    feature_planes[:, 12] = players[:, None]
+    return feature_planes.reshape(len(players), 13, board_len, board_len)
+
+
+def save_to_store(data_path, store_dir, board_len=7, n_workers=None):
+    """ 把历史记录重放后逐局写入磁盘样本库
+
+    Parameters
+    ----------
+    data_path: str
+        历史记录
+
+    store_dir: str
+        样本库所在文件夹
+
+    board_len: int
+        棋盘大小
+
+    n_workers: int
+        重放棋局的进程数，默认为 CPU 核数
+    """
+    games = [game for game in iter_games(data_path) if game]
+    feature_planes, actions, z = extract_positions(games, board_len, n_workers)
+
+    store = SampleStore(store_dir, board_len)
+    pi = np.zeros((len(actions), 100), dtype=np.float16)
+    pi[np.arange(len(actions)), actions] = 1
+    start = 0
+    for game in tqdm(games, ncols=80, desc="Saving data"):
+        end = start + len(game)
+        store.extend_game(feature_planes[start:end], pi[start:end], z[start:end], game)
+        start = end
+
+    print(f"{len(store)} samples in {store.n_games} games")
+
+
+if __name__ == '__main__':
+    # 只保存原样本，训练时抽样再随机做对称变换
+    save_to_store(r'./data/match_history_maxrand_25k.json', './data/maxrand_store')
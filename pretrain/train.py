@@ -3,11 +3,11 @@ from collections import deque
 import torch
 from torch.optim import Adam
 from torch.optim.lr_scheduler import ExponentialLR
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import Dataset
 from tqdm import tqdm
 
 from alphazero import PolicyValueNet, ChessBoard
-from alphazero.self_play_dataset import SelfPlayDataSet
+from alphazero.sample_store import SampleStore
 from alphazero.train import PolicyValueLoss
 
 
@@ -43,19 +43,20 @@ criterion = PolicyValueLoss()
 lr_scheduler = ExponentialLR(optimizer, gamma=0.998)  # 0.998 ** 1000 = 0.135
 
 # 创建数据集
-dataset = SelfPlayDataSet(torch.load("./data/data_deque.pth"))
+# 样本库由 data_generation.py 生成，抽样时从磁盘读取并随机做对称变换
+dataset = SampleStore("./data/maxrand_store")
 
 policy_value_net.train()
 
-data_loader = DataLoader(dataset, batch_size=100, shuffle=True, drop_last=False)
+n_batches = (len(dataset) + 99) // 100
 
 for epoch in range(100):
     print(f"Epoch {epoch + 1}")
-    p_bar = tqdm(enumerate(data_loader, 0), ncols=80)
-    for i, data in p_bar:
+    p_bar = tqdm(range(n_batches), ncols=80)
+    for i in p_bar:
         p_bar.set_description(f"Batch {i + 1}")
 
-        feature_planes, pi, z = data
+        feature_planes, pi, z = dataset.sample(100)
         feature_planes, pi, z = feature_planes.to(device), pi.to(device), z.to(device)
 
         # 前馈
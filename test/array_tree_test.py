@@ -0,0 +1,104 @@
+import numpy as np
+
+from alphazero.array_tree import ArrayTree
+from alphazero.node import Node
+
+N_ACTIONS = 8
+
+
+def search(root: Node, tree: ArrayTree, n_simulations=300, seed=0):
+    """ 用同一组先验概率和估值分别搜索 `Node` 和 `ArrayTree` """
+    rng = np.random.default_rng(seed)
+    for i in range(n_simulations):
+        node = root
+        tree_node = tree.root
+        path = [tree_node]
+        while not node.is_leaf_node():
+            action, node = node.select()
+            tree_action, tree_node = tree.select(tree_node)
+            assert action == tree_action
+            path.append(tree_node)
+
+        action_probs = list(zip(range(N_ACTIONS), rng.dirichlet(np.ones(N_ACTIONS))))
+        value = rng.uniform(-1, 1)
+        node.expand(action_probs)
+        node.backup(value)
+        tree.expand(tree_node, action_probs)
+        tree.backup(path, value)
+
+
+def assert_same_subtree(node: Node, tree: ArrayTree, tree_node: int):
+    assert node.N == tree.N[tree_node]
+    assert np.isclose(node.W, tree.W[tree_node])
+    actions, visits = tree.children(tree_node)
+    assert list(node.children.keys()) == actions.tolist()
+    assert [child.N for child in node.children.values()] == visits.tolist()
+    for action, child in node.children.items():
+        assert_same_subtree(child, tree, tree.child(tree_node, action))
+
+
+def test_same_search():
+    root, tree = Node(1, c_puct=4), ArrayTree(c_puct=4, capacity=16)
+    search(root, tree)
+    assert_same_subtree(root, tree, tree.root)
+
+
+def test_reroot():
+    root, tree = Node(1, c_puct=4), ArrayTree(c_puct=4, capacity=16)
+    search(root, tree)
+
+    action = max(root.children.items(), key=lambda item: item[1].N)[0]
+    root = root.children[action]
+    root.parent = None
+    tree.reroot(tree.child(tree.root, action))
+
+    assert tree.size == 1 + N_ACTIONS * root.N
+    assert tree.parent[tree.root] == -1
+    assert_same_subtree(root, tree, tree.root)
+
+    # 重新设置根节点后继续搜索
+    search(root, tree, seed=1)
+    assert_same_subtree(root, tree, tree.root)
+
+
+def test_virtual_loss():
+    tree = ArrayTree(c_puct=4)
+    tree.expand(tree.root, [(0, 0.5), (1, 0.5)])
+    tree.backup([tree.root], 0)
+
+    _, child = tree.select(tree.root)
+    tree.add_virtual_loss([tree.root, child], 3)
+    _, other = tree.select(tree.root)
+    assert other != child
+
+    tree.revert_virtual_loss([tree.root, child], 3)
+    assert not tree.n_virtual.any()
+
+
+def test_backup_path():
+    """ 沿记录的路径反向传播，价值每向上一层取反，与 `Node` 的迭代反向传播一致 """
+    root, tree = Node(1), ArrayTree(capacity=4)
+    node, path = root, [tree.root]
+    for depth in range(40):
+        node.expand([(0, 1)])
+        node = node.children[0]
+        tree.expand(path[-1], [(0, 1)])
+        path.append(tree.child(path[-1], 0))
+
+        node.backup(0.5)
+        tree.backup(path, 0.5)
+
+    node = root
+    for tree_node in path:
+        assert node.N == tree.N[tree_node]
+        assert np.isclose(node.W, tree.W[tree_node])
+        node = node.children.get(0)
+
+    assert tree.W[path[-1]] == 0.5 and tree.W[path[-2]] == 0
+
+
+if __name__ == '__main__':
+    test_same_search()
+    test_reroot()
+    test_virtual_loss()
+    test_backup_path()
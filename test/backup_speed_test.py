@@ -0,0 +1,56 @@
+import timeit
+
+from alphazero.array_tree import ArrayTree
+from alphazero.node import Node
+
+DEPTHS = (10, 30, 60)
+N_BACKUPS = 20000
+
+
+class RecursiveNode(Node):
+    """ 原先递归更新父节点、维护滑动平均的反向传播，作为对照 """
+
+    def __init__(self, prior_prob: float, c_puct: float = 5, parent=None):
+        super().__init__(prior_prob, c_puct, parent)
+        self.mean = 0
+
+    def backup(self, value: float):
+        if self.parent:
+            self.parent.backup(-value)
+
+        self.N += 1
+        self.mean = ((self.N - 1) * self.mean + value) / self.N
+
+
+def build_chain(node_class, depth: int):
+    """ 创建一条长度为 `depth` 的路径，返回叶节点 """
+    node = node_class(1)
+    for i in range(depth):
+        node.children[0] = node_class(1, parent=node)
+        node = node.children[0]
+    return node
+
+
+def build_tree_path(depth: int):
+    """ 在 `ArrayTree` 中创建一条长度为 `depth` 的路径，返回路径上的节点 """
+    tree = ArrayTree()
+    path = [tree.root]
+    for i in range(depth):
+        tree.expand(path[-1], [(0, 1)])
+        path.append(tree.child(path[-1], 0))
+    return tree, path
+
+
+if __name__ == '__main__':
+    for depth in DEPTHS:
+        recursive_leaf = build_chain(RecursiveNode, depth)
+        leaf = build_chain(Node, depth)
+        tree, path = build_tree_path(depth)
+
+        times = {
+            'recursive Node': timeit.timeit(lambda: recursive_leaf.backup(0.5), number=N_BACKUPS),
+            'iterative Node': timeit.timeit(lambda: leaf.backup(0.5), number=N_BACKUPS),
+            'ArrayTree path': timeit.timeit(lambda: tree.backup(path, 0.5), number=N_BACKUPS),
+        }
+        for name, total_time in times.items():
+            print(f"depth {depth:>3}  {name:<16}{total_time / N_BACKUPS * 1e6:>8.2f} us/backup")
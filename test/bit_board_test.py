@@ -0,0 +1,146 @@
+import random
+
+import numpy as np
+
+from alphazero import ChessBoard, BitBoard, RolloutMCTS, TerritoryMCTS
+
+N = 300
+
+
+def reference_available_actions(board: ChessBoard):
+    """ 原先逐格 BFS 的走子生成，用来检查预计算表生成的动作及其顺序 """
+    player = int(board.state[12, 0, 0])
+    active_player_pos = board.state[0] if player == 0 else board.state[3]
+    passive_player_pos = board.state[3] if player == 0 else board.state[0]
+    horizontal_wall = board.state[6]
+    vertical_wall = board.state[9]
+    pos = board.player_pos[player]
+
+    available_move = []
+    for next_pos in board.reachable_positions(active_player_pos, passive_player_pos, horizontal_wall, vertical_wall):
+        for wall in range(4):
+            if board.placeable(next_pos, wall, horizontal_wall, vertical_wall):
+                available_move.append(board.pos_to_action[(next_pos[0] - pos[0], next_pos[1] - pos[1])] * 4 + wall)
+    return available_move
+
+
+def reference_is_game_over(board: ChessBoard):
+    """ 原先基于多次 BFS 的终局判断，用来检查洪水填充的结果 """
+    state = board.state
+    if board.reachable_destination(state[0], state[3], state[6], state[9]):
+        return False, -1
+
+    x_territory = board.reachable_positions(state[0], state[3], state[6], state[9],
+                                            ignore_other_player=True, step=board.board_len ** 2)
+    o_territory = board.reachable_positions(state[3], state[0], state[6], state[9],
+                                            ignore_other_player=True, step=board.board_len ** 2)
+    return True, 0 if len(x_territory) > len(o_territory) else 1 if len(x_territory) < len(o_territory) else None
+
+
+def assert_same_board(board: ChessBoard, bit_board: BitBoard):
+    assert np.array_equal(board.state, bit_board.state)
+    assert board.available_actions == reference_available_actions(board)
+    assert board.is_game_over() == reference_is_game_over(board)
+    assert np.array_equal(board.get_feature_planes().numpy(), bit_board.get_feature_planes().numpy())
+    assert board.player_pos == bit_board.player_pos
+    assert board.current_player == bit_board.current_player
+    assert board.get_wall_masks() == bit_board.get_wall_masks()
+    assert board.available_actions == bit_board.available_actions
+    assert board.step_count == bit_board.step_count
+    assert board.is_game_over() == bit_board.is_game_over()
+
+    is_over, blue_territory, green_territory = board.is_game_over_()
+    bit_is_over, bit_blue_territory, bit_green_territory = bit_board.is_game_over_()
+    assert is_over == bit_is_over
+    if is_over:
+        assert sorted(blue_territory) == sorted(bit_blue_territory)
+        assert sorted(green_territory) == sorted(bit_green_territory)
+
+
+def test_random_games():
+    """ 随机对局，逐步比较 `BitBoard` 与 `ChessBoard` """
+    random.seed(0)
+    board = ChessBoard()
+    bit_board = BitBoard()
+
+    for i in range(N):
+        assert_same_board(board, bit_board)
+        while not board.is_game_over()[0]:
+            action = random.choice(board.available_actions)
+            board.do_action(action)
+            bit_board.do_action(action)
+            assert_same_board(board, bit_board)
+
+        board.clear_board()
+        bit_board.clear_board()
+
+
+def test_copy_is_independent():
+    """ 复制后的棋盘与原棋盘互不影响 """
+    random.seed(1)
+    bit_board = BitBoard()
+    for i in range(5):
+        bit_board.do_action(random.choice(bit_board.available_actions))
+
+    state = bit_board.state.copy()
+    board = bit_board.copy()
+    while not board.is_game_over()[0]:
+        board.do_action(random.choice(board.available_actions))
+
+    assert np.array_equal(state, bit_board.state)
+    assert bit_board.step_count == 5
+
+
+def test_illegal_action():
+    bit_board = BitBoard()
+    try:
+        bit_board.do_action(0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('Illegal action accepted')
+
+
+def test_push_pop():
+    """ `push` 若干步后 `pop` 回来，局面与原局面完全相同 """
+    random.seed(2)
+    for board_class in (ChessBoard, BitBoard):
+        for i in range(20):
+            board = board_class()
+            reference = board_class()
+            for j in range(random.randint(0, 8)):
+                action = random.choice(board.available_actions)
+                board.do_action(action)
+                reference.do_action(action)
+
+            n_moves = 0
+            while not board.is_game_over()[0]:
+                board.push(random.choice(board.available_actions))
+                n_moves += 1
+            for j in range(n_moves):
+                board.pop()
+
+            assert np.array_equal(board.state, reference.state)
+            assert board.player_pos == reference.player_pos
+            assert board.available_actions == reference.available_actions
+            assert board.step_count == reference.step_count
+            assert board.is_game_over() == reference.is_game_over()
+            assert board.undo_stack == []
+
+
+def test_search_without_feature_planes():
+    """ 不需要网络的搜索在 `BitBoard` 上不生成特征平面 """
+    for mcts in (TerritoryMCTS(n_iters=50), RolloutMCTS(n_iters=50)):
+        bit_board = BitBoard()
+        bit_board.do_action(bit_board.available_actions[0])
+        assert mcts.get_action(bit_board) in bit_board.available_actions
+        assert bit_board._state is None
+
+
+if __name__ == '__main__':
+    test_random_games()
+    test_push_pop()
+    test_copy_is_independent()
+    test_illegal_action()
+    test_search_without_feature_planes()
+    print("BitBoard matches ChessBoard")
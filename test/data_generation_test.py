@@ -0,0 +1,103 @@
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+from alphazero import ChessBoard
+from pretrain.data_generation import extract_positions
+
+N_GAMES = 2000
+
+
+def random_games(n_games, seed=0):
+    """ 随机走子直到分出胜负的合法棋谱 """
+    rng = random.Random(seed)
+    board = ChessBoard()
+    games = []
+    for _ in range(n_games):
+        board.clear_board()
+        game = []
+        while not board.is_game_over()[0]:
+            action = rng.choice(board.available_actions)
+            board.do_action(action)
+            game.append(action)
+        games.append(game)
+    return games
+
+
+def replay_game(board: ChessBoard, game: list, gamma=0.8):
+    """ 原来逐步检查合法性、复制特征平面的重放方式，作为参考 """
+    board.clear_board()
+    players = []
+    feature_list = []
+    for action in game:
+        players.append(board.state[12, 0, 0])
+        feature_list.append(board.state.copy())
+        board.do_action(action)
+
+    _, winner = board.is_game_over()
+    if winner is None:
+        return np.array(feature_list), [0] * len(players)
+
+    z_list = []
+    for i in range(len(players)):
+        if players[i] == winner:
+            z_list.append(gamma ** (players[i:].count(winner) - 1))
+        else:
+            z_list.append(-gamma ** (players[i:].count(1 - winner) - 1))
+    return np.array(feature_list), z_list
+
+
+def test_extract_positions():
+    """ 单进程和多进程提取的样本都与逐局重放的一致 """
+    games = random_games(40)
+    board = ChessBoard()
+    expected = [replay_game(board, game) for game in games]
+    expected_features = np.concatenate([features for features, _ in expected])
+    expected_z = np.concatenate([z for _, z in expected])
+
+    for n_workers in (1, 2):
+        feature_planes, actions, z = extract_positions(games, n_workers=n_workers)
+        assert feature_planes.dtype == np.uint8
+        assert np.array_equal(feature_planes, expected_features)
+        assert np.array_equal(actions, np.concatenate(games))
+        assert np.allclose(z, expected_z)
+
+
+def test_replay_error():
+    """ 重放出错时异常传回主进程，不留下工作进程 """
+    games = random_games(8) + [[999]]
+    try:
+        extract_positions(games, n_workers=2)
+    except IndexError:
+        pass
+    else:
+        raise AssertionError('非法动作应该引发异常')
+    assert not multiprocessing.active_children()
+
+
+if __name__ == '__main__':
+    test_extract_positions()
+    test_replay_error()
+
+    # 与逐局重放比较提取速度
+    games = random_games(N_GAMES)
+    n_positions = sum(len(game) for game in games)
+
+    t = time.perf_counter()
+    board = ChessBoard()
+    for game in games:
+        replay_game(board, game)
+    t_legacy = time.perf_counter() - t
+
+    t = time.perf_counter()
+    extract_positions(games, n_workers=1)
+    t_single = time.perf_counter() - t
+
+    t = time.perf_counter()
+    extract_positions(games)
+    t_parallel = time.perf_counter() - t
+
+    print(f'{n_positions} positions: legacy {n_positions / t_legacy:.0f}/s, '
+          f'1 process {n_positions / t_single:.0f}/s, all processes {n_positions / t_parallel:.0f}/s')
@@ -0,0 +1,122 @@
+import random
+import time
+
+import numpy as np
+
+from alphazero import ChessBoard
+from alphazero.board_tables import get_board_tables
+from alphazero.distance import DistanceMaps
+
+N_REPEATS = 2000
+
+
+def reference_distance(pos, other_pos, horizontal_wall, vertical_wall, board_len=7):
+    """ 原来 `ChessBoard.distance` 的逐格 BFS，坐标用元组表示 """
+    distance = -np.ones((board_len, board_len))
+    queue = [pos]
+    visited = [pos]
+    step = 0
+    while queue:
+        next_queue = []
+        for r, c in queue:
+            distance[r, c] = step
+            for nr, nc, is_blocked in ((r - 1, c, r > 0 and horizontal_wall[r - 1][c]),
+                                       (r, c - 1, c > 0 and vertical_wall[r][c - 1]),
+                                       (r + 1, c, r < board_len - 1 and horizontal_wall[r][c]),
+                                       (r, c + 1, c < board_len - 1 and vertical_wall[r][c])):
+                if 0 <= nr < board_len and 0 <= nc < board_len and not is_blocked and (nr, nc) not in visited \
+                        and (nr, nc) != other_pos:
+                    visited.append((nr, nc))
+                    next_queue.append((nr, nc))
+        queue = next_queue
+        step += 1
+    return distance
+
+
+def random_boards(n_boards=100, seed=0):
+    """ 随机对局中的局面，包括已经结束的局面 """
+    random.seed(seed)
+    board = ChessBoard()
+    boards = []
+    while len(boards) < n_boards:
+        boards.append(board.copy())
+        if board.is_game_over()[0]:
+            board.clear_board()
+        else:
+            board.do_action(random.choice(board.available_actions))
+    return boards
+
+
+def test_distance_maps():
+    """ 一次算出的双方距离与逐格 BFS 相同，隔开的判断与 `is_game_over` 相同 """
+    for board in random_boards():
+        maps = DistanceMaps.from_board(board)
+        positions = board.get_player_pos()
+        state = board.state
+        for player in range(2):
+            expected = reference_distance(positions[player], positions[1 - player], state[6], state[9])
+            assert np.array_equal(maps.maps()[player], expected)
+            assert np.array_equal(board.distance(state[player * 3], state[3 - player * 3], state[6], state[9]),
+                                  expected)
+
+        is_over, blue_territory, green_territory = board.is_game_over_()
+        assert maps.is_separated() == is_over
+        if is_over:
+            assert maps.reachable_positions(0) == blue_territory
+            assert maps.reachable_positions(1) == green_territory
+
+
+def test_add_wall():
+    """ 逐面加墙时增量更新的结果与从头计算的相同，大部分墙不需要重新计算 """
+    rng = random.Random(1)
+    tables = get_board_tables(7)
+    n_walls = n_recomputes = 0
+    for _ in range(50):
+        pos = tuple(rng.sample(range(49), 2))
+        maps = DistanceMaps(7, pos, 0, 0)
+        for _ in range(30):
+            is_horizontal, bit = tables.wall_effects[rng.randrange(49 * 4)]
+            if not bit:
+                continue
+            cell = bit.bit_length() - 1
+            n_recomputes -= maps.n_recomputes
+            maps.add_wall(is_horizontal, cell)
+            n_recomputes += maps.n_recomputes
+            n_walls += 1
+
+            expected = DistanceMaps(7, pos, maps.horizontal_wall, maps.vertical_wall)
+            assert np.array_equal(maps.distances, expected.distances)
+
+    assert n_recomputes < n_walls / 2
+
+
+if __name__ == '__main__':
+    test_distance_maps()
+    test_add_wall()
+
+    # 中局局面上计算双方距离的耗时
+    board = random_boards(20, seed=2)[15]
+    state = board.state
+    positions = board.get_player_pos()
+
+    t = time.perf_counter()
+    for _ in range(N_REPEATS // 20):
+        reference_distance(positions[0], positions[1], state[6], state[9])
+        reference_distance(positions[1], positions[0], state[6], state[9])
+    t_reference = (time.perf_counter() - t) / (N_REPEATS // 20)
+
+    t = time.perf_counter()
+    for _ in range(N_REPEATS):
+        DistanceMaps.from_board(board)
+    t_maps = (time.perf_counter() - t) / N_REPEATS
+
+    maps = DistanceMaps.from_board(board)
+    tables = get_board_tables(7)
+    walls = [(is_horizontal, bit.bit_length() - 1) for is_horizontal, bit in tables.wall_effects if bit]
+    t = time.perf_counter()
+    for is_horizontal, cell in walls:
+        maps.add_wall(is_horizontal, cell)
+    t_wall = (time.perf_counter() - t) / len(walls)
+
+    print(f'both players: list BFS {t_reference * 1e6:.0f} us, DistanceMaps {t_maps * 1e6:.0f} us, '
+          f'add_wall {t_wall * 1e6:.0f} us ({maps.n_recomputes - 1} recomputes for {len(walls)} walls)')
@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+from alphazero.game_records import iter_games, iter_records, write_records
+from arena import Arena, MaxTerritory, Random
+
+ROBOTS = [Random, Random, MaxTerritory]
+PARAMS = [{'name': 'Random 1'}, {'name': 'Random 2'}, {'error': 0.2}]
+
+
+def test_reproducible():
+    """ 固定 seed 时单进程和多进程的棋谱与 elo 相同 """
+    arena = Arena(ROBOTS, PARAMS)
+    games = arena.match(N=8, seed=1)
+    elos = [robot.elo for robot in arena.robots]
+
+    parallel_arena = Arena(ROBOTS, PARAMS)
+    assert parallel_arena.match(N=8, n_workers=2, seed=1) == games
+    assert [robot.elo for robot in parallel_arena.robots] == elos
+
+
+def test_resume():
+    """ 中断后从结果文件续跑，只补下缺少的对局，结果与一次下完相同 """
+    arena = Arena(ROBOTS, PARAMS)
+    games = arena.match(N=8, seed=2)
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'results.jsonl')
+        Arena(ROBOTS, PARAMS).match(N=8, results_path=path, seed=2)
+
+        # 只保留一部分对局，模拟中断
+        records = list(iter_records(path))
+        write_records(path, records[::2], mode='w')
+
+        resumed_arena = Arena(ROBOTS, PARAMS)
+        assert resumed_arena.match(N=8, results_path=path, seed=2) == games
+        assert [robot.elo for robot in resumed_arena.robots] == [robot.elo for robot in arena.robots]
+        assert len(list(iter_games(path))) == len(games)
+
+
+if __name__ == '__main__':
+    test_reproducible()
+    test_resume()
+
+    # 单进程与多进程的吞吐量
+    robots = [MaxTerritory] * 4
+    params = [{'name': f'Max {i}', 'error': 0.1} for i in range(4)]
+    for n_workers in (1, None):
+        Arena(robots, params).match(N=12, n_workers=n_workers, seed=0)
@@ -0,0 +1,99 @@
+import pickle
+import random
+import time
+
+import numpy as np
+import torch
+
+from alphazero import AlphaZeroMCTS, BitBoard, PolicyValueNet
+
+N_GAMES = 3
+N_ITERS = 200
+
+
+def random_boards(n_boards=20, seed=0):
+    random.seed(seed)
+    board = BitBoard()
+    boards = []
+    for i in range(n_boards):
+        if board.is_game_over()[0]:
+            board.clear_board()
+        boards.append(board.copy())
+        board.do_action(random.choice(board.available_actions))
+    return boards
+
+
+def test_cached_predict_is_unchanged():
+    """ 命中缓存时返回的估值与直接前馈相同 """
+    torch.manual_seed(0)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    boards = random_boards()
+    feature_planes = torch.stack([board.get_feature_planes() for board in boards])
+    actions = [board.available_actions for board in boards]
+    keys = [board.zobrist_hash for board in boards]
+
+    probs, values = policy_value_net.predict_batch(feature_planes, actions)
+    policy_value_net.set_evaluation_cache(100)
+    for i in range(2):
+        cached_probs, cached_values = policy_value_net.predict_batch(feature_planes, actions, keys)
+        for p, cached_p in zip(probs, cached_probs):
+            assert np.allclose(p, cached_p)
+        assert np.allclose(values, cached_values, atol=1e-6)
+
+    cache = policy_value_net.evaluation_cache
+    assert cache.misses == len(boards) and cache.hits == len(boards)
+
+    p, value = policy_value_net.predict(boards[0])
+    assert np.allclose(p, probs[0])
+    assert cache.hits == len(boards) + 1
+
+
+def test_cache_is_invalidated():
+    """ 权重改变后缓存被清空，保存模型时不保存缓存内容 """
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    policy_value_net.set_evaluation_cache(100)
+    boards = random_boards(5)
+    for board in boards:
+        policy_value_net.predict(board)
+    assert len(policy_value_net.evaluation_cache) == len(boards)
+
+    copied = pickle.loads(pickle.dumps(policy_value_net))
+    assert len(copied.evaluation_cache) == 0
+    assert copied.evaluation_cache.capacity == 100
+
+    policy_value_net.load_state_dict(copied.state_dict())
+    assert len(policy_value_net.evaluation_cache) == 0
+
+
+def test_lru_budget():
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    policy_value_net.set_evaluation_cache(3)
+    for board in random_boards(10):
+        policy_value_net.predict(board)
+    assert len(policy_value_net.evaluation_cache) == 3
+
+
+if __name__ == '__main__':
+    # 用同一个模型自我博弈若干局，统计估值缓存的命中率
+    torch.manual_seed(0)
+    torch.set_num_threads(1)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    policy_value_net.set_evaluation_cache(100000)
+    mcts = AlphaZeroMCTS(policy_value_net, n_iters=N_ITERS, is_self_play=True, batch_size=8)
+
+    t = time.time()
+    board = BitBoard()
+    for i in range(N_GAMES):
+        board.clear_board()
+        while not board.is_game_over()[0]:
+            action, _ = mcts.get_action(board)
+            board.do_action(action)
+        mcts.reset_root()
+
+        cache = policy_value_net.evaluation_cache
+        print(f"game {i + 1}: {cache.hits} hits, {cache.misses} misses, hit rate {cache.hit_rate:.1%}, "
+              f"{len(cache)} entries, {time.time() - t:.1f} s")
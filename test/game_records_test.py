@@ -0,0 +1,99 @@
+import json
+import os
+import random
+import tempfile
+import time
+
+from alphazero.game_records import iter_games, iter_records, load_game, write_records
+
+N_GAMES = 20000
+
+
+def random_games(n_games, seed=0):
+    """ 随机动作列表，只用于测试读写 """
+    rng = random.Random(seed)
+    return [[rng.randrange(100) for _ in range(rng.randrange(1, 60))] for _ in range(n_games)]
+
+
+def test_formats():
+    """ 旧的 JSON 数组、JSON Lines、.abc 文件和文件夹读出的棋谱相同 """
+    games = random_games(50)
+    with tempfile.TemporaryDirectory() as root:
+        array_path = os.path.join(root, 'games.json')
+        with open(array_path, 'w', encoding='utf-8') as f:
+            json.dump(games, f, indent=1)
+
+        lines_path = os.path.join(root, 'games.jsonl')
+        write_records(lines_path, games)
+
+        dict_lines_path = os.path.join(root, 'dicts.jsonl')
+        write_records(dict_lines_path, [{'Moves': game, 'Result': 'Draw'} for game in games])
+
+        abc_dir = os.path.join(root, 'abc')
+        os.makedirs(abc_dir)
+        for i, game in enumerate(games):
+            with open(os.path.join(abc_dir, f'game_{i:03d}.abc'), 'w', encoding='utf-8') as f:
+                json.dump({'Time': '', 'Moves': game, 'Move Count': len(game), 'Result': 'Draw'}, f)
+
+        for path in (array_path, lines_path, dict_lines_path, abc_dir):
+            assert list(iter_games(path)) == games
+
+        assert load_game(array_path, 17) == games[17]
+
+
+def test_small_chunks():
+    """ 缓冲区比单条记录还小时也能正确解析，空数组没有记录 """
+    games = random_games(30)
+    losses = [[i, random.random()] for i in range(30)]
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'games.json')
+        for records in (games, losses, []):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(records, f)
+            for chunk_size in (1, 7, 64):
+                assert list(iter_records(path, chunk_size)) == records
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(games[0]) + '\n\n' + json.dumps(games[1]))
+        for chunk_size in (1, 5, 1 << 16):
+            assert list(iter_records(path, chunk_size)) == games[:2]
+
+
+def test_empty_first_game():
+    """ 第一局为空的 JSON Lines 不会被当成空数组，分行写的标量数组每个元素一条记录 """
+    games = [[], [1, 2], [3]]
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'games.jsonl')
+        write_records(path, games)
+        for chunk_size in (1, 2, 1 << 16):
+            assert list(iter_records(path, chunk_size)) == games
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([12, 345, 6789], f, indent=1)
+        for chunk_size in (1, 3, 1 << 16):
+            assert list(iter_records(path, chunk_size)) == [12, 345, 6789]
+
+
+if __name__ == '__main__':
+    test_formats()
+    test_small_chunks()
+    test_empty_first_game()
+
+    # 与一次性 json.load 比较读取速度
+    games = random_games(N_GAMES)
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'games.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(games, f)
+
+        t = time.perf_counter()
+        with open(path, encoding='utf-8') as f:
+            n = len(json.load(f))
+        t_load = time.perf_counter() - t
+
+        t = time.perf_counter()
+        n_streamed = sum(1 for _ in iter_games(path))
+        t_stream = time.perf_counter() - t
+
+    assert n == n_streamed
+    print(f'{n} games: json.load {t_load * 1e3:.0f} ms, streaming {t_stream * 1e3:.0f} ms')
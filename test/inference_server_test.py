@@ -0,0 +1,105 @@
+import multiprocessing
+import random
+import time
+
+import numpy as np
+import torch
+
+from alphazero import AlphaZeroMCTS, BitBoard, PolicyValueNet
+from alphazero.inference_server import InferenceServer
+
+N_WORKERS = 4
+N_ITERS = 200
+N_MOVES = 4
+
+
+def random_boards(n_boards=20, seed=0):
+    random.seed(seed)
+    board = BitBoard()
+    boards = []
+    for i in range(n_boards):
+        if board.is_game_over()[0]:
+            board.clear_board()
+        boards.append(board.copy())
+        board.do_action(random.choice(board.available_actions))
+    return boards
+
+
+def test_server_matches_net():
+    """ 通过推理服务器得到的估值与直接前馈相同，权重更新后也相同 """
+    torch.manual_seed(0)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    server = InferenceServer(policy_value_net, n_workers=2, max_leaves=8, evaluation_cache_size=100)
+    server.start()
+
+    boards = random_boards()
+    feature_planes = torch.stack([board.get_feature_planes() for board in boards])
+    actions = [board.available_actions for board in boards]
+    keys = [board.zobrist_hash for board in boards]
+    try:
+        for i in range(2):
+            probs, values = policy_value_net.predict_batch(feature_planes, actions)
+            client = server.get_client(i)
+            server_probs, server_values = client.predict_batch(feature_planes, actions, keys)
+            for p, server_p in zip(probs, server_probs):
+                assert np.allclose(p, server_p, atol=1e-6)
+            assert np.allclose(values, server_values, atol=1e-6)
+
+            p, value = client.predict(boards[3])
+            assert np.allclose(p, probs[3], atol=1e-6)
+
+            # 换一组权重
+            torch.manual_seed(1)
+            policy_value_net.load_state_dict(PolicyValueNet(is_use_gpu=False).state_dict())
+            server.load_state_dict(policy_value_net.state_dict())
+    finally:
+        server.stop()
+
+    assert server.mean_batch_size > 0
+
+
+def self_play_moves(client, seed):
+    """ 子进程中用客户端（或者自己的网络）进行若干步自我博弈 """
+    torch.set_num_threads(1)
+    torch.manual_seed(seed)
+    if client is None:
+        client = PolicyValueNet(is_use_gpu=False)
+        client.eval()
+
+    mcts = AlphaZeroMCTS(client, n_iters=N_ITERS, is_self_play=True)
+    board = BitBoard()
+    for i in range(N_MOVES):
+        action, _ = mcts.get_action(board)
+        board.do_action(action)
+
+
+if __name__ == '__main__':
+    test_server_matches_net()
+
+    # 比较各进程各自持有网络和使用推理服务器两种方式的模拟速度
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    ctx = multiprocessing.get_context('spawn')
+    for use_server in (False, True):
+        server = None
+        clients = [None] * N_WORKERS
+        if use_server:
+            server = InferenceServer(policy_value_net, N_WORKERS, max_batch_size=N_WORKERS, max_wait=1e-3)
+            server.start()
+            clients = [server.get_client(i) for i in range(N_WORKERS)]
+
+        processes = [ctx.Process(target=self_play_moves, args=(clients[i], i)) for i in range(N_WORKERS)]
+        t = time.time()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.time() - t
+
+        print(f"{'inference server' if use_server else 'one net per worker':<20}"
+              f"{N_WORKERS * N_MOVES * N_ITERS / elapsed:8.1f} simulations/s", end='')
+        if server is not None:
+            print(f", mean batch size {server.mean_batch_size:.1f}", end='')
+            server.stop()
+        print()
@@ -0,0 +1,28 @@
+import time
+
+import torch
+
+from alphazero import AlphaZeroMCTS, ChessBoard, PolicyValueNet
+
+N_ITERS = 800
+
+
+def simulations_per_second(policy_value_net, batch_size, n_moves=3):
+    """ 从初始局面开始走若干步，统计每秒模拟次数 """
+    board = ChessBoard()
+    mcts = AlphaZeroMCTS(policy_value_net, n_iters=N_ITERS, batch_size=batch_size)
+
+    t = time.time()
+    for i in range(n_moves):
+        board.do_action(mcts.get_action(board))
+    return n_moves * N_ITERS / (time.time() - t)
+
+
+if __name__ == '__main__':
+    torch.manual_seed(0)
+    torch.set_num_threads(1)
+    policy_value_net = PolicyValueNet(is_use_gpu=torch.cuda.is_available())
+    policy_value_net.eval()
+
+    for batch_size in (1, 8, 32):
+        print(f"batch size {batch_size:<3} {simulations_per_second(policy_value_net, batch_size):8.1f} simulations/s")
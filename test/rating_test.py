@@ -0,0 +1,112 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from arena import Arena, BradleyTerry, Random
+from arena.rating import ELO_SCALE
+
+
+def simulate(elo, n_games, seed=0):
+    """ 按 Bradley–Terry 模型随机生成对局结果，没有和棋 """
+    rng = np.random.default_rng(seed)
+    i = rng.integers(len(elo), size=n_games)
+    j = (i + rng.integers(1, len(elo), size=n_games)) % len(elo)
+    p = 1 / (1 + np.exp((elo[j] - elo[i]) / ELO_SCALE))
+    return i, j, (rng.random(n_games) < p).astype(float)
+
+
+def test_recover_ratings():
+    """ 大量对局时解出的 elo 差接近真实值，置信区间变窄 """
+    elo = np.array([1000, 1100, 1200, 1400, 900])
+    ratings = BradleyTerry(list('abcde'))
+    ratings.add_games(*simulate(elo, 20000))
+
+    fitted = ratings.fit()
+    assert np.abs((fitted - fitted.mean()) - (elo - elo.mean())).max() < 15
+    assert np.all(ratings.half_widths() < 15)
+
+
+def test_order_and_increment():
+    """ 结果与对局顺序无关，逐局加入后增量求解与一次求解相同 """
+    elo = np.array([1000, 1300, 800])
+    i, j, score = simulate(elo, 300, seed=1)
+
+    batch = BradleyTerry(list('abc'))
+    batch.add_games(i, j, score)
+
+    shuffled = BradleyTerry(list('abc'))
+    order = np.random.default_rng(2).permutation(len(i))
+    shuffled.add_games(i[order], j[order], score[order])
+
+    incremental = BradleyTerry(list('abc'))
+    for k in range(len(i)):
+        incremental.add_game(i[k], j[k], score[k])
+        if k % 50 == 0:
+            incremental.fit()
+
+    assert np.allclose(batch.fit(), shuffled.fit())
+    assert np.allclose(batch.fit(), incremental.fit())
+    assert np.allclose(batch.covariance, incremental.covariance)
+
+
+def test_unbeaten():
+    """ 全胜的一方 elo 有限，置信区间很宽 """
+    ratings = BradleyTerry(['a', 'b'])
+    for _ in range(5):
+        ratings.add_game(0, 1, 1)
+    elo = ratings.fit()
+    assert np.all(np.isfinite(elo)) and elo[0] > elo[1]
+    assert ratings.half_widths()[0] > 200
+    assert 0.5 < ratings.expected_score(0, 1) < 1
+
+
+def test_arena_early_stop():
+    """ 置信区间足够窄时提前结束循环赛，结果与进程数无关且可以续跑 """
+    arena = Arena([Random, Random], [{}, {}])
+    games = arena.match(N=1000, seed=0, stop_width=150, check_every=10)
+    assert 0 < len(games) < 1000
+    assert len(arena.ratings) == len(games)
+    assert arena.ratings.is_converged(150)
+
+    # 提前结束的位置只由对局表前缀决定，与进程数无关，续跑时直接得到同样的前缀
+    parallel_arena = Arena([Random, Random], [{}, {}])
+    assert parallel_arena.match(N=1000, n_workers=2, seed=0, stop_width=150, check_every=10) == games
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'results.jsonl')
+        Arena([Random, Random], [{}, {}]).match(N=1000, results_path=path, seed=0, stop_width=150, check_every=10)
+        resumed_arena = Arena([Random, Random], [{}, {}])
+        assert resumed_arena.match(N=1000, results_path=path, seed=0, stop_width=150, check_every=10) == games
+        assert len(resumed_arena.ratings) == len(games)
+
+
+if __name__ == '__main__':
+    test_recover_ratings()
+    test_order_and_increment()
+    test_unbeaten()
+    test_arena_early_stop()
+
+    # 一次求解与逐局 K=32 更新收敛所需的对局数
+    elo = np.array([1000, 1100, 1200, 1400, 900, 1050, 1250, 950])
+    i, j, score = simulate(elo, 100000, seed=3)
+    ratings = BradleyTerry([str(k) for k in range(len(elo))])
+    t = time.perf_counter()
+    ratings.add_games(i, j, score)
+    ratings.fit()
+    print(f'fit {len(i)} games in {(time.perf_counter() - t) * 1e3:.1f} ms')
+
+    for n_games in (200, 1000, 5000):
+        ratings = BradleyTerry([str(k) for k in range(len(elo))])
+        ratings.add_games(i[:n_games], j[:n_games], score[:n_games])
+        fitted = ratings.fit()
+        bt_error = np.abs((fitted - fitted.mean()) - (elo - elo.mean())).mean()
+
+        sequential = np.full(len(elo), 1000.0)
+        for a, b, s in zip(i[:n_games], j[:n_games], score[:n_games]):
+            expected = 1 / (1 + 10 ** ((sequential[b] - sequential[a]) / 400))
+            sequential[a] += 32 * (s - expected)
+            sequential[b] -= 32 * (s - expected)
+        k32_error = np.abs((sequential - sequential.mean()) - (elo - elo.mean())).mean()
+        print(f'{n_games} games: mean error Bradley-Terry {bt_error:.1f}, K=32 {k32_error:.1f}, '
+              f'max 95% half width {ratings.half_widths().max():.1f}')
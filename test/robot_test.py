@@ -0,0 +1,111 @@
+import random
+import time
+
+import numpy as np
+
+from alphazero import ChessBoard
+from arena import MaxDictTerritory, MaxDiffSigmoidTerritory, MaxPercentSigmoidTerritory, MaxSigmoidTerritory, \
+    MaxTerritory
+
+N_REPEATS = 200
+
+
+def reference_scores(robot, is_relative=False, is_diff=False):
+    """ 原来逐个动作复制棋盘、BFS 两次、逐格调用领地函数的打分方式 """
+    board = robot.board
+    player = board.state[12, 0, 0]
+    active = 0 if player == 0 else 3
+    n = board.board_len
+    scores = []
+    for action in board.available_actions:
+        next_board = board.copy()
+        next_board.do_action(action, update_available_actions=False)
+        is_over, winner = next_board.is_game_over()
+        if is_over:
+            scores.append(0 if winner is None else 1 if winner == player else -1)
+            continue
+
+        state = next_board.state
+        mine = board.distance(state[active], state[3 - active], state[6], state[9])
+        theirs = board.distance(state[3 - active], state[active], state[6], state[9])
+        if not is_relative:
+            scores.append(sum(float(robot.terr_function(mine[i, j], theirs[i, j]))
+                              for i in range(n) for j in range(n)) / n ** 2)
+            continue
+
+        active_terr = inactive_terr = 0
+        all_terr = n ** 2
+        for i in range(n):
+            for j in range(n):
+                if theirs[i, j] == -1:
+                    if mine[i, j] >= 0:
+                        active_terr += 1
+                    else:
+                        all_terr -= 1
+                elif mine[i, j] >= 0:
+                    active_terr += float(robot.terr_function(mine[i, j], theirs[i, j]))
+                    inactive_terr += float(robot.terr_function(theirs[i, j], mine[i, j]))
+                else:
+                    inactive_terr += 1
+        scores.append(((active_terr - inactive_terr) if is_diff else active_terr) / all_terr)
+    return scores
+
+
+def random_boards(n_boards=60, seed=0):
+    """ 随机对局中还没有结束的局面 """
+    random.seed(seed)
+    board = ChessBoard()
+    boards = []
+    while len(boards) < n_boards:
+        if board.is_game_over()[0]:
+            board.clear_board()
+        boards.append(board.copy())
+        board.do_action(random.choice(board.available_actions))
+    return boards
+
+
+def robots(board):
+    """ 所有领地机器人及其在 `reference_scores` 中的参数 """
+    return [
+        (MaxTerritory(board), {}),
+        (MaxSigmoidTerritory(board, K=3, B=1), {}),
+        (MaxDictTerritory(board, D={0: 0.2, -1: 0.5, -2: 0.8, -3: 1}), {}),
+        (MaxPercentSigmoidTerritory(board), {'is_relative': True}),
+        (MaxDiffSigmoidTerritory(board), {'is_relative': True, 'is_diff': True}),
+    ]
+
+
+def test_scores_match_reference():
+    """ 批量计算的得分与逐个动作计算的相同，包括一步杀、一步死和一步平 """
+    for board in random_boards():
+        for robot, kwargs in robots(board):
+            assert np.allclose(robot.get_action_scores(), reference_scores(robot, **kwargs))
+
+
+def test_scalar_terr_function():
+    """ 领地函数仍然可以对单个格子调用 """
+    robot = MaxSigmoidTerritory(ChessBoard())
+    assert robot.terr_function(-1, 3) == 0 and robot.terr_function(2, -1) == 1
+    assert np.isclose(robot.terr_function(1, 1), 1 / (1 + np.exp(2)))
+
+
+if __name__ == '__main__':
+    test_scores_match_reference()
+    test_scalar_terr_function()
+
+    # 开局和中局各一个局面，比较每步的打分耗时
+    boards = random_boards(20, seed=1)
+    for board in (boards[0], boards[12]):
+        for robot, kwargs in robots(board):
+            t = time.perf_counter()
+            for _ in range(N_REPEATS):
+                robot.get_action_scores()
+            t_batch = (time.perf_counter() - t) / N_REPEATS
+
+            t = time.perf_counter()
+            for _ in range(N_REPEATS // 20):
+                reference_scores(robot, **kwargs)
+            t_reference = (time.perf_counter() - t) / (N_REPEATS // 20)
+
+            print(f'{type(robot).__name__:<28} {len(board.available_actions):>3} actions: '
+                  f'{t_reference * 1e3:.1f} ms -> {t_batch * 1e3:.2f} ms')
@@ -0,0 +1,149 @@
+import random
+import time
+from collections import Counter
+
+import numpy as np
+
+from alphazero import BitBoard, ChessBoard, RolloutMCTS
+from alphazero.board_tables import generate_actions, get_board_tables
+from alphazero.rollout import batch_rollout, random_action, rollout, rollout_state
+
+N_ROLLOUTS = 300
+
+
+def legacy_rollout(board: ChessBoard):
+    """ 原来 `RolloutMCTS.__rollout` 的走法：每一步完整执行动作并判断游戏是否结束 """
+    n_moves = 0
+    while True:
+        is_over, winner = board.is_game_over()
+        if is_over:
+            break
+        board.push(random.choice(board.available_actions))
+        n_moves += 1
+
+    for _ in range(n_moves):
+        board.pop()
+    return winner
+
+
+def random_boards(n_boards=100, seed=0):
+    """ 随机对局中的局面，包括已经结束的局面 """
+    random.seed(seed)
+    board = ChessBoard()
+    boards = []
+    while len(boards) < n_boards:
+        boards.append(board.copy())
+        if board.is_game_over()[0]:
+            board.clear_board()
+        else:
+            board.do_action(random.choice(board.available_actions))
+    return boards
+
+
+def test_random_action():
+    """ 随机动作都合法，开局时每个合法动作被选中的次数大致相同 """
+    tables = get_board_tables(7)
+    rng = random.Random(0)
+    for board in random_boards():
+        if board.is_game_over()[0]:
+            continue
+        pos, h, v, player = rollout_state(board)
+        actions = set(generate_actions(pos[player], pos[1 - player], h, v, tables))
+        assert actions == set(board.available_actions)
+        for _ in range(20):
+            assert random_action(pos[player], pos[1 - player], h, v, tables, rng) in actions
+
+    pos, h, v, player = rollout_state(ChessBoard())
+    actions = generate_actions(pos[0], pos[1], h, v, tables)
+    counts = Counter(random_action(pos[0], pos[1], h, v, tables, rng) for _ in range(200 * len(actions)))
+    assert set(counts) == set(actions)
+    assert min(counts.values()) > 120 and max(counts.values()) < 280
+
+
+def test_rollout():
+    """ 用同一个随机数生成器在 BitBoard 上逐步走同样的动作，胜利者相同 """
+    tables = get_board_tables(7)
+    for i, board in enumerate(random_boards(40, seed=1)):
+        state = rollout_state(board)
+
+        rng = random.Random(i)
+        bit_board = BitBoard()
+        bit_board.pos = list(state[0])
+        bit_board.horizontal_walls = (state[1], 0, 0)
+        bit_board.vertical_walls = (state[2], 0, 0)
+        bit_board.current_player = state[3]
+        while not bit_board.is_game_over()[0]:
+            player = bit_board.current_player
+            pos = bit_board.pos
+            action = random_action(pos[player], pos[1 - player], bit_board.horizontal_walls[0],
+                                   bit_board.vertical_walls[0], tables, rng)
+            bit_board.do_action(action, check_legality=False)
+
+        assert rollout(*state, 7, random.Random(i)) == bit_board.is_game_over()[1]
+
+
+def test_batch_rollout():
+    """ 同时模拟的胜率与逐局模拟相近，已经结束的局面直接返回胜利者 """
+    board = random_boards(12, seed=3)[-1]
+    state = rollout_state(board)
+    rng = random.Random(0)
+    winners = [rollout(*state, 7, rng) for _ in range(1000)]
+    batch_winners = batch_rollout(*state, 7, 1000, np.random.default_rng(0))
+    assert batch_winners.shape == (1000,)
+    assert set(batch_winners.tolist()) <= {-1, 0, 1}
+    assert abs(winners.count(0) / 1000 - np.mean(batch_winners == 0)) < 0.08
+
+    for board in random_boards(60, seed=4):
+        is_over, winner = board.is_game_over()
+        if is_over:
+            expected = -1 if winner is None else winner
+            assert (batch_rollout(*rollout_state(board), 7, 5) == expected).all()
+            assert rollout(*rollout_state(board), 7) == winner
+
+
+def test_rollout_mcts():
+    """ 逐局模拟和同时模拟多局时都返回合法动作，且不改变棋盘 """
+    board = random_boards(8, seed=5)[-1]
+    state = board.state.copy()
+    for n_rollouts in (1, 8):
+        mcts = RolloutMCTS(n_iters=50, n_rollouts=n_rollouts)
+        assert mcts.get_action(board) in board.available_actions
+        assert np.array_equal(board.state, state)
+
+
+if __name__ == '__main__':
+    test_random_action()
+    test_rollout()
+    test_batch_rollout()
+    test_rollout_mcts()
+
+    # 开局和中局局面上每秒模拟的局数
+    for name, board in (('opening', ChessBoard()), ('middle game', random_boards(16, seed=2)[-1])):
+        state = rollout_state(board)
+
+        t = time.perf_counter()
+        for _ in range(N_ROLLOUTS):
+            legacy_rollout(board)
+        t_legacy = time.perf_counter() - t
+
+        t = time.perf_counter()
+        for _ in range(N_ROLLOUTS * 10):
+            rollout(*state, 7)
+        t_kernel = time.perf_counter() - t
+
+        rng = np.random.default_rng()
+        t = time.perf_counter()
+        for _ in range(10):
+            batch_rollout(*state, 7, N_ROLLOUTS * 10, rng)
+        t_batch = time.perf_counter() - t
+
+        print(f'{name}: legacy {N_ROLLOUTS / t_legacy:.0f}/s, rollout {N_ROLLOUTS * 10 / t_kernel:.0f}/s, '
+              f'batch_rollout {N_ROLLOUTS * 100 / t_batch:.0f}/s')
+
+    # 纯 MCTS 每步的耗时
+    board = ChessBoard()
+    for n_iters, n_rollouts in ((1000, 1), (100, 256)):
+        mcts = RolloutMCTS(n_iters=n_iters, n_rollouts=n_rollouts)
+        t = time.perf_counter()
+        mcts.get_action(board)
+        print(f'RolloutMCTS n_iters={n_iters} n_rollouts={n_rollouts}: {time.perf_counter() - t:.2f} s')
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from alphazero.sample_store import SampleStore
+from self_play_dataset_test import random_game
+
+N_GAMES = 2000
+
+
+def random_games(n_games):
+    """ 随机对局的自我博弈数据和棋谱 """
+    games = []
+    for seed in range(n_games):
+        data = random_game(seed)
+        actions = [int(np.flatnonzero(pi)[0]) for pi in data.pi_list]
+        games.append((data, actions))
+    return games
+
+
+def test_append_and_read():
+    """ 跨越文件边界写入后，随机读取和逐局读取的结果与写入的一致，重新打开后数据仍在 """
+    games = random_games(5)
+    with tempfile.TemporaryDirectory() as root:
+        store = SampleStore(root, chunk_size=16)
+        for data, actions in games:
+            store.append(data, actions)
+
+        n_samples = sum(len(actions) for _, actions in games)
+        assert len(store) == n_samples and store.n_games == 5
+        assert len([f for f in os.listdir(root) if f.startswith('chunk')]) == (n_samples + 15) // 16
+
+        store = SampleStore(root, is_lazy_augment=False)
+        assert len(store) == n_samples and store.chunk_size == 16
+        for (data, actions), (stored_actions, feature_planes, pi, z) in zip(games, store.iter_games()):
+            assert stored_actions == actions
+            assert torch.equal(feature_planes, torch.stack(data.feature_planes_list))
+            assert torch.allclose(pi, torch.from_numpy(np.stack(data.pi_list)).float(), atol=1e-3)
+            assert torch.allclose(z, torch.tensor(data.z_list, dtype=torch.float32))
+
+        assert list(store.iter_actions()) == [actions for _, actions in games]
+
+        all_features = torch.cat([torch.stack(data.feature_planes_list) for data, _ in games])
+        index = np.array([n_samples - 1, 0, 17, 3])
+        feature_planes, _, _ = store.read(index)
+        assert torch.equal(feature_planes, all_features[index])
+
+        feature_planes, pi, z = store.sample(10)
+        assert feature_planes.shape == (10, 13, 7, 7) and pi.shape == (10, 100) and z.shape == (10,)
+        assert torch.equal(store.tail(3)[0], all_features[-3:])
+
+
+def test_uncommitted_game_is_ignored():
+    """ 写到一半中断的对局不会被读到，之后写入的对局覆盖它 """
+    games = random_games(3)
+    with tempfile.TemporaryDirectory() as root:
+        store = SampleStore(root, chunk_size=16)
+        store.append(*games[0])
+
+        # 模拟写完对局编号后、更新 meta.json 前中断
+        with open(store.games_path, 'ab') as f:
+            f.write(np.array([12345], dtype=np.int64).tobytes())
+
+        store = SampleStore(root)
+        assert store.n_games == 1
+        store.append(*games[1])
+        assert list(store.iter_actions()) == [games[0][1], games[1][1]]
+
+
+if __name__ == '__main__':
+    test_append_and_read()
+    test_uncommitted_game_is_ignored()
+
+    # 写入和随机抽样的速度
+    games = random_games(N_GAMES)
+    with tempfile.TemporaryDirectory() as root:
+        store = SampleStore(root)
+        t = time.perf_counter()
+        for data, actions in games:
+            store.append(data, actions)
+        t_write = time.perf_counter() - t
+
+        t = time.perf_counter()
+        for _ in range(100):
+            store.sample(512)
+        t_sample = (time.perf_counter() - t) / 100
+
+        t = time.perf_counter()
+        n = sum(len(actions) for actions in store.iter_actions())
+        t_iter = time.perf_counter() - t
+
+    print(f'{len(store)} samples: write {len(store) / t_write:.0f} samples/s, '
+          f'sample 512 in {t_sample * 1e3:.1f} ms, stream {n / t_iter:.0f} actions/s')
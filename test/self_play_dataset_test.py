@@ -0,0 +1,140 @@
+import gc
+import random
+from collections import deque
+
+import numpy as np
+import torch
+from torch import Tensor
+
+from alphazero import ChessBoard
+from alphazero.self_play_dataset import SelfPlayData, SelfPlayDataSet
+from alphazero.symmetry import get_symmetries, transform
+
+N_SAMPLES = 100000
+
+
+def random_game(seed=0):
+    """ 随机下一局，返回自我博弈数据 """
+    random.seed(seed)
+    board = ChessBoard()
+    feature_planes_list, pi_list = [], []
+    while not board.is_game_over()[0]:
+        action = random.choice(board.available_actions)
+        pi = np.zeros(100)
+        pi[board.available_actions] = 1 / len(board.available_actions)
+        feature_planes_list.append(board.get_feature_planes())
+        pi_list.append(pi)
+        board.do_action(action)
+
+    z_list = [(-1) ** i * 0.8 ** (len(pi_list) - i) for i in range(len(pi_list))]
+    return SelfPlayData(pi_list=pi_list, z_list=z_list, feature_planes_list=feature_planes_list)
+
+
+def test_round_trip():
+    """ 压缩存放后取出的样本与原样本相同 """
+    data = random_game()
+    dataset = SelfPlayDataSet(is_lazy_augment=False)
+    dataset.append(data)
+    assert len(dataset) == len(get_symmetries()) * len(data.pi_list)
+
+    # 对称变换后的样本存放在整局原样本之后
+    for i in range(len(data.pi_list)):
+        feature_planes, pi, z = dataset[i]
+        assert torch.equal(feature_planes, data.feature_planes_list[i])
+        assert torch.allclose(pi, Tensor(data.pi_list[i]), atol=1e-3)
+        assert abs(float(z) - data.z_list[i]) < 1e-6
+
+
+def test_lazy_augment():
+    """ 抽样时做对称变换只存原样本，抽出的每个样本都是某个原样本的对称变换，且每种变换都会出现 """
+    data = random_game()
+    dataset = SelfPlayDataSet(capacity=1000)
+    dataset.append(data)
+    assert len(dataset) == len(data.pi_list)
+
+    # 特征平面 -> (策略, 变换名)
+    augmented = {}
+    for feature_planes, pi in zip(data.feature_planes_list, data.pi_list):
+        pi = Tensor(pi).half().float()
+        for symmetry in reversed(get_symmetries()):
+            sym_features, sym_pi = transform(feature_planes, pi, symmetry)
+            augmented[bytes(sym_features.numpy().astype(np.uint8))] = (sym_pi, symmetry.name)
+
+    names = set()
+    for _ in range(20):
+        feature_planes, pi, z = dataset.sample(len(dataset))
+        for x, p in zip(feature_planes, pi):
+            expected_pi, name = augmented[bytes(x.numpy().astype(np.uint8))]
+            assert torch.equal(expected_pi, p)
+            names.add(name)
+
+    assert names == {symmetry.name for symmetry in get_symmetries()}
+
+
+def test_ring_overwrite():
+    """ 写满后覆盖最旧的样本，下标 0 始终是最旧的样本 """
+    dataset = SelfPlayDataSet(capacity=10)
+    feature_planes = torch.zeros(15, 13, 7, 7)
+    z = torch.arange(15, dtype=torch.float32)
+    dataset.extend(feature_planes, torch.zeros(15, 100), z)
+    assert len(dataset) == 10
+    assert [float(dataset[i][2]) for i in range(10)] == list(range(5, 15))
+
+    dataset.extend(feature_planes[:3], torch.zeros(3, 100), z[:3] + 100)
+    assert [float(dataset[i][2]) for i in range(10)] == list(range(8, 15)) + [100, 101, 102]
+
+
+def test_sample():
+    """ 随机抽取的 mini-batch 形状正确，且不重复 """
+    dataset = SelfPlayDataSet(capacity=1000)
+    dataset.append(random_game())
+    feature_planes, pi, z = dataset.sample(16)
+    assert feature_planes.shape == (16, 13, 7, 7) and feature_planes.dtype == torch.float32
+    assert pi.shape == (16, 100) and pi.dtype == torch.float32
+    assert z.shape == (16,) and z.dtype == torch.float32
+
+    feature_planes, pi, z = dataset.sample(10 * len(dataset))
+    assert len(z) == len(dataset)
+    assert len(set(map(bytes, feature_planes.numpy().astype(np.uint8)))) <= len(dataset)
+
+
+def rss():
+    """ 进程当前占用的物理内存字节数 """
+    gc.collect()
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * 4096
+
+
+def old_deque_memory(data: SelfPlayData):
+    """ 原来以张量元组存放在 deque 中的内存占用 """
+    start = rss()
+    data_deque = deque(maxlen=1000000)
+    z_list = Tensor(data.z_list * (N_SAMPLES // len(data.z_list) + 1))
+    for i, z in zip(range(N_SAMPLES), z_list):
+        j = i % len(data.pi_list)
+        data_deque.append((data.feature_planes_list[j].clone(), Tensor(data.pi_list[j]), z))
+    return rss() - start
+
+
+def ring_buffer_memory(data: SelfPlayData):
+    """ 环形缓冲区写入同样多样本后的内存占用 """
+    start = rss()
+    dataset = SelfPlayDataSet(capacity=N_SAMPLES)
+    while len(dataset) < N_SAMPLES:
+        dataset.append(data)
+    return rss() - start, dataset.nbytes
+
+
+if __name__ == '__main__':
+    test_round_trip()
+    test_lazy_augment()
+    test_ring_overwrite()
+    test_sample()
+
+    data = random_game()
+    scale = 1000000 / N_SAMPLES / 2 ** 20
+    # 先测环形缓冲区，否则 deque 释放后留在进程里的内存会被复用
+    new, nbytes = ring_buffer_memory(data)
+    old = old_deque_memory(data)
+    print(f'deque of tensors: {old * scale:.0f} MB per million samples')
+    print(f'ring buffer: {new * scale:.0f} MB per million samples (arrays {nbytes * scale:.0f} MB)')
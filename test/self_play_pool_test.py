@@ -0,0 +1,38 @@
+import numpy as np
+import torch
+
+from alphazero import ChessBoard, PolicyValueNet
+from alphazero.self_play_pool import SelfPlayWorkerPool
+
+
+def test_stream_games():
+    """ 常驻进程传回的棋局与按棋谱重新下一遍得到的特征平面一致，权重更新后继续产生棋局 """
+    torch.manual_seed(0)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    workers = SelfPlayWorkerPool(policy_value_net, 1, dict(n_iters=10, batch_size=4, virtual_loss=3), gamma=0.8)
+    workers.start()
+    try:
+        for i in range(2):
+            self_play_data, action_list = workers.get_game(timeout=120)
+            assert len(self_play_data.feature_planes_list) == len(action_list) == len(self_play_data.pi_list)
+
+            board = ChessBoard()
+            for feature_planes, action in zip(self_play_data.feature_planes_list, action_list):
+                assert np.array_equal(feature_planes.numpy(), board.get_feature_planes().numpy())
+                board.do_action(action)
+            assert board.is_game_over()[0]
+
+            torch.manual_seed(i + 1)
+            state_dict = PolicyValueNet(is_use_gpu=False).state_dict()
+            workers.broadcast(state_dict)
+            assert int(workers.version) == i + 1
+            assert torch.equal(workers.shared_state['conv.conv.weight'], state_dict['conv.conv.weight'])
+    finally:
+        workers.stop()
+
+    assert workers.n_games == 2
+
+
+if __name__ == '__main__':
+    test_stream_games()
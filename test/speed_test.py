@@ -1,25 +1,53 @@
 import random
 import timeit
 
-from alphazero import ChessBoard
+from alphazero import ChessBoard, BitBoard
 
 N = 10000
 
 
-def main():
-    board = ChessBoard()
-    for i in range(N):
+def main(board_class=ChessBoard, n_games=N):
+    board = board_class()
+    moves = 0
+    for i in range(n_games):
         while True:
             if board.is_game_over()[0]:
                 break
             action = random.choice(board.available_actions)
             board.do_action(action)
+            moves += 1
         board.clear_board()
+    return moves
 
 
+def available_actions_time(board_class, n_games=20):
+    """ 在随机对局的局面上测量 `get_available_actions` 的平均耗时 """
+    random.seed(0)
+    boards = []
+    board = board_class()
+    for i in range(n_games):
+        while not board.is_game_over()[0]:
+            boards.append(board.copy())
+            board.do_action(random.choice(board.available_actions))
+        board.clear_board()
+
+    total_time = timeit.timeit(lambda: [b.get_available_actions() for b in boards], number=5)
+    return total_time / 5 / len(boards)
+
 
 if __name__ == '__main__':
-    total_time = timeit.timeit(main, number=1)
-    print("total time:", total_time)
-    print("avg time:", total_time / N)
-    print("Moves/s", N * 22 / total_time)
+    for board_class in (ChessBoard, BitBoard):
+        print(f"{board_class.__name__} get_available_actions: {available_actions_time(board_class) * 1e6:.1f} us/call")
+
+    for board_class, n_games in ((ChessBoard, N // 10), (BitBoard, N)):
+        moves = 0
+
+        def run():
+            global moves
+            moves = main(board_class, n_games)
+
+        total_time = timeit.timeit(run, number=1)
+        print(board_class.__name__)
+        print("total time:", total_time)
+        print("avg time:", total_time / n_games)
+        print("Moves/s", moves / total_time)
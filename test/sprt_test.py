@@ -0,0 +1,98 @@
+import importlib.util
+import inspect
+import os
+import random
+import tempfile
+
+import torch
+
+from alphazero import PolicyValueNet
+from alphazero.sprt import SPRT, elo_to_score
+from alphazero.train import TrainModel, gate_model
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_sprt(elo, seed, draw_rate=0.2, max_games=2000, **sprt_kwargs):
+    """ 按给定的 elo 差随机生成对局结果，返回检验的结论和局数 """
+    rng = random.Random(seed)
+    score = elo_to_score(elo)
+    p_win = score - draw_rate / 2
+    sprt = SPRT(**sprt_kwargs)
+    while sprt.decision is None and len(sprt) < max_games:
+        r = rng.random()
+        sprt.update(1 if r < p_win else 0.5 if r < p_win + draw_rate else 0)
+    return sprt.decision, len(sprt)
+
+
+def test_error_rates():
+    """ 明显更强时接受 H1，实力相同时接受 H0，错判的比例不超过设定的错误率太多 """
+    strong = [run_sprt(100, seed, elo1=35, alpha=0.05, beta=0.05) for seed in range(100)]
+    equal = [run_sprt(0, seed, elo1=35, alpha=0.05, beta=0.05) for seed in range(100)]
+    assert sum(decision is True for decision, _ in strong) >= 90
+    assert sum(decision is True for decision, _ in equal) <= 10
+
+    # 实力差距越大，需要的局数越少
+    assert sum(n for _, n in strong) < sum(n for _, n in equal)
+
+
+def test_training_config():
+    """ 训练配置下明显更强或更弱的模型在比赛局数上限之前就有结论，实力相近时大多也有结论 """
+    spec = importlib.util.spec_from_file_location('train_config', os.path.join(ROOT, 'train.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    defaults = {name: p.default for name, p in inspect.signature(TrainModel.__init__).parameters.items()}
+    config = {**defaults, **module.train_config}
+
+    elo0, elo1 = config['gate_elo_bounds']
+    kwargs = dict(max_games=config['n_test_games'], elo0=elo0, elo1=elo1, alpha=config['gate_error_rate'],
+                  beta=config['gate_error_rate'])
+    for elo, expected in ((200, True), (-200, False)):
+        results = [run_sprt(elo, seed, **kwargs) for seed in range(200)]
+        assert sum(decision is expected for decision, _ in results) >= 195
+        assert sum(n for _, n in results) / len(results) < config['n_test_games'] / 4
+
+    for elo in (0, elo1):
+        results = [run_sprt(elo, seed, **kwargs) for seed in range(200)]
+        assert sum(decision is None for decision, _ in results) <= 20
+
+
+def test_counts():
+    sprt = SPRT()
+    for score in (1, 0.5, 0, 1):
+        sprt.update(score)
+    assert (sprt.n_wins, sprt.n_draws, sprt.n_losses) == (2, 1, 1)
+    assert sprt.score == 0.625 and sprt.llr > 0
+
+
+def test_gate_model():
+    """ 历史最优模型不存在时直接保存，之后多进程比赛，按先后手成对的结果返回检验结果 """
+    torch.manual_seed(0)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    mcts_kwargs = dict(c_puct=4, n_iters=8, policy_dim=100, batch_size=4, virtual_loss=3)
+    with tempfile.TemporaryDirectory() as root:
+        model_path = os.path.join(root, 'best.pth')
+        assert gate_model(policy_value_net, model_path, 4, mcts_kwargs) is None
+        assert os.path.exists(model_path)
+
+        result = gate_model(policy_value_net, model_path, 4, mcts_kwargs, n_workers=2)
+        assert result.n_games in (2, 4) and 0 <= result.score <= 1
+
+        # 奇数局时最后一局凑不成一对，不下这一局
+        result = gate_model(policy_value_net, model_path, 3, mcts_kwargs)
+        assert result.n_games == 2
+
+
+if __name__ == '__main__':
+    test_error_rates()
+    test_training_config()
+    test_counts()
+    test_gate_model()
+
+    # 默认参数、最多下 100 局时平均需要的局数
+    for elo in (-100, 0, 35, 100, 200):
+        results = [run_sprt(elo, seed, max_games=100) for seed in range(1000)]
+        n_games = sum(n for _, n in results) / len(results)
+        accept = sum(decision is True for decision, _ in results) / len(results)
+        undecided = sum(decision is None for decision, _ in results) / len(results)
+        print(f'elo {elo:>4}: accept H1 {accept:.1%}, undecided {undecided:.1%}, average {n_games:.0f} games')
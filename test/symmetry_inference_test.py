@@ -0,0 +1,110 @@
+import random
+import time
+
+import numpy as np
+import torch
+
+from alphazero import AlphaZeroMCTS, ChessBoard, PolicyValueNet
+from alphazero.symmetry import get_symmetries, transform_feature_planes
+
+N_REPEATS = 200
+
+
+def random_positions(n_positions=16, seed=0):
+    """ 随机对局中的局面，返回特征平面和可用动作 """
+    random.seed(seed)
+    board = ChessBoard()
+    feature_planes, actions = [], []
+    while len(actions) < n_positions:
+        if board.is_game_over()[0]:
+            board.clear_board()
+        feature_planes.append(board.get_feature_planes())
+        actions.append(board.available_actions)
+        board.do_action(random.choice(board.available_actions))
+    return torch.stack(feature_planes), actions
+
+
+def test_average_is_invariant():
+    """ 取平均后，对称变换后的局面与原局面的估值相同，先验概率按动作对应关系相同 """
+    torch.manual_seed(0)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    policy_value_net.set_symmetry_mode('average')
+    feature_planes, _ = random_positions()
+    all_actions = [list(range(100))] * len(feature_planes)
+
+    probs, values = policy_value_net.predict_batch(feature_planes, all_actions)
+    for symmetry in get_symmetries():
+        sym_probs, sym_values = policy_value_net.predict_batch(
+            transform_feature_planes(feature_planes, symmetry), all_actions)
+        assert np.allclose(sym_values, values, atol=1e-5)
+        for p, sym_p in zip(probs, sym_probs):
+            assert np.allclose(sym_p[list(symmetry.action_map)], p, atol=1e-6)
+
+
+def test_random_symmetry():
+    """ 随机对称变换的估值等于某个对称局面的估值，且先验概率仍然是概率分布 """
+    torch.manual_seed(0)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    feature_planes, _ = random_positions()
+    all_actions = [list(range(100))] * len(feature_planes)
+
+    policy_value_net.set_symmetry_mode('random')
+    random_probs, random_values = policy_value_net.predict_batch(feature_planes, all_actions)
+    for p in random_probs:
+        assert abs(p.sum() - 1) < 1e-4
+
+    candidates = []
+    for symmetry in get_symmetries():
+        policy_value_net.set_symmetry_mode(None)
+        _, sym_values = policy_value_net.predict_batch(transform_feature_planes(feature_planes, symmetry),
+                                                       all_actions)
+        candidates.append(sym_values)
+    assert np.all(np.isclose(np.stack(candidates), random_values, atol=1e-5).any(axis=0))
+
+
+def test_search_with_symmetries():
+    """ 两种模式都可以用于搜索 """
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    for mode in ('average', 'random'):
+        policy_value_net.set_symmetry_mode(mode)
+        mcts = AlphaZeroMCTS(policy_value_net, n_iters=20)
+        action = mcts.get_action(ChessBoard())
+        assert action in ChessBoard().available_actions
+
+
+def benchmark(batch_size: int):
+    """ 比较不变换、一次批量前馈取平均和分别前馈四次的耗时 """
+    torch.set_num_threads(1)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    feature_planes, actions = random_positions(batch_size)
+    symmetries = get_symmetries()
+
+    def run(mode, separate=False):
+        policy_value_net.set_symmetry_mode(mode)
+        t = time.perf_counter()
+        for _ in range(N_REPEATS):
+            if separate:
+                for symmetry in symmetries:
+                    policy_value_net.predict_batch(transform_feature_planes(feature_planes, symmetry), actions)
+            else:
+                policy_value_net.predict_batch(feature_planes, actions)
+        return (time.perf_counter() - t) / N_REPEATS * 1e3
+
+    plain = run(None)
+    average = run('average')
+    separate = run(None, separate=True)
+    random_ = run('random')
+    print(f'batch {batch_size:3d}: plain {plain:.2f} ms, average {average:.2f} ms, '
+          f'{len(symmetries)} separate calls {separate:.2f} ms, random {random_:.2f} ms')
+
+
+if __name__ == '__main__':
+    test_average_is_invariant()
+    test_random_symmetry()
+    test_search_with_symmetries()
+    for batch_size in (1, 8, 32):
+        benchmark(batch_size)
@@ -0,0 +1,120 @@
+import random
+
+import numpy as np
+import torch
+
+from alphazero import ChessBoard
+from alphazero.symmetry import get_symmetries, transform
+
+# 原来手写的主对角线翻转动作表
+flip_dict = {0: 37, 1: 36, 2: 39, 3: 38, 4: 17, 5: 16, 6: 19, 7: 18, 8: 41, 9: 40, 10: 43, 11: 42, 12: 65,
+             13: 64, 14: 67, 15: 66, 16: 5, 17: 4, 18: 7, 19: 6, 20: 21, 21: 20, 22: 23, 23: 22, 24: 45,
+             25: 44, 26: 47, 27: 46, 28: 69, 29: 68, 30: 71, 31: 70, 32: 85, 33: 84, 34: 87, 35: 86, 36: 1,
+             37: 0, 38: 3, 39: 2, 40: 9, 41: 8, 42: 11, 43: 10, 44: 25, 45: 24, 46: 27, 47: 26, 48: 49,
+             49: 48, 50: 51, 51: 50, 52: 73, 53: 72, 54: 75, 55: 74, 56: 89, 57: 88, 58: 91, 59: 90,
+             60: 97, 61: 96, 62: 99, 63: 98, 64: 13, 65: 12, 66: 15, 67: 14, 68: 29, 69: 28, 70: 31,
+             71: 30, 72: 53, 73: 52, 74: 55, 75: 54, 76: 77, 77: 76, 78: 79, 79: 78, 80: 93, 81: 92,
+             82: 95, 83: 94, 84: 33, 85: 32, 86: 35, 87: 34, 88: 57, 89: 56, 90: 59, 91: 58, 92: 81,
+             93: 80, 94: 83, 95: 82, 96: 61, 97: 60, 98: 63, 99: 62}
+
+
+def new_board(is_swap_colors: bool) -> ChessBoard:
+    """ 交换颜色时，变换后的棋局由绿色先走 """
+    board = ChessBoard()
+    if is_swap_colors:
+        board.state[12] = 1
+        board.available_actions = board.get_available_actions()
+    return board
+
+
+def test_symmetries():
+    """ 只有保持双方初始角落不变的变换可用，主对角线翻转与原来手写的动作表一致 """
+    symmetries = get_symmetries()
+    assert [s.name for s in symmetries] == ['identity', 'transpose', 'anti_transpose', 'rotate_180']
+    assert [s.is_swap_colors for s in symmetries] == [False, False, True, True]
+    assert symmetries[1].action_map == tuple(flip_dict[i] for i in range(100))
+
+    for symmetry in symmetries:
+        assert sorted(symmetry.action_map) == list(range(100))
+        assert torch.equal(symmetry.action_index[torch.tensor(symmetry.action_map)], torch.arange(100))
+
+
+def test_replay_games():
+    """ 在每个对称变换下重放随机对局，每一步的合法动作、特征平面和最终胜负都与原对局对应 """
+    random.seed(0)
+    symmetries = get_symmetries()
+    for _ in range(20):
+        board = ChessBoard()
+        boards = [new_board(s.is_swap_colors) for s in symmetries]
+        while True:
+            feature_planes = board.get_feature_planes()
+            pi = torch.zeros(100)
+            pi[board.available_actions] = 1
+            for symmetry, sym_board in zip(symmetries, boards):
+                sym_features, sym_pi = transform(feature_planes, pi, symmetry)
+                assert torch.equal(sym_features, sym_board.get_feature_planes())
+                assert sorted(sym_board.available_actions) == np.flatnonzero(sym_pi.numpy()).tolist()
+
+            is_over, winner = board.is_game_over()
+            for symmetry, sym_board in zip(symmetries, boards):
+                sym_over, sym_winner = sym_board.is_game_over()
+                assert sym_over == is_over
+                if is_over and winner is not None and symmetry.is_swap_colors:
+                    winner_ = 1 - winner
+                else:
+                    winner_ = winner
+                assert not is_over or sym_winner == winner_
+
+            if is_over:
+                break
+
+            action = random.choice(board.available_actions)
+            board.do_action(action)
+            for symmetry, sym_board in zip(symmetries, boards):
+                sym_board.do_action(symmetry.action_map[action])
+
+
+def flip_one(feature_planes, pi):
+    """ 原来逐个样本沿主对角线翻转的实现 """
+    flip_features = torch.transpose(feature_planes.clone().detach(), 1, 2)
+    _ = flip_features.clone().detach()
+    flip_features[6:9] = _[9:12]
+    flip_features[9:12] = _[6:9]
+
+    flip_pi = torch.zeros_like(pi)
+    for i in range(len(pi)):
+        flip_pi[flip_dict[i]] = pi[i]
+    return flip_features, flip_pi
+
+
+def test_batch_transform():
+    """ 批量变换与逐个样本变换结果相同，主对角线翻转与原来手写的实现相同 """
+    random.seed(1)
+    board = ChessBoard()
+    feature_planes_list = []
+    while not board.is_game_over()[0]:
+        feature_planes_list.append(board.get_feature_planes())
+        board.do_action(random.choice(board.available_actions))
+
+    feature_planes = torch.stack(feature_planes_list)
+    pi = torch.rand(len(feature_planes), 100)
+    for symmetry in get_symmetries():
+        batch_features, batch_pi = transform(feature_planes, pi, symmetry)
+        for i in range(len(pi)):
+            features_i, pi_i = transform(feature_planes[i], pi[i], symmetry)
+            assert torch.equal(batch_features[i], features_i)
+            assert torch.equal(batch_pi[i], pi_i)
+
+    # 主对角线翻转与原来的实现相同
+    flip_features, flip_pi = transform(feature_planes, pi, get_symmetries()[1])
+    for i in range(len(pi)):
+        expected_features, expected_pi = flip_one(feature_planes[i], pi[i])
+        assert torch.equal(flip_features[i], expected_features)
+        assert torch.equal(flip_pi[i], expected_pi)
+
+
+if __name__ == '__main__':
+    test_symmetries()
+    test_replay_games()
+    test_batch_transform()
+    print('ok')
@@ -0,0 +1,43 @@
+import time
+
+import torch
+
+from alphazero import AlphaZeroMCTS, BitBoard, PolicyValueNet
+
+N_ITERS = 800
+N_MOVES = 20
+TABLE_SIZE = 200000
+
+
+def self_play(policy_value_net, transposition_table_size, batch_size=8, seed=0):
+    """ 自我博弈若干步，统计每步的网络估值次数和置换表省下的估值次数 """
+    torch.manual_seed(seed)
+    board = BitBoard()
+    mcts = AlphaZeroMCTS(policy_value_net, n_iters=N_ITERS, is_self_play=True, batch_size=batch_size,
+                         transposition_table_size=transposition_table_size)
+
+    n_evaluations = n_saved = 0
+    t = time.time()
+    for i in range(N_MOVES):
+        if board.is_game_over()[0]:
+            break
+        action, _ = mcts.get_action(board)
+        board.do_action(action)
+        n_evaluations += mcts.n_evaluations
+        n_saved += mcts.n_saved_evaluations
+
+    elapsed = time.time() - t
+    return mcts, i + 1, n_evaluations, n_saved, elapsed
+
+
+if __name__ == '__main__':
+    torch.set_num_threads(1)
+    policy_value_net = PolicyValueNet(is_use_gpu=torch.cuda.is_available())
+    policy_value_net.eval()
+
+    for size in (0, TABLE_SIZE):
+        mcts, n_moves, n_evaluations, n_saved, elapsed = self_play(policy_value_net, size)
+        print(f"table size {size:<8}{n_evaluations / n_moves:8.1f} evaluations/move"
+              f"{n_saved / n_moves:8.1f} saved/move{elapsed / n_moves:8.2f} s/move")
+        if mcts.transposition_table is not None:
+            print(f"hit rate {mcts.transposition_table.hit_rate:.2%}, {len(mcts.transposition_table)} entries")
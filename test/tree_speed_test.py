@@ -0,0 +1,54 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+from alphazero.array_tree import ArrayTree
+from alphazero.node import Node
+
+N_SIMULATIONS = 1000
+N_ACTIONS = 60
+
+
+def search_node(n_simulations=N_SIMULATIONS, seed=0):
+    """ 用 `Node` 进行不依赖棋盘的合成搜索：每个节点 60 个子节点，估值随机 """
+    rng = np.random.default_rng(seed)
+    root = Node(1, c_puct=4)
+    for i in range(n_simulations):
+        node = root
+        while not node.is_leaf_node():
+            _, node = node.select()
+        node.expand(zip(range(N_ACTIONS), rng.dirichlet(np.ones(N_ACTIONS))))
+        node.backup(rng.uniform(-1, 1))
+    return root
+
+
+def search_array_tree(n_simulations=N_SIMULATIONS, seed=0):
+    """ 用 `ArrayTree` 进行同样的合成搜索 """
+    rng = np.random.default_rng(seed)
+    tree = ArrayTree(c_puct=4)
+    for i in range(n_simulations):
+        node = tree.root
+        path = [node]
+        while not tree.is_leaf_node(node):
+            _, node = tree.select(node)
+            path.append(node)
+        tree.expand(node, zip(range(N_ACTIONS), rng.dirichlet(np.ones(N_ACTIONS))))
+        tree.backup(path, rng.uniform(-1, 1))
+    return tree
+
+
+if __name__ == '__main__':
+    for search in (search_node, search_array_tree):
+        t = time.time()
+        search()
+        elapsed = time.time() - t
+
+        tracemalloc.start()
+        tree = search()
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        n_nodes = N_SIMULATIONS * N_ACTIONS + 1
+        print(f"{search.__name__:<20}{elapsed / N_SIMULATIONS * 1e6:>8.1f} us/simulation"
+              f"{memory / n_nodes:>8.1f} B/node")
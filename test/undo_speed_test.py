@@ -0,0 +1,73 @@
+import random
+import timeit
+import tracemalloc
+
+from alphazero import ChessBoard, BitBoard
+
+N = 5000
+DEPTH = 4
+
+
+def random_position(board_class, n_moves=10, seed=0):
+    """ 随机走若干步，得到一个中局局面 """
+    random.seed(seed)
+    board = board_class()
+    for i in range(n_moves):
+        board.do_action(random.choice(board.available_actions))
+    return board
+
+
+def random_line(board, depth=DEPTH):
+    """ 生成一条从当前局面出发的随机着法序列 """
+    line = []
+    board = board.copy()
+    for i in range(depth):
+        if board.is_game_over()[0]:
+            break
+        action = random.choice(board.available_actions)
+        board.do_action(action)
+        line.append(action)
+    return line
+
+
+def simulate_copy(board, line):
+    """ 原先的做法：每次模拟深拷贝棋盘 """
+    board = board.copy()
+    for action in line:
+        board.do_action(action)
+
+
+def simulate_push_pop(board, line):
+    """ 在同一个棋盘上前进并撤销 """
+    for action in line:
+        board.push(action)
+    for _ in line:
+        board.pop()
+
+
+def traced_peak(func):
+    """ 函数执行期间分配内存的峰值 """
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == '__main__':
+    for board_class in (ChessBoard, BitBoard):
+        board = random_position(board_class)
+        line = random_line(board)
+        print(f"{board_class.__name__}, depth {len(line)}")
+
+        times = {}
+        for simulate in (simulate_copy, simulate_push_pop):
+            times[simulate] = min(timeit.repeat(lambda: simulate(board, line), number=N, repeat=5)) / N
+            print(f"    {simulate.__name__:<20}{times[simulate] * 1e6:>8.1f} us/simulation")
+
+        # 扣除下行走子本身的耗时，只比较每次模拟管理棋盘状态的开销
+        copy_time = min(timeit.repeat(board.copy, number=N, repeat=5)) / N
+        descend_time = times[simulate_copy] - copy_time
+        print(f"    {'copy overhead':<20}{copy_time * 1e6:>8.1f} us/simulation  "
+              f"{traced_peak(board.copy):>6} B allocated")
+        print(f"    {'push/pop overhead':<20}{(times[simulate_push_pop] - descend_time) * 1e6:>8.1f} us/simulation")
@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+import torch
+
+from alphazero import AlphaZeroMCTS, BitBoard, ChessBoard, PolicyValueNet
+from alphazero.board_tables import zobrist_hash
+from alphazero.transposition_table import TranspositionTable
+
+N = 100
+
+
+def test_incremental_hash():
+    """ 增量更新的哈希与从特征平面重新计算的哈希相同，相同局面哈希相同，不同局面哈希不同 """
+    random.seed(0)
+    hashes = {}
+    for board_class in (ChessBoard, BitBoard):
+        board = board_class()
+        for i in range(N):
+            while True:
+                assert board.zobrist_hash == zobrist_hash(board.state, board.board_len)
+                state = board.state.astype(int).tobytes()
+                assert hashes.setdefault(state, board.zobrist_hash) == board.zobrist_hash
+                if board.is_game_over()[0]:
+                    break
+                board.do_action(random.choice(board.available_actions))
+            board.clear_board()
+
+    assert len(set(hashes.values())) == len(hashes)
+
+
+def test_push_pop_restores_hash():
+    random.seed(1)
+    for board_class in (ChessBoard, BitBoard):
+        board = board_class()
+        key = board.zobrist_hash
+        for i in range(10):
+            board.push(random.choice(board.available_actions))
+        for i in range(10):
+            board.pop()
+        assert board.zobrist_hash == key
+
+
+def test_transposition_table_eviction():
+    table = TranspositionTable(capacity=2)
+    table.put(1, np.ones(1), 0.1)
+    table.put(2, np.ones(1), 0.2)
+    assert table.get(1)[1] == 0.1
+    table.put(3, np.ones(1), 0.3)
+
+    # 2 最久未使用，被淘汰
+    assert table.get(2) is None
+    assert len(table) == 2
+    assert table.hits == 1 and table.misses == 1
+
+
+def test_mcts_with_transposition_table():
+    """ 使用置换表后搜索仍能正常给出合法动作 """
+    torch.manual_seed(0)
+    policy_value_net = PolicyValueNet(is_use_gpu=False)
+    policy_value_net.eval()
+    mcts = AlphaZeroMCTS(policy_value_net, n_iters=50, batch_size=8, transposition_table_size=1000)
+
+    board = BitBoard()
+    for i in range(3):
+        action = mcts.get_action(board)
+        assert action in board.available_actions
+        assert mcts.n_evaluations + mcts.n_saved_evaluations <= 50
+        board.do_action(action)
+
+    assert len(mcts.transposition_table) > 0
+    mcts.reset_root()
+    assert len(mcts.transposition_table) == 0
+
+
+if __name__ == '__main__':
+    test_incremental_hash()
+    test_push_pop_restores_hash()
+    test_transposition_table_eviction()
+    test_mcts_with_transposition_table()
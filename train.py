@@ -8,8 +8,13 @@ train_config = {
     'board_len': 7,
     'batch_size': 500,  # 500 previously
     'is_use_gpu': True,
-    'n_test_games': 10,
+    'n_test_games': 100,  # 测试模型最多比赛的局数，序贯概率比检验有结论时提前停止
+    'n_test_processes': 4,
+    'gate_elo_bounds': (0, 100),  # 序贯概率比检验 H0 和 H1 下的 elo 差，越接近需要的局数越多
+    'gate_error_rate': 0.1,
     'n_mcts_iters': 500,
+    'mcts_batch_size': 8,  # 每轮收集的叶节点数，一次前馈批量估值
+    'virtual_loss': 3,
     'n_self_plays': 4000,
     'is_save_game': True,
     'n_feature_planes': 13,
@@ -17,6 +22,10 @@ train_config = {
     'check_frequency': 128,
     'start_train_size': 1000,  # 500 previously
     'max_process': 8,
+    'is_async': False,  # 异步训练，自我博弈、训练和测试模型同时进行
+    'sample_reuse': 4,  # 异步训练时每个局面平均被训练的次数
+    'sample_store_dir': './data/self_play',  # 自我博弈样本库，为 None 时不保存
+    'symmetry_mode': None,  # 估值时的对称变换，None、'average' 或 'random'
 }
 if __name__ == "__main__":
     train_model = TrainModel(**train_config)
@@ -1,8 +1,7 @@
-import json
-
 import pygame
 
 from alphazero import ChessBoard
+from alphazero.game_records import load_game
 
 action_to_pos = {
     0: (-3, 0),
@@ -15,12 +14,11 @@ action_to_pos = {
 }
 # load data
 path = "../log/2024-1-4-history/games.json"
-with open(path, 'r') as f:
-    games = json.load(f)
 
 game_index = 1300
 
-game = games[game_index].copy()
+# 只解析到要显示的那一局
+game = load_game(path, game_index)
 
 board = ChessBoard()
 
@@ -43,12 +41,12 @@ while True:
                     move_count += 1
             elif event.key == pygame.K_LEFT:
                 game_index -= 1
-                game = games[game_index].copy()
+                game = load_game(path, game_index)
                 board = ChessBoard()
                 move_count = 0
             elif event.key == pygame.K_RIGHT:
                 game_index += 1
-                game = games[game_index].copy()
+                game = load_game(path, game_index)
                 board = ChessBoard()
                 move_count = 0
 
@@ -1,22 +1,24 @@
-import json
+from itertools import chain
 
-with open("../log/2024-1-3-history/games.json", 'r') as f:
-    games = json.load(f)
+from alphazero.game_records import iter_games
 
-with open("../log/2024-1-4-history/games.json", 'r') as f:
-    games += json.load(f)
-
-print(len(games))  # 2835 games
+# 逐局读取，不把所有棋谱载入内存
+games = chain(iter_games("../log/2024-1-3-history/games.json"),
+              iter_games("../log/2024-1-4-history/games.json"))
 
 winners = [0, 0, 0]  # blue wins  red wins  draw
 
 blue_1st_move = {}
 red_1st_move = {}
+n_games = 0
 
 for game in games:
+    n_games += 1
     blue_1st_move[game[0]] = blue_1st_move.get(game[0], 0) + 1
     red_1st_move[game[1]] = red_1st_move.get(game[1], 0) + 1
 
+print(n_games)  # 2835 games
+
 # print(winners)
 
 l1 = sorted(list(blue_1st_move.items()), key=lambda x: x[1], reverse=True)[:10]
@@ -24,8 +26,8 @@ l2 = sorted(list(red_1st_move.items()), key=lambda x: x[1], reverse=True)[:10]
 
 print("Top blue openings:")
 for item in l1:
-    print(item[0], item[1] / len(games))
+    print(item[0], item[1] / n_games)
 
 print("Top red openings:")
 for item in l2:
-    print(item[0], item[1] / len(games))
+    print(item[0], item[1] / n_games)
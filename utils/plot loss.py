@@ -1,19 +1,16 @@
-import json
+from itertools import chain
 
 import matplotlib.pyplot as plt
 import numpy as np
 
-# load data
-with open("../log/2024-1-3-history/train_losses.json", 'r') as f:
-    losses = json.load(f)
-
-with open("../log/train_losses.json", 'r') as f:
-    losses += json.load(f)
-
+from alphazero.game_records import iter_records
 
+# load data
+losses = chain(iter_records("../log/2024-1-3-history/train_losses.json"),
+               iter_records("../log/train_losses.json"))
 
 # plot data
-x = np.array([loss[1] for loss in losses])
+x = np.fromiter((loss[1] for loss in losses), dtype=float)
 # y = np.array([loss[1] for loss in losses])
 
 plt.plot(x, )